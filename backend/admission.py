@@ -0,0 +1,129 @@
+# backend/admission.py
+# Admission control: shed API requests early instead of letting every request slow down.
+#
+# Each API endpoint belongs to a class with its own in-flight budget per worker process:
+#   auth      signup / login / password reset: password hashing (ADMISSION_AUTH_LIMIT)
+#   uploads   avatar uploads, bulk create/update/delete, export (ADMISSION_UPLOADS_LIMIT)
+#   crud      every other /api route (ADMISSION_CRUD_LIMIT)
+# and one signed-in user (one bearer token) may have ADMISSION_USER_LIMIT requests in flight.
+# The SSE stream, static files and /metrics are never counted: a stream holds its thread for
+# minutes by design.
+#
+# A request over a budget, or arriving while the database pool is slow to hand out
+# connections, gets 503 + Retry-After right away, before any DB or hashing work. "Slow" is the
+# 90th percentile of this process's checkouts over the last ADMISSION_POOL_WAIT_WINDOW_SECONDS
+# reaching ADMISSION_POOL_WAIT_MS (with at least ADMISSION_POOL_WAIT_MIN_SAMPLES of them), so
+# one checkout that reconnected or pre-pinged a dead connection doesn't shed anything.
+# Rejections are counted in admission_rejected{endpoint_class, reason}.
+
+import threading
+import time
+from flask import g, request, jsonify
+from prometheus_client import Counter, Gauge
+import instrumentation
+
+AUTH_ENDPOINTS = {'auth.signup', 'auth.login', 'auth.forgot_password', 'auth.reset_password'}
+UPLOAD_ENDPOINTS = {
+    'auth.avatar_upload_form', 'auth.confirm_avatar_upload',
+    'todos.create_bulk_todos', 'todos.update_bulk_todos', 'todos.delete_bulk_todos', 'todos.export_todos',
+}
+UNLIMITED_ENDPOINTS = {'events.stream_todo_events'}
+
+POOL_WAIT_PERCENTILE = 0.9
+POOL_CHECK_SECONDS = 0.1
+
+ADMISSION_REJECTED = Counter(
+    'admission_rejected', 'API requests shed with 503', ['endpoint_class', 'reason']
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    'admission_in_flight', 'Admitted API requests in progress', ['endpoint_class'],
+    multiprocess_mode='livesum'
+)
+
+def endpoint_class(endpoint):
+    if not endpoint or endpoint in UNLIMITED_ENDPOINTS: return None
+    if endpoint in AUTH_ENDPOINTS: return 'auth'
+    if endpoint in UPLOAD_ENDPOINTS: return 'uploads'
+    if endpoint.startswith(('auth.', 'todos.')): return 'crud'
+    return None
+
+class AdmissionController:
+    """In-flight counters for one worker process (all its threads)."""
+
+    def __init__(self, class_limits, user_limit, pool_wait_seconds, pool_wait_window_seconds, pool_wait_min_samples):
+        self.class_limits = class_limits
+        self.user_limit = user_limit
+        self.pool_wait_seconds = pool_wait_seconds
+        self.pool_wait_window_seconds = pool_wait_window_seconds
+        self.pool_wait_min_samples = pool_wait_min_samples
+        self._lock = threading.Lock()
+        self._classes = dict.fromkeys(class_limits, 0)
+        self._users = {}
+        self._congested = (0.0, False) # (time.monotonic() it was worked out, congested)
+
+    def pool_congested(self):
+        if not self.pool_wait_seconds: return False
+        # Sorting a window of samples on every request adds up; the answer can be a moment old
+        now = time.monotonic()
+        checked_at, congested = self._congested
+        if now - checked_at < POOL_CHECK_SECONDS: return congested
+        waits = instrumentation.recent_checkout_waits(self.pool_wait_window_seconds)
+        congested = (
+            len(waits) >= self.pool_wait_min_samples
+            and sorted(waits)[int((len(waits) - 1) * POOL_WAIT_PERCENTILE)] >= self.pool_wait_seconds
+        )
+        self._congested = (now, congested)
+        return congested
+
+    def admit(self, cls, user_key):
+        """Takes a slot. Returns None when admitted, else the reason for shedding."""
+        if self.pool_congested(): return 'pool_wait'
+        with self._lock:
+            if self._classes[cls] >= self.class_limits[cls]: return 'class_limit'
+            if user_key and self._users.get(user_key, 0) >= self.user_limit: return 'user_limit'
+            self._classes[cls] += 1
+            if user_key: self._users[user_key] = self._users.get(user_key, 0) + 1
+        return None
+
+    def release(self, cls, user_key):
+        with self._lock:
+            self._classes[cls] -= 1
+            if user_key:
+                left = self._users[user_key] - 1
+                if left: self._users[user_key] = left
+                else: del self._users[user_key]
+
+def init_admission(app):
+    cfg = app.config
+    if not cfg['ADMISSION_CONTROL']: return None
+    controller = AdmissionController(
+        {'auth': cfg['ADMISSION_AUTH_LIMIT'], 'uploads': cfg['ADMISSION_UPLOADS_LIMIT'], 'crud': cfg['ADMISSION_CRUD_LIMIT']},
+        cfg['ADMISSION_USER_LIMIT'],
+        cfg['ADMISSION_POOL_WAIT_MS'] / 1000,
+        cfg['ADMISSION_POOL_WAIT_WINDOW_SECONDS'],
+        cfg['ADMISSION_POOL_WAIT_MIN_SAMPLES'],
+    )
+    retry_after = str(cfg['ADMISSION_RETRY_AFTER_SECONDS'])
+
+    @app.before_request
+    def admit_request():
+        cls = endpoint_class(request.endpoint)
+        if cls is None or request.method == 'OPTIONS': return None
+        # The raw bearer token is enough to tell users apart; the view still verifies it
+        auth_header = request.headers.get('Authorization', '')
+        user_key = auth_header if auth_header.startswith('Bearer ') else None
+        reason = controller.admit(cls, user_key)
+        if reason:
+            ADMISSION_REJECTED.labels(cls, reason).inc()
+            return jsonify({"message": "Server busy, please try again"}), 503, {"Retry-After": retry_after}
+        g.admission = (cls, user_key)
+        ADMISSION_IN_FLIGHT.labels(cls).inc()
+
+    @app.teardown_request
+    def release_request(exc):
+        admitted = g.pop('admission', None)
+        if admitted is None: return
+        controller.release(*admitted)
+        ADMISSION_IN_FLIGHT.labels(admitted[0]).dec()
+
+    return controller
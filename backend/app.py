@@ -1,44 +1,58 @@
 # backend/app.py
-# ProTodo v2.3 - Security Hardening & Fixes
+# ProTodo v2.4 - App factory (built once per process: wsgi.py, scheduler.py or the flask CLI)
 
 import os
+import socket
 import logging # <--- ADDED for logging errors
 from flask import Flask, send_from_directory, jsonify
 from flask_cors import CORS
-from prometheus_flask_exporter import PrometheusMetrics
 from flask_jwt_extended import JWTManager
-from flask_apscheduler import APScheduler
-from datetime import datetime, timezone, timedelta
-try:
-    from zoneinfo import ZoneInfo
-except ImportError:
-    from dateutil.tz import gettz as ZoneInfo
 
 from config import Config
 from models import db, User, Todo
 from auth import auth_bp
 from todos import todos_bp 
-from mailer import send_reminder_email
-
-def create_app():
+from events import events_bp
+from reminders import run_tick, acquire_lease, SCHEDULER_TICK_ERRORS
+from mailer import MailWorker
+from avatars import ThumbnailWorker
+from schema import init_schema, upgrade_schema
+from stats import init_stats
+from assets import init_assets
+from instrumentation import init_metrics
+from profiling import init_profiling
+from admission import init_admission
+from replicas import init_replicas
+
+def create_app(run_scheduler=None):
     app = Flask(__name__)
     app.config.from_object(Config)
+    # UTF-8 JSON bodies; keeps jsonify byte-identical with serialize.fast_jsonify
+    app.json.ensure_ascii = False
 
     # Enable CORS
     CORS(app, origins=["*"], supports_credentials=True)
 
-    # === NEW: PROMETHEUS METRICS ===
-    # This automatically creates the /metrics endpoint
-    metrics = PrometheusMetrics(app)
-    
-    # Optional: Added info about the app version
-    metrics.info('app_info', 'Application info', version='1.0.0')
-    
     db.init_app(app)
+
+    # === NEW: PROMETHEUS METRICS ===
+    # /metrics: HTTP, SQL and pool metrics (see instrumentation.py), all workers combined
+    metrics = init_metrics(app, db)
+
+    # === READ REPLICA (DATABASE_REPLICA_URL; writers stick to the primary for a while) ===
+    init_replicas(app)
+
+    # === ADMISSION CONTROL (503 + Retry-After before a worker gets swamped) ===
+    init_admission(app)
+
+    # === PROFILING (sampled / X-Profile requests -> PROFILE_DIR, flask show-profile) ===
+    init_profiling(app)
+
     jwt = JWTManager(app)
 
     app.register_blueprint(auth_bp, url_prefix='/api')
     app.register_blueprint(todos_bp, url_prefix='/api')
+    app.register_blueprint(events_bp, url_prefix='/api')
 
     # === PATH SETUP ===
     FRONTEND_FOLDER = os.path.join(os.getcwd(), '..', 'frontend')
@@ -52,107 +66,68 @@ def create_app():
         return send_from_directory(os.path.join(BACKEND_STATIC, 'avatars'), filename)
 
     # === ROUTE 2: SERVE FRONTEND ===
+    # Built, hashed and precompressed by `flask build-assets` (see assets.py); raw files otherwise
+    built_assets = init_assets(app, FRONTEND_FOLDER)
+
     @app.route('/')
     def serve_index():
+        if built_assets: return built_assets.response('app.html')
         return send_from_directory(FRONTEND_FOLDER, 'app.html')
 
     @app.route('/<path:filename>')
     def serve_static(filename):
+        if built_assets: return built_assets.response(filename)
         return send_from_directory(FRONTEND_FOLDER, filename)
 
-    # === SCHEDULER ===
+    # === SCHEMA MIGRATIONS (flask db upgrade / flask check-query-plans) ===
+    init_schema(app)
+
+    # === DASHBOARD COUNTERS (flask verify-stats / flask rebuild-stats) ===
+    init_stats(app)
+
+    # === SCHEDULER (only in the dedicated runner - see scheduler.py) ===
+    if run_scheduler is None:
+        run_scheduler = app.config['RUN_SCHEDULER']
+    if run_scheduler:
+        start_scheduler(app)
+
+    return app
+
+def start_scheduler(app):
+    # Only the scheduler runner needs APScheduler, keep it out of the web workers' startup
+    from flask_apscheduler import APScheduler
     scheduler = APScheduler()
     scheduler.init_app(app)
 
-    @scheduler.task('interval', id='check_reminders', minutes=1)
+    tick_seconds = app.config['SCHEDULER_TICK_SECONDS']
+    shard_index = app.config['SCHEDULER_SHARD_INDEX']
+    shard_count = app.config['SCHEDULER_SHARD_COUNT']
+    # One lease per shard: a second runner for the same shard just idles
+    lease_name = f"reminders-{shard_index}-of-{shard_count}"
+    holder = f"{socket.gethostname()}:{os.getpid()}"
+
+    def keep_lease():
+        return acquire_lease(lease_name, holder, ttl_seconds=tick_seconds * 3)
+
+    @scheduler.task('interval', id='check_reminders', seconds=tick_seconds, max_instances=1, coalesce=True)
     def check_due_reminders():
         with app.app_context():
             try:
-                now_utc = datetime.now(timezone.utc)
-                active_todos = Todo.query.filter(Todo.completed == False).all()
-
-                if not active_todos: return
-
-                for todo in active_todos:
-                    user = db.session.get(User, todo.user_id)
-                    if not user or not todo.due_date: continue
-
-                    # Handle Timezones
-                    user_tz_str = user.timezone if user.timezone else 'UTC'
-                    try: user_tz = ZoneInfo(user_tz_str)
-                    except: user_tz = timezone.utc
-
-                    # Normalize Dates
-                    db_date = todo.due_date
-                    if db_date.tzinfo is None:
-                        task_time_local = db_date.replace(tzinfo=user_tz)
-                    else:
-                        task_time_local = db_date.astimezone(user_tz)
-
-                    task_time_utc = task_time_local.astimezone(timezone.utc)
-                    time_remaining = task_time_utc - now_utc
-                    minutes_remaining = time_remaining.total_seconds() / 60
-
-                    # 1. AUTO-COMPLETE
-                    if minutes_remaining < 0:
-                        print(f"   ✅ Auto-Completing: {todo.title}")
-                        todo.completed = True
-                        if todo.subtasks:
-                            new_subtasks = []
-                            for sub in todo.subtasks:
-                                sub_copy = sub.copy()
-                                sub_copy['completed'] = True
-                                new_subtasks.append(sub_copy)
-                            todo.subtasks = new_subtasks
-
-                        # RECURRENCE
-                        if todo.recurrence != 'never':
-                            next_date = None
-                            if todo.recurrence == 'daily':
-                                next_date = todo.due_date + timedelta(days=1)
-                            elif todo.recurrence == 'weekly':
-                                next_date = todo.due_date + timedelta(weeks=1)
-                            elif todo.recurrence == 'monthly':
-                                next_date = todo.due_date + timedelta(days=30)
-                            
-                            if next_date:
-                                next_task = Todo(
-                                    user_id=todo.user_id,
-                                    title=todo.title,
-                                    notes=todo.notes,
-                                    priority=todo.priority,
-                                    category=todo.category,
-                                    tags=todo.tags,
-                                    recurrence=todo.recurrence,
-                                    reminder_minutes=todo.reminder_minutes,
-                                    due_date=next_date,
-                                    completed=False,
-                                    reminder_sent=False,
-                                    subtasks=todo.subtasks 
-                                )
-                                if next_task.subtasks:
-                                    reset_subs = []
-                                    for s in next_task.subtasks:
-                                        s_reset = s.copy()
-                                        s_reset['completed'] = False
-                                        reset_subs.append(s_reset)
-                                    next_task.subtasks = reset_subs
-                                db.session.add(next_task)
-
-                        db.session.commit()
-                        continue 
-
-                    # 2. REMINDER
-                    if not todo.reminder_sent and minutes_remaining <= (todo.reminder_minutes + 1) and minutes_remaining > 0:
-                        formatted_time = task_time_local.strftime('%Y-%m-%d %I:%M %p')
-                        if user.email:
-                            print(f"   🔔 Sending email to {user.email}")
-                            send_reminder_email(user.email, todo.title, formatted_time)
-                        todo.reminder_sent = True
-                        db.session.commit()
+                if not keep_lease():
+                    return
+                # keep_lease is renewed between chunks: a long tick stops if another runner took over
+                report = run_tick(
+                    tick_seconds, app.config['SCHEDULER_BATCH_SIZE'], shard_index, shard_count, keep_lease=keep_lease,
+                    tombstone_days=app.config['SYNC_TOMBSTONE_DAYS'] if shard_index == 0 else None,
+                    event_retention_minutes=app.config['EVENTS_RETENTION_MINUTES'] if shard_index == 0 else None,
+                    outbox_retention_days=app.config['MAIL_OUTBOX_RETENTION_DAYS'] if shard_index == 0 else None
+                )
+                if report['scanned']:
+                    print(f"   ⏱️ Scheduler tick [{lease_name}]: {report}")
             except Exception as e:
                 # FIXED: Log error instead of print/pass
                 logging.error(f"Error in scheduler: {e}")
+                SCHEDULER_TICK_ERRORS.inc()
                 db.session.rollback()
 
     try: 
@@ -161,17 +136,26 @@ def create_app():
         # FIXED: Log error instead of pass
         logging.warning(f"Scheduler failed to start (or already running): {e}")
 
-    with app.app_context():
-        db.create_all()
+    # === MAIL OUTBOX WORKER ===
+    mail_worker = MailWorker(app)
+    app.extensions['mail_worker'] = mail_worker
+    mail_worker.start()
 
-    return app
+    # === AVATAR THUMBNAILS ===
+    thumbnail_worker = ThumbnailWorker(app)
+    app.extensions['thumbnail_worker'] = thumbnail_worker
+    thumbnail_worker.start()
+    return scheduler
 
-# === 1. CREATE APP FIRST (CRITICAL FOR GUNICORN) ===
-app = create_app()
+# Importing this module builds nothing: gunicorn serves wsgi:app, `flask` finds create_app,
+# scheduler.py builds its own. A second create_app() in one process would also register
+# the Prometheus metrics twice.
 
-# === 2. RUN APP ===
+# === DEV SERVER ===
 if __name__ == '__main__':
+    app = create_app()
     # FIXED: Secure Debug Mode
     # Only use debug if explicitly told to via environment variable
     debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() in ['true', '1', 't']
+    upgrade_schema(app)
     app.run(debug=debug_mode, host='0.0.0.0', port=5000) # nosec
\ No newline at end of file
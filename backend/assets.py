@@ -0,0 +1,149 @@
+# backend/assets.py
+# Fingerprinted, precompressed frontend assets.
+#
+#   flask build-assets    frontend/ -> frontend/dist/ (run by the Docker build):
+#                         - every asset also gets a content-hashed copy (script.3f2a9c1e.js)
+#                         - the HTML pages are rewritten to reference those copies
+#                         - compressible files get .br (if Brotli is installed) and .gz siblings
+#                         - manifest.json lists every file with its ETag and encodings
+#
+# When the manifest is there, create_app serves from dist/: Accept-Encoding picks the
+# precompressed file, hashed names are cached for a year (immutable), and HTML and
+# unhashed names revalidate against the manifest ETag, so a 304 never touches the disk.
+# Without a build (local dev, SERVE_BUILT_ASSETS=false) frontend/ is served as before.
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+from flask import current_app, request, send_file, abort
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BUILD_FOLDER = 'dist'
+MANIFEST = 'manifest.json'
+ASSET_EXTENSIONS = {'.js', '.css', '.svg', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.ico', '.woff2', '.webmanifest'}
+COMPRESSIBLE = {'.html', '.js', '.css', '.svg', '.webmanifest'}
+ENCODINGS = (('br', '.br'), ('gzip', '.gz')) # preference order when the client accepts both
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+# href="style.css" / src="script.js": same-folder references in the HTML pages
+REFERENCE = re.compile(r'''((?:href|src)=["'])([^"'/:?#]+)(["'])''')
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+def compressed_variants(data):
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None: variants['br'] = brotli.compress(data, quality=11)
+    # Tiny files can come out bigger: those are only served as is
+    return {enc: blob for enc, blob in variants.items() if len(blob) < len(data)}
+
+# =========================================================
+# 1. BUILD (flask build-assets)
+# =========================================================
+
+def build_assets(src, out):
+    """Writes the build into `out` (replacing it) and returns the manifest."""
+    if os.path.isdir(out): shutil.rmtree(out)
+    os.makedirs(out)
+    assets, files = {}, {}
+
+    def write(name, data, immutable):
+        with open(os.path.join(out, name), 'wb') as f: f.write(data)
+        encodings = []
+        if os.path.splitext(name)[1] in COMPRESSIBLE:
+            variants = compressed_variants(data)
+            for enc, suffix in ENCODINGS:
+                if enc not in variants: continue
+                with open(os.path.join(out, name + suffix), 'wb') as f: f.write(variants[enc])
+                encodings.append(enc)
+        files[name] = {"etag": content_hash(data)[:20], "encodings": encodings, "immutable": immutable}
+
+    names = sorted(n for n in os.listdir(src) if os.path.isfile(os.path.join(src, n)))
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        if ext not in ASSET_EXTENSIONS: continue
+        with open(os.path.join(src, name), 'rb') as f: data = f.read()
+        assets[name] = f"{stem}.{content_hash(data)[:8]}{ext}"
+        write(assets[name], data, immutable=True)
+        # The plain name stays available (revalidated) for anything not rewritten
+        write(name, data, immutable=False)
+
+    for name in names:
+        if not name.endswith('.html'): continue
+        with open(os.path.join(src, name), encoding='utf-8') as f: page = f.read()
+        page = REFERENCE.sub(lambda m: m.group(1) + assets.get(m.group(2), m.group(2)) + m.group(3), page)
+        write(name, page.encode('utf-8'), immutable=False)
+
+    manifest = {"assets": assets, "files": files}
+    with open(os.path.join(out, MANIFEST), 'w') as f: json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+# =========================================================
+# 2. SERVING
+# =========================================================
+
+class BuiltAssets:
+    def __init__(self, folder, manifest):
+        self.folder = folder
+        self.files = manifest['files']
+
+    def negotiate(self, encodings):
+        accepted = request.accept_encodings
+        for enc, suffix in ENCODINGS:
+            if enc in encodings and accepted[enc]: return enc, suffix
+        return None, ''
+
+    def response(self, name):
+        entry = self.files.get(name)
+        if entry is None: abort(404)
+        encoding, suffix = self.negotiate(entry['encodings'])
+        # Each encoding is a different body, so it needs its own validator
+        etag = f"{entry['etag']}-{encoding}" if encoding else entry['etag']
+        headers = {
+            'Cache-Control': IMMUTABLE if entry['immutable'] else REVALIDATE,
+            'Vary': 'Accept-Encoding',
+            'ETag': f'"{etag}"',
+        }
+        if request.if_none_match.contains(etag):
+            return current_app.response_class(status=304, headers=headers)
+
+        response = send_file(
+            os.path.join(self.folder, name + suffix),
+            mimetype=mimetypes.guess_type(name)[0] or 'application/octet-stream',
+            etag=False, conditional=False
+        )
+        response.headers.update(headers)
+        if encoding: response.headers['Content-Encoding'] = encoding
+        return response
+
+def load_built_assets(folder):
+    """BuiltAssets for a build folder, or None if it was never built."""
+    try:
+        with open(os.path.join(folder, MANIFEST)) as f: manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    return BuiltAssets(folder, manifest)
+
+def init_assets(app, frontend_folder):
+    build_folder = os.path.join(frontend_folder, BUILD_FOLDER)
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        manifest = build_assets(frontend_folder, build_folder)
+        for name, hashed in sorted(manifest['assets'].items()):
+            encodings = ', '.join(manifest['files'][hashed]['encodings']) or 'uncompressed'
+            print(f"📦 {name} -> {hashed} ({encodings})")
+        if brotli is None: print("⚠️ Brotli not installed: gzip variants only")
+
+    if not app.config['SERVE_BUILT_ASSETS']: return None
+    return load_built_assets(build_folder)
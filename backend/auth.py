@@ -2,23 +2,23 @@
 
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from werkzeug.utils import secure_filename
-from models import db, User
+from models import db, User, Todo
 from mailer import send_reset_code
+from passwords import PasswordHasherBusy
+from profiles import profiles, UserProfile
+from avatars import (storage_configured, presign_upload, is_upload_key, queue_thumbnails,
+                     latest_upload, ALLOWED_CONTENT_TYPES)
 import secrets # <--- CHANGED: Use secrets instead of random
 import string
-import os
 import re 
 from datetime import datetime, timedelta, timezone
-import boto3 
-from botocore.exceptions import NoCredentialsError 
 
 auth_bp = Blueprint('auth', __name__)
 
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+@auth_bp.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(e):
+    # Hashing pool full: shed the login/signup rather than queue it behind others
+    return jsonify({"message": "Server busy, please try again"}), 503, {"Retry-After": "1"}
 
 # PASSWORD VALIDATOR
 def is_strong_password(password):
@@ -60,43 +60,41 @@ def login():
     user = User.query.filter_by(email=data['email']).first()
     
     if user and user.check_password(data['password']):
+        if db.session.is_modified(user):
+            db.session.commit() # hash was upgraded to the current PASSWORD_HASH_METHOD
         token = create_access_token(identity=str(user.id))
         
-        # === CLOUD COMPATIBILITY FIX ===
-        # If the avatar is already a full URL (from S3), use it as is.
-        # If it is a relative path (old local files), prepend static.
-        avatar_url = user.avatar
-        if avatar_url and not avatar_url.startswith('http') and not avatar_url.startswith('/'):
-            avatar_url = f"/static/avatars/{user.avatar}"
-        elif avatar_url and avatar_url.startswith('/'):
-            avatar_url = user.avatar
-        # If it starts with 'http', it's an S3 URL, so we leave it alone.
+        # Warm the profile cache for the todo requests that follow
+        # (avatar: S3 URLs as is, old local filenames under /static/avatars)
+        profile = UserProfile.from_row(user)
+        profiles.put(profile)
 
         return jsonify({
             "token": token,
-            "user": {
-                "name": user.name,
-                "nickname": user.nickname,
-                "avatar": avatar_url, 
-                "email": user.email,
-                "phone": user.phone,
-                "timezone": user.timezone
-            }
+            "user": profile.to_dict()
         })
     return jsonify({"message": "Invalid credentials"}), 401
 
-# UPDATE PROFILE ROUTE (AWS S3 IMPLEMENTED)
+# UPDATE PROFILE ROUTE
 @auth_bp.route('/profile', methods=['PUT'])
 @jwt_required()
 def update_profile():
     user_id = int(get_jwt_identity())
     user = db.session.get(User, user_id)
     if not user: return jsonify({"message": "User not found"}), 404
+
+    # Avatars no longer stream through the web worker: see the /profile/avatar routes below
+    if 'avatar' in request.files:
+        return jsonify({"message": "Upload avatars with POST /api/profile/avatar/upload"}), 400
     
     if 'name' in request.form: user.name = request.form['name']
     if 'nickname' in request.form: user.nickname = request.form['nickname']
     if 'phone' in request.form: user.phone = request.form['phone']
-    if 'timezone' in request.form: user.timezone = request.form['timezone']
+    if 'timezone' in request.form and request.form['timezone'] != user.timezone:
+        user.timezone = request.form['timezone']
+        # Due dates are wall-clock times, so the scheduler queue moves with the zone
+        for todo in Todo.query.filter(Todo.user_id == user_id, Todo.completed == False, Todo.due_date.isnot(None)):
+            todo.refresh_next_action(user.timezone)
     
     if 'new_password' in request.form and request.form['new_password']:
         new_pass = request.form['new_password']
@@ -104,57 +102,54 @@ def update_profile():
             return jsonify({"message": "Password too weak."}), 400
         user.set_password(new_pass)
 
-    # === AWS S3 UPLOAD LOGIC ===
-    if 'avatar' in request.files:
-        file = request.files['avatar']
-        if file and allowed_file(file.filename):
-            # 1. Create a safe filename
-            filename = secure_filename(f"user_{user_id}_{file.filename}")
-
-            # 2. Add the folder path (This creates the "avatars" folder automatically)
-            s3_key = f"avatars/{filename}"
-
-            # 1. Get Credentials from Environment
-            s3_access_key = os.environ.get('AWS_ACCESS_KEY_ID')
-            s3_secret_key = os.environ.get('AWS_SECRET_ACCESS_KEY')
-            s3_bucket = os.environ.get('AWS_BUCKET_NAME')
-            s3_region = os.environ.get('AWS_REGION')
-
-            if not all([s3_access_key, s3_secret_key, s3_bucket, s3_region]):
-                return jsonify({"message": "Server S3 configuration missing"}), 500
-
-            # 2. Initialize S3 Client
-            s3 = boto3.client(
-                's3',
-                aws_access_key_id=s3_access_key,
-                aws_secret_access_key=s3_secret_key,
-                region_name=s3_region
-            )
-
-            try:
-                # 3. Upload File to S3
-                # 'ACL': 'public-read' makes it visible to the browser
-                # 'ContentType' ensures the browser knows it's an image, not a download
-                s3.upload_fileobj(
-                    file,
-                    s3_bucket,
-                    s3_key,  # This is the "filename" in the bucket, including the folder path
-                    ExtraArgs={
-                        "ACL": "public-read",
-                        "ContentType": file.content_type
-                    }
-                )
-
-                # 4. Save the FULL Public URL to the Database including the folder 
-                user.avatar = f"https://{s3_bucket}.s3.{s3_region}.amazonaws.com/{s3_key}"
-
-            except Exception as e:
-                print(f"S3 Upload Error: {e}")
-                return jsonify({"message": "Failed to upload image to cloud"}), 500
-
     db.session.commit()
+    profiles.invalidate(user_id)
     return jsonify({"message": "Profile updated", "avatar": user.avatar})
 
+# AVATAR UPLOAD, STEP 1: a presigned form, the browser sends the file straight to S3
+@auth_bp.route('/profile/avatar/upload', methods=['POST'])
+@jwt_required()
+def avatar_upload_form():
+    user_id = int(get_jwt_identity())
+    if not storage_configured(current_app.config):
+        return jsonify({"message": "Server S3 configuration missing"}), 500
+
+    content_type = (request.get_json(silent=True) or {}).get('content_type')
+    if content_type not in ALLOWED_CONTENT_TYPES:
+        return jsonify({"message": "Avatar must be a PNG, JPEG, GIF or WebP image"}), 400
+    return jsonify(presign_upload(current_app.config, user_id, content_type))
+
+# AVATAR UPLOAD, STEP 2: the file is in the bucket, queue the thumbnails
+@auth_bp.route('/profile/avatar', methods=['PUT'])
+@jwt_required()
+def confirm_avatar_upload():
+    user_id = int(get_jwt_identity())
+    key = (request.get_json(silent=True) or {}).get('key')
+    if not is_upload_key(user_id, key):
+        return jsonify({"message": "Invalid upload key"}), 400
+
+    queue_thumbnails(user_id, key)
+    db.session.commit()
+    return jsonify({"status": "pending"}), 202
+
+# AVATAR UPLOAD, STEP 3: polled until the thumbnails are ready
+@auth_bp.route('/profile/avatar', methods=['GET'])
+@jwt_required()
+def avatar_status():
+    user_id = int(get_jwt_identity())
+    upload = latest_upload(user_id)
+    # Straight from the database: the profile cache may be a few seconds behind the worker
+    user = db.session.get(User, user_id)
+    if not user: return jsonify({"message": "User not found"}), 404
+    profile = UserProfile.from_row(user)
+    profiles.put(profile)
+    body = profile.to_dict()
+    return jsonify({
+        "status": upload.status if upload else None,
+        "error": upload.last_error if upload and upload.status == 'failed' else None,
+        "avatar": body["avatar"], "avatar_small": body["avatar_small"]
+    })
+
 # FORGOT PASSWORD 
 @auth_bp.route('/forgot-password', methods=['POST'])
 def forgot_password():
@@ -169,9 +164,10 @@ def forgot_password():
     
     user.reset_token = code
     user.reset_token_expiry = datetime.now(timezone.utc) + timedelta(minutes=15)
+    # Queued in the outbox, committed together with the token
+    send_reset_code(user.email, code)
     db.session.commit()
     
-    send_reset_code(user.email, code)
     return jsonify({"message": "Reset code sent"}), 200
 
 # RESET PASSWORD
@@ -194,5 +190,6 @@ def reset_password():
     user.reset_token = None
     user.reset_token_expiry = None
     db.session.commit()
+    profiles.invalidate(user.id)
     
     return jsonify({"message": "Password reset successfully"}), 200
\ No newline at end of file
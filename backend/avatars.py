@@ -0,0 +1,286 @@
+# backend/avatars.py
+# Avatar uploads go straight from the browser to S3; thumbnails are made in the background.
+#
+#   1. POST /api/profile/avatar/upload  presigned POST form for uploads/avatars/<user_id>/<token>
+#   2. the browser POSTs the file to the bucket - the bytes never pass through a web worker
+#   3. PUT  /api/profile/avatar {key}   queues an AvatarUpload row
+#   4. ThumbnailWorker (scheduler runner) reads the original, writes THUMBNAIL_SIZES squares
+#      to avatars/<user_id>/<token>_<size>.webp, points User.avatar at the largest one and
+#      deletes the original
+#   5. GET  /api/profile/avatar         status of the latest upload, polled by the profile page
+#
+# The bucket needs a CORS rule allowing POST from the app's origin, and ideally a lifecycle
+# rule expiring uploads/ after a day (forms that were signed but never confirmed).
+# Local S3 stand-in: set S3_ENDPOINT_URL to a MinIO or `moto_server` address.
+
+import io
+import logging
+import re
+import secrets
+import threading
+from datetime import timedelta
+from sqlalchemy import select, update, exists
+from models import db, User, AvatarUpload, utc_now
+
+UPLOAD_PREFIX = 'uploads/avatars/'
+THUMBNAIL_PREFIX = 'avatars/'
+THUMBNAIL_SIZES = (80, 240) # square px: the header uses the small one, User.avatar is the large one
+ALLOWED_CONTENT_TYPES = {'image/png', 'image/jpeg', 'image/gif', 'image/webp'}
+MAX_PIXELS = 40_000_000 # decoded size cap, well below what would exhaust the runner's memory
+BATCH_SIZE = 10
+RETRY_BACKOFF_SECONDS = 30
+
+THUMBNAIL_NAME = re.compile(r'_\d+\.webp$')
+
+class InvalidAvatar(Exception):
+    # Not an image we can use: fail the upload without retrying
+    pass
+
+# =========================================================
+# 1. S3 CLIENT (one per process, shared by all threads)
+# =========================================================
+
+_client = None
+_client_lock = threading.Lock()
+
+def storage_configured(config):
+    return bool(config['AWS_BUCKET_NAME'] and config['AWS_REGION'])
+
+def s3_client(config):
+    # boto3 clients are thread-safe and pool their HTTPS connections, so building one per
+    # request only threw away the TLS handshakes. Created on first use, i.e. after the fork.
+    global _client
+    with _client_lock:
+        if _client is None:
+            # boto3 costs ~150ms to import: loaded on the first avatar request, not at startup
+            import boto3
+            from botocore.config import Config as BotoConfig
+            _client = boto3.client(
+                's3',
+                aws_access_key_id=config['AWS_ACCESS_KEY_ID'],
+                aws_secret_access_key=config['AWS_SECRET_ACCESS_KEY'],
+                region_name=config['AWS_REGION'],
+                endpoint_url=config['S3_ENDPOINT_URL'],
+                config=BotoConfig(
+                    signature_version='s3v4',
+                    max_pool_connections=config['S3_MAX_POOL_CONNECTIONS'],
+                    retries={'max_attempts': 3, 'mode': 'standard'},
+                    # MinIO / moto serve buckets under the path, not as subdomains
+                    s3={'addressing_style': 'path' if config['S3_ENDPOINT_URL'] else 'auto'},
+                ),
+            )
+        return _client
+
+def public_url(config, key):
+    base = config['S3_PUBLIC_URL']
+    if not base and config['S3_ENDPOINT_URL']:
+        base = f"{config['S3_ENDPOINT_URL'].rstrip('/')}/{config['AWS_BUCKET_NAME']}"
+    if not base:
+        base = f"https://{config['AWS_BUCKET_NAME']}.s3.{config['AWS_REGION']}.amazonaws.com"
+    return f"{base.rstrip('/')}/{key}"
+
+def thumbnail_url(avatar, size):
+    # avatars/<user_id>/<token>_240.webp -> ..._80.webp; anything else (old uploads) as is
+    if avatar and THUMBNAIL_NAME.search(avatar):
+        return THUMBNAIL_NAME.sub(f'_{size}.webp', avatar)
+    return avatar
+
+# =========================================================
+# 2. PRESIGNED UPLOADS (called from auth.py)
+# =========================================================
+
+def presign_upload(config, user_id, content_type):
+    """A form the browser POSTs the file to; signed locally, no call to S3."""
+    key = f"{UPLOAD_PREFIX}{user_id}/{secrets.token_hex(8)}"
+    max_bytes = config['AVATAR_MAX_BYTES']
+    form = s3_client(config).generate_presigned_post(
+        Bucket=config['AWS_BUCKET_NAME'],
+        Key=key,
+        Fields={'Content-Type': content_type},
+        Conditions=[{'Content-Type': content_type}, ['content-length-range', 1, max_bytes]],
+        ExpiresIn=config['AVATAR_UPLOAD_EXPIRES_SECONDS'],
+    )
+    return {"url": form['url'], "fields": form['fields'], "key": key, "max_bytes": max_bytes}
+
+def is_upload_key(user_id, key):
+    return isinstance(key, str) and re.fullmatch(rf"{UPLOAD_PREFIX}{user_id}/[0-9a-f]{{16}}", key) is not None
+
+def queue_thumbnails(user_id, key):
+    # Older uploads still waiting are superseded by this one
+    db.session.execute(
+        update(AvatarUpload)
+        .where(AvatarUpload.user_id == user_id, AvatarUpload.status == 'pending')
+        .values(status='failed', last_error='superseded', next_attempt_at=None, finished_at=utc_now())
+    )
+    upload = AvatarUpload(user_id=user_id, upload_key=key)
+    db.session.add(upload)
+    return upload
+
+def latest_upload(user_id):
+    return db.session.execute(
+        select(AvatarUpload.status, AvatarUpload.last_error)
+        .where(AvatarUpload.user_id == user_id).order_by(AvatarUpload.id.desc()).limit(1)
+    ).first()
+
+# =========================================================
+# 3. THUMBNAILS
+# =========================================================
+
+def render_thumbnails(data):
+    """{size: webp bytes} of centre-cropped squares. Raises InvalidAvatar."""
+    # Pillow is only needed here, in the scheduler runner
+    from PIL import Image, ImageOps, UnidentifiedImageError
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            if img.width * img.height > MAX_PIXELS: raise InvalidAvatar("Image is too large")
+            img = ImageOps.exif_transpose(img) # phone photos: apply the rotation flag
+            img = img.convert('RGBA')
+            thumbnails = {}
+            for size in THUMBNAIL_SIZES:
+                thumb = ImageOps.fit(img, (size, size), Image.Resampling.LANCZOS)
+                buf = io.BytesIO()
+                thumb.save(buf, 'WEBP', quality=85, method=4)
+                thumbnails[size] = buf.getvalue()
+            return thumbnails
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError) as e:
+        raise InvalidAvatar("Not a usable image") from e
+
+def upload_token(key):
+    return key.rsplit('/', 1)[-1]
+
+def thumbnail_keys(user_id, token):
+    return {size: f"{THUMBNAIL_PREFIX}{user_id}/{token}_{size}.webp" for size in THUMBNAIL_SIZES}
+
+class ThumbnailWorker:
+    def __init__(self, app):
+        self.app = app
+        self.config = app.config
+        self.poll_seconds = app.config['AVATAR_POLL_SECONDS']
+        self.max_attempts = app.config['AVATAR_MAX_ATTEMPTS']
+        self.lease = timedelta(minutes=5)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _claim_batch(self):
+        now = utc_now()
+        ids = db.session.scalars(
+            select(AvatarUpload.id)
+            .where(AvatarUpload.status.in_(['pending', 'processing']), AvatarUpload.next_attempt_at <= now)
+            .order_by(AvatarUpload.next_attempt_at)
+            .limit(BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not ids:
+            db.session.commit()
+            return []
+        db.session.execute(
+            update(AvatarUpload).where(AvatarUpload.id.in_(ids))
+            .values(status='processing', next_attempt_at=now + self.lease)
+        )
+        rows = db.session.execute(
+            select(AvatarUpload.id, AvatarUpload.user_id, AvatarUpload.upload_key, AvatarUpload.attempts)
+            .where(AvatarUpload.id.in_(ids)).order_by(AvatarUpload.id)
+        ).all()
+        db.session.commit()
+        return rows
+
+    def _make_thumbnails(self, user_id, upload_key):
+        # No DB access: returns the public URL of the largest thumbnail
+        from botocore.exceptions import ClientError
+        client, bucket = s3_client(self.config), self.config['AWS_BUCKET_NAME']
+        try:
+            obj = client.get_object(Bucket=bucket, Key=upload_key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                raise InvalidAvatar("The upload never reached the bucket")
+            raise
+        if obj['ContentLength'] > self.config['AVATAR_MAX_BYTES']: raise InvalidAvatar("File is too large")
+        thumbnails = render_thumbnails(obj['Body'].read())
+        keys = thumbnail_keys(user_id, upload_token(upload_key))
+        for size, body in thumbnails.items():
+            client.put_object(
+                Bucket=bucket, Key=keys[size], Body=body, ContentType='image/webp', ACL='public-read',
+                # The token changes with every upload, so the URL never serves other content
+                CacheControl='public, max-age=31536000, immutable'
+            )
+        return public_url(self.config, keys[max(THUMBNAIL_SIZES)])
+
+    def _delete_objects(self, keys):
+        if not keys: return
+        try:
+            s3_client(self.config).delete_objects(
+                Bucket=self.config['AWS_BUCKET_NAME'], Delete={'Objects': [{'Key': k} for k in keys], 'Quiet': True}
+            )
+        except Exception as e:
+            logging.warning(f"Avatar cleanup failed for {keys}: {e}")
+
+    def _finish(self, upload_id, user_id, upload_key, avatar):
+        now = utc_now()
+        newer_done = db.session.scalar(select(exists().where(
+            AvatarUpload.user_id == user_id, AvatarUpload.id > upload_id, AvatarUpload.status == 'done'
+        )))
+        stale = []
+        if newer_done:
+            # A later upload finished first: this one's thumbnails are unused
+            stale.extend(thumbnail_keys(user_id, upload_token(upload_key)).values())
+        else:
+            old_avatar = db.session.scalar(select(User.avatar).where(User.id == user_id))
+            old = re.search(rf"/{THUMBNAIL_PREFIX}{user_id}/([0-9a-f]{{16}})_\d+\.webp$", old_avatar or '')
+            if old: stale.extend(thumbnail_keys(user_id, old.group(1)).values())
+            db.session.execute(update(User).where(User.id == user_id).values(avatar=avatar))
+        db.session.execute(
+            update(AvatarUpload).where(AvatarUpload.id == upload_id)
+            .values(status='done', next_attempt_at=None, last_error=None, finished_at=now)
+        )
+        # Runs in the scheduler process: web workers' profile caches pick the new
+        # avatar up within PROFILE_CACHE_TTL_SECONDS
+        db.session.commit()
+        self._delete_objects([upload_key] + stale)
+
+    def _fail(self, upload_id, attempts, upload_key, error, permanent):
+        now = utc_now()
+        tries = (attempts or 0) + 1
+        values = {"attempts": tries, "last_error": str(error)[:500]}
+        if permanent or tries >= self.max_attempts:
+            logging.error(f"Avatar upload {upload_id} failed permanently: {error}")
+            values.update(status='failed', next_attempt_at=None, finished_at=now)
+        else:
+            delay = RETRY_BACKOFF_SECONDS * (2 ** (tries - 1))
+            values.update(status='pending', next_attempt_at=now + timedelta(seconds=delay))
+        db.session.execute(update(AvatarUpload).where(AvatarUpload.id == upload_id).values(**values))
+        db.session.commit()
+        if values['status'] == 'failed': self._delete_objects([upload_key])
+
+    def drain_once(self):
+        """Process one batch of uploads. Returns how many were handled."""
+        batch = self._claim_batch()
+        for upload_id, user_id, upload_key, attempts in batch:
+            try:
+                avatar = self._make_thumbnails(user_id, upload_key)
+            except InvalidAvatar as e:
+                self._fail(upload_id, attempts, upload_key, e, permanent=True)
+            except Exception as e:
+                self._fail(upload_id, attempts, upload_key, e, permanent=False)
+            else:
+                self._finish(upload_id, user_id, upload_key, avatar)
+        return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    handled = self.drain_once()
+                except Exception as e:
+                    logging.error(f"Thumbnail worker error: {e}")
+                    db.session.rollback()
+                    handled = 0
+            if not handled: self._stop.wait(self.poll_seconds)
+
+    def start(self):
+        if self._thread: return
+        self._thread = threading.Thread(target=self._run, name='avatar-thumbnails', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread: self._thread.join(timeout=30)
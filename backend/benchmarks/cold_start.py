@@ -0,0 +1,61 @@
+# backend/benchmarks/cold_start.py
+# Cold start: fresh interpreter -> wsgi app built -> first request answered.
+#
+#   cd backend && python -m benchmarks.cold_start [--runs 7] [--target-ms 750]
+#
+# Each run is a new process (nothing cached in memory; the OS file cache is warm after the
+# first one, as it is when gunicorn restarts a worker). Exits 1 if the median build time
+# misses the target. Measured on a 1-vCPU dev box: ~900ms per app build before the lazy imports
+# (and wsgi.py built two), ~600ms after.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+TARGET_MS = 750
+
+# Runs in the child: timings in ms, printed as one JSON line
+PROBE = """
+import json, time
+start = time.perf_counter()
+import wsgi
+built = time.perf_counter()
+client = wsgi.app.test_client()
+status = client.get('/api/todos').status_code # 401 without a token: routing, JWT, JSON error
+first = time.perf_counter()
+print(json.dumps({"build": (built - start) * 1000, "first_request": (first - built) * 1000, "status": status}))
+"""
+
+def run_once(env):
+    out = subprocess.run(
+        [sys.executable, '-c', PROBE], env=env, check=True, capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--target-ms', type=float, default=TARGET_MS)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='protodo-bench-'), 'cold.db')}")
+    run_once(env) # warm the OS file cache / .pyc files
+    results = [run_once(env) for _ in range(args.runs)]
+
+    build = statistics.median(r['build'] for r in results)
+    first = statistics.median(r['first_request'] for r in results)
+    print(f"runs: {args.runs}  build median {build:.0f}ms (max {max(r['build'] for r in results):.0f}ms)"
+          f"  first request median {first:.1f}ms  target {args.target_ms:.0f}ms")
+    if build > args.target_ms:
+        print("❌ cold start over target")
+        sys.exit(1)
+    print("✅ cold start within target")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+# backend/benchmarks/load.py
+# Load benchmark: seeds N users x M todos, drives the hot endpoints, writes a JSON report.
+#
+#   cd backend && python -m benchmarks.load [--users 50] [--todos 200] [--requests 300]
+#                                            [--concurrency 1] [--out load_results.json]
+#   # against a running server sharing the same database:
+#   DATABASE_URL=postgresql://... python -m benchmarks.load --base-url http://localhost:5000 --concurrency 16
+#   # compare with an earlier run (exit 1 if a p95 got more than 25% worse):
+#   python -m benchmarks.load --compare old.json
+#
+# Phases: login, get_todos, create_todo, update_todo, bulk_delete (the todos created
+# earlier, 10 per request) and scheduler_tick (always in-process). Each reports p50 / p95 /
+# p99 / max latency in ms, throughput and errors; peak RSS of this process is recorded too
+# (it includes the app itself unless --base-url is used). The data generator is seeded,
+# so two runs with the same arguments load identical data.
+#
+# Without DATABASE_URL a throwaway SQLite file is used. A given database must be empty:
+# the schema is migrated and filled here.
+
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Must be set before config.py is imported
+if not os.environ.get('DATABASE_URL'):
+    DB_FILE = os.path.join(tempfile.mkdtemp(prefix='protodo-bench-'), 'load.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{DB_FILE}'
+
+from sqlalchemy import insert, select, update, func
+from werkzeug.security import generate_password_hash
+from wsgi import app
+from models import db, User, Todo, compute_next_action_at, utc_now
+from schema import upgrade_schema
+from stats import rebuild_stats
+from reminders import run_tick
+
+PASSWORD = 'Bench-passw0rd!'
+TIMEZONES = ['UTC', 'Africa/Lagos', 'Europe/London', 'America/New_York', 'America/Los_Angeles',
+             'Asia/Kolkata', 'Asia/Tokyo', 'Australia/Sydney']
+CATEGORIES = ['personal', 'work', 'urgent', 'medical', 'other']
+PRIORITIES = ['low', 'medium', 'high']
+TAGS = ['home', 'errand', 'q3', 'finance', 'gym', 'family', 'reading', 'deep-work', 'call', 'travel']
+VERBS = ['Buy', 'Call', 'Email', 'Review', 'Book', 'Fix', 'Plan', 'Write', 'Pay', 'Clean']
+NOUNS = ['groceries', 'dentist', 'report', 'car insurance', 'flights', 'garden', 'slides',
+         'rent', 'kitchen', 'budget', 'café order ☕', 'team sync']
+PRESETS = ['daily', 'weekly', 'monthly', 'yearly']
+CUSTOM_RULES = ['FREQ=WEEKLY;BYDAY=MO,WE,FR', 'FREQ=MONTHLY;BYDAY=1MO', 'FREQ=DAILY;INTERVAL=2']
+
+# =========================================================
+# 1. SYNTHETIC DATA
+# =========================================================
+
+def fake_todo(rng, user_id, tz, now):
+    due = None
+    if rng.random() < 0.85:
+        due = (now + timedelta(minutes=rng.randint(-60 * 24 * 30, 60 * 24 * 60))).replace(second=0, microsecond=0)
+
+    recurrence, rrule, series_start = 'never', None, None
+    roll = rng.random()
+    if due is not None and roll < 0.03: recurrence, rrule = 'custom', rng.choice(CUSTOM_RULES)
+    elif due is not None and roll < 0.18: recurrence = rng.choice(PRESETS)
+    if recurrence != 'never': series_start = due
+
+    completed = recurrence == 'never' and rng.random() < 0.35
+    reminder_minutes = rng.choice([2, 5, 15, 30, 60, 1440])
+    subtasks = [
+        {"id": f"{rng.getrandbits(32):08x}", "text": f"Step {i + 1}", "completed": rng.random() < 0.4}
+        for i in range(rng.choice([0, 0, 0, 1, 2, 3, 5]))
+    ]
+    created = now - timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+    return {
+        "user_id": user_id,
+        "title": f"{rng.choice(VERBS)} {rng.choice(NOUNS)}",
+        "notes": rng.choice(['', '', 'Remember the receipts.', 'Long notes ' * rng.randint(5, 40)]),
+        "due_date": due,
+        "priority": rng.choice(PRIORITIES),
+        "category": rng.choice(CATEGORIES),
+        "tags": rng.sample(TAGS, rng.randint(0, 3)),
+        "subtasks": subtasks,
+        "recurrence": recurrence,
+        "rrule": rrule,
+        "series_start": series_start,
+        "reminder_minutes": reminder_minutes,
+        "completed": completed,
+        "reminder_sent": False,
+        "next_action_at": compute_next_action_at(due, tz, reminder_minutes, False, completed),
+        "created_at": created,
+        "updated_at": created,
+    }
+
+def seed(rng, users, todos_per_user, batch_size=5000):
+    if db.session.scalar(select(func.count(User.id))):
+        sys.exit("❌ The benchmark database must be empty (unset DATABASE_URL for a throwaway SQLite file)")
+    # One hash for everyone: seeding shouldn't take users x scrypt time
+    password_hash = generate_password_hash(PASSWORD, method=app.config['PASSWORD_HASH_METHOD'])
+    now = datetime.now().replace(microsecond=0)
+    emails, rows = {}, []
+    for i in range(users):
+        tz = rng.choice(TIMEZONES)
+        user = User(email=f"bench{i}@example.com", name=f"Bench {i}", password_hash=password_hash, timezone=tz)
+        db.session.add(user)
+        db.session.flush()
+        emails[user.id] = user.email
+        rows.extend(fake_todo(rng, user.id, tz, now) for _ in range(todos_per_user))
+    for i in range(0, len(rows), batch_size):
+        db.session.execute(insert(Todo), rows[i:i + batch_size])
+    rebuild_stats()
+    db.session.commit()
+    return emails
+
+# =========================================================
+# 2. TRANSPORTS (Flask test client or real HTTP)
+# =========================================================
+
+class TestClientTransport:
+    def __init__(self):
+        self._local = threading.local()
+
+    def request(self, method, path, token=None, body=None):
+        client = getattr(self._local, 'client', None)
+        if client is None: client = self._local.client = app.test_client()
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+
+class HttpTransport:
+    def __init__(self, base_url):
+        import requests
+        self._requests = requests
+        self.base_url = base_url.rstrip('/')
+        self._local = threading.local()
+
+    def request(self, method, path, token=None, body=None):
+        session = getattr(self._local, 'session', None)
+        if session is None: session = self._local.session = self._requests.Session()
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = session.request(method, self.base_url + path, json=body, headers=headers, timeout=60)
+        try: payload = response.json()
+        except ValueError: payload = None
+        return response.status_code, payload
+
+# =========================================================
+# 3. PHASES
+# =========================================================
+
+def percentile(sorted_values, pct):
+    # Nearest rank
+    if not sorted_values: return None
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def run_phase(name, operation, jobs, concurrency, prepare=None):
+    # prepare(job) runs before each operation, outside the timing
+    def timed(job):
+        if prepare: job = prepare(job)
+        start = time.perf_counter()
+        try: ok = operation(job)
+        except Exception: ok = False
+        return time.perf_counter() - start, ok
+
+    wall_start = time.perf_counter()
+    if concurrency <= 1:
+        results = [timed(job) for job in jobs]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(timed, jobs))
+    wall = time.perf_counter() - wall_start
+
+    latencies = sorted(r[0] * 1000 for r in results)
+    report = {
+        "count": len(results),
+        "errors": sum(1 for r in results if not r[1]),
+        "throughput_per_s": round(len(results) / wall, 1) if wall else None,
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else None,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": latencies[-1] if latencies else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms'):
+        if report[key] is not None: report[key] = round(report[key], 2)
+    print(f"{name:>15} {report['count']:>6} {report['errors']:>6} {report['throughput_per_s'] or 0:>9.1f}"
+          f" {report['p50_ms'] or 0:>8.1f} {report['p95_ms'] or 0:>8.1f} {report['p99_ms'] or 0:>8.1f}")
+    return report
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError: # Windows
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+def run_benchmark(args, transport, emails):
+    rng = random.Random(args.seed + 1)
+    user_ids = sorted(emails)
+    tokens, created = {}, {}
+    scenarios = {}
+    print(f"{'phase':>15} {'ops':>6} {'errors':>6} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+
+    def login(user_id):
+        status, body = transport.request('POST', '/api/login', body={"email": emails[user_id], "password": PASSWORD})
+        if status == 200: tokens[user_id] = body['token']
+        return status == 200
+    login_users = [user_ids[i % len(user_ids)] for i in range(args.logins)]
+    scenarios['login'] = run_phase('login', login, login_users, args.concurrency)
+    active = sorted(tokens)
+    if not active: sys.exit("❌ No user could log in")
+
+    def get_todos(user_id):
+        status, body = transport.request('GET', '/api/todos', tokens[user_id])
+        return status == 200
+    scenarios['get_todos'] = run_phase('get_todos', get_todos, [rng.choice(active) for _ in range(args.requests)],
+                                       args.concurrency)
+
+    lock = threading.Lock()
+    def create_todo(user_id):
+        due = (datetime.now() + timedelta(days=rng.randint(1, 30))).strftime('%Y-%m-%dT%H:%M')
+        status, body = transport.request('POST', '/api/todos', tokens[user_id], {
+            "title": f"{rng.choice(VERBS)} {rng.choice(NOUNS)}", "due_date": due,
+            "priority": rng.choice(PRIORITIES), "category": rng.choice(CATEGORIES),
+            "tags": rng.sample(TAGS, 2), "subtasks": [{"text": "First step"}, {"text": "Second step"}],
+            "recurrence": rng.choice(['never', 'never', 'never', 'weekly']),
+        })
+        if status == 201:
+            with lock: created.setdefault(user_id, []).append(body['id'])
+        return status == 201
+    scenarios['create_todo'] = run_phase('create_todo', create_todo,
+                                         [rng.choice(active) for _ in range(args.requests)], args.concurrency)
+
+    with app.app_context():
+        existing = db.session.execute(
+            select(Todo.id, Todo.user_id).where(Todo.user_id.in_(active)).order_by(Todo.id)
+        ).all()
+    def update_todo(job):
+        todo_id, user_id = job
+        status, body = transport.request('PUT', f'/api/todos/{todo_id}', tokens[user_id], {
+            "title": f"{rng.choice(VERBS)} {rng.choice(NOUNS)} (edited)", "priority": rng.choice(PRIORITIES)
+        })
+        return status == 200
+    scenarios['update_todo'] = run_phase('update_todo', update_todo,
+                                         [tuple(rng.choice(existing)) for _ in range(args.requests)], args.concurrency)
+
+    batches = [(user_id, ids[i:i + 10]) for user_id, ids in created.items() for i in range(0, len(ids), 10)]
+    def bulk_delete(job):
+        user_id, ids = job
+        status, body = transport.request('DELETE', '/api/todos/bulk', tokens[user_id], {"ids": ids})
+        return status == 200
+    scenarios['bulk_delete'] = run_phase('bulk_delete', bulk_delete, batches, args.concurrency)
+
+    def make_due(rows):
+        # Every tick starts with `rows` open todos due for a reminder
+        with app.app_context():
+            open_ids = db.session.scalars(select(Todo.id).where(Todo.completed == False).limit(rows * 5)).all()
+            ids = rng.sample(open_ids, min(rows, len(open_ids)))
+            soon = datetime.now().replace(microsecond=0) + timedelta(minutes=10)
+            db.session.execute(update(Todo).where(Todo.id.in_(ids)).values(
+                due_date=soon, reminder_sent=False, next_action_at=utc_now()
+            ))
+            db.session.commit()
+        return rows
+    def scheduler_tick(rows):
+        with app.app_context():
+            return run_tick(60, app.config['SCHEDULER_BATCH_SIZE'])['scanned'] > 0
+    scenarios['scheduler_tick'] = run_phase('scheduler_tick', scheduler_tick, [args.tick_rows] * args.ticks, 1,
+                                            prepare=make_due)
+    return scenarios
+
+# =========================================================
+# 4. REPORT
+# =========================================================
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(old_file, results, threshold):
+    with open(old_file) as f: old = json.load(f)
+    print(f"\nvs {old_file} (commit {old['meta'].get('commit')}):")
+    regressions = []
+    for name, new in results['scenarios'].items():
+        before = old.get('scenarios', {}).get(name)
+        if not before or not before.get('p95_ms') or not new.get('p95_ms'): continue
+        change = new['p95_ms'] / before['p95_ms'] - 1
+        flag = '❌' if change > threshold else '✅'
+        print(f"  {flag} {name:>15} p95 {before['p95_ms']:>8.1f} -> {new['p95_ms']:>8.1f} ms ({change:+.0%})")
+        if change > threshold: regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--todos', type=int, default=200, help='todos per user')
+    parser.add_argument('--requests', type=int, default=300, help='operations per phase')
+    parser.add_argument('--logins', type=int, default=50)
+    parser.add_argument('--ticks', type=int, default=20)
+    parser.add_argument('--tick-rows', type=int, default=200, help='todos due at the start of each tick')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--base-url', help='drive a running server over HTTP instead of the test client')
+    parser.add_argument('--out', default='load_results.json')
+    parser.add_argument('--compare', help='earlier JSON report to compare p95 latencies with')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed p95 slowdown for --compare')
+    args = parser.parse_args()
+
+    upgrade_schema(app)
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        started = time.perf_counter()
+        emails = seed(random.Random(args.seed), args.users, args.todos)
+        print(f"🌱 Seeded {args.users} users x {args.todos} todos ({dialect}) in {time.perf_counter() - started:.1f}s")
+
+    transport = HttpTransport(args.base_url) if args.base_url else TestClientTransport()
+    scenarios = run_benchmark(args, transport, emails)
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "python": sys.version.split()[0],
+            "database": dialect,
+            "target": args.base_url or 'test-client',
+            "users": args.users, "todos_per_user": args.todos, "requests": args.requests,
+            "concurrency": args.concurrency, "seed": args.seed,
+        },
+        "scenarios": scenarios,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    with open(args.out, 'w') as f: json.dump(results, f, indent=2, sort_keys=True)
+    print(f"📄 Wrote {args.out} (peak RSS {results['peak_rss_mb']} MB)")
+
+    if args.compare and compare(args.compare, results, args.threshold):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# backend/benchmarks/serialization.py
+# Micro-benchmark: ORM + jsonify vs column projection + fast encoder for the todo list.
+#
+#   cd backend && python -m benchmarks.serialization [--sizes 100,10000,100000] [--repeat 3]
+
+import argparse
+import os
+import tempfile
+import time
+
+# Throwaway SQLite database; must be set before config.py is imported
+DB_FILE = os.path.join(tempfile.mkdtemp(prefix='protodo-bench-'), 'bench.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_FILE}'
+
+from datetime import datetime, timedelta
+from flask import jsonify
+from sqlalchemy import insert, delete
+from wsgi import app
+from models import db, User, Todo
+from todos import todo_to_dict, LIST_COLUMNS
+from serialize import fast_jsonify, orjson
+from schema import upgrade_schema
+
+def seed(user_id, n):
+    db.session.execute(delete(Todo))
+    now = datetime(2026, 1, 1, 9, 0)
+    rows = [{
+        "user_id": user_id, "title": f"Task {i} – café ☕", "notes": "Some notes " * 5,
+        "due_date": now + timedelta(hours=i), "priority": "high", "category": "work",
+        "tags": ["alpha", "beta"], "recurrence": "never", "reminder_minutes": 30,
+        "subtasks": [{"text": "step one", "completed": False}, {"text": "step two", "completed": True}],
+        "completed": bool(i % 3 == 0), "reminder_sent": False
+    } for i in range(n)]
+    for i in range(0, n, 5000):
+        db.session.execute(insert(Todo), rows[i:i + 5000])
+    db.session.commit()
+
+def orm_path(user_id):
+    todos = Todo.query.filter(Todo.user_id == user_id).order_by(Todo.created_at.desc(), Todo.id.desc()).all()
+    return jsonify({"items": [todo_to_dict(t) for t in todos]}).get_data()
+
+def fast_path(user_id):
+    rows = db.session.query(*LIST_COLUMNS).filter(Todo.user_id == user_id).order_by(
+        Todo.created_at.desc(), Todo.id.desc()
+    ).all()
+    return fast_jsonify({"items": [todo_to_dict(r) for r in rows]}).get_data()
+
+def best_of(fn, user_id, repeat):
+    best, out = None, None
+    for _ in range(repeat):
+        db.session.expunge_all() # cold identity map, like a fresh request
+        start = time.perf_counter()
+        out = fn(user_id)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, out
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='100,10000,100000')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    upgrade_schema(app) # fresh throwaway database: the app no longer creates tables itself
+    print(f"encoder: {'orjson' if orjson else 'stdlib json'}  db: {DB_FILE}")
+    print(f"{'rows':>8} {'orm+jsonify ms':>15} {'fast path ms':>13} {'speedup':>8} {'bytes':>10}")
+    with app.test_request_context():
+        user = User(email='bench@example.com', password_hash='x', timezone='UTC')
+        db.session.add(user)
+        db.session.commit()
+        for n in [int(x) for x in args.sizes.split(',')]:
+            seed(user.id, n)
+            slow, slow_body = best_of(orm_path, user.id, args.repeat)
+            fast, fast_body = best_of(fast_path, user.id, args.repeat)
+            assert slow_body == fast_body, "fast path output differs from jsonify"
+            print(f"{n:>8} {slow * 1000:>15.1f} {fast * 1000:>13.1f} {slow / fast:>7.2f}x {len(fast_body):>10}")
+
+if __name__ == '__main__':
+    main()
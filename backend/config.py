@@ -1,6 +1,7 @@
 # backend/config.py
 
 import os
+import tempfile
 from datetime import timedelta
 
 class Config:
@@ -15,16 +16,77 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
     # Database Stability Settings
+    # Pools are per process (every gunicorn worker and the scheduler has its own): at most
+    # DB_POOL_SIZE + DB_MAX_OVERFLOW connections each, per database. A request waits up to
+    # DB_POOL_TIMEOUT seconds for one, and admission.py sheds load well before that.
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 10)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 20)
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT') or 10)
     SQLALCHEMY_ENGINE_OPTIONS = {
         "pool_pre_ping": True,
         "pool_recycle": 300,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
     }
 
+    # === READ REPLICA (replicas.py) ===
+    # Optional. The todo list, stats, search and export read from it. After a user's own
+    # write their reads stay on the primary for REPLICA_STICKY_SECONDS (keep it above the
+    # replica's usual lag). Same pool settings as the primary.
+    replica_uri = os.environ.get('DATABASE_REPLICA_URL')
+    if replica_uri and replica_uri.startswith("postgres://"):
+        replica_uri = replica_uri.replace("postgres://", "postgresql://", 1)
+    SQLALCHEMY_BINDS = {'replica': replica_uri} if replica_uri else {}
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS') or 10)
+
+    # === LIST ENDPOINT ===
+    # Column-projected query + orjson/stdlib fast encoder for GET /api/todos
+    TODOS_FAST_PATH = os.environ.get('TODOS_FAST_PATH', 'True').lower() in ['true', '1', 't']
+
+    # === FRONTEND ASSETS (assets.py) ===
+    # Serve the `flask build-assets` output (frontend/dist) when it exists; false while editing the frontend
+    SERVE_BUILT_ASSETS = os.environ.get('SERVE_BUILT_ASSETS', 'True').lower() in ['true', '1', 't']
+
+    # === BULK API (/api/todos/bulk) ===
+    BULK_BATCH_SIZE = int(os.environ.get('BULK_BATCH_SIZE') or 500)
+    BULK_MAX_ROWS = int(os.environ.get('BULK_MAX_ROWS') or 10000)
+
+    # === DELTA SYNC ===
+    # Deleted-todo tombstones are kept this long; older ?since= cursors get 410
+    SYNC_TOMBSTONE_DAYS = int(os.environ.get('SYNC_TOMBSTONE_DAYS') or 30)
+
+    # === SERVER-SENT EVENTS (/api/todos/stream) ===
+    EVENTS_POLL_SECONDS = float(os.environ.get('EVENTS_POLL_SECONDS') or 1)
+    EVENTS_RETENTION_MINUTES = int(os.environ.get('EVENTS_RETENTION_MINUTES') or 60)
+    # How long the relay keeps looking for event ids that committed out of order
+    EVENTS_RELAY_LAG_SECONDS = int(os.environ.get('EVENTS_RELAY_LAG_SECONDS') or 30)
+    SSE_HEARTBEAT_SECONDS = int(os.environ.get('SSE_HEARTBEAT_SECONDS') or 15)
+    SSE_MAX_SECONDS = int(os.environ.get('SSE_MAX_SECONDS') or 300)
+    SSE_QUEUE_SIZE = 100
+    # Open streams per process: keep it low on the gthread API workers (each holds a thread),
+    # raise it on the gevent `stream` service
+    SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS') or 16)
+    SSE_TICKET_SECONDS = int(os.environ.get('SSE_TICKET_SECONDS') or 60)
+    # Where browsers open streams, e.g. https://stream.example.com; empty = same origin
+    STREAM_PUBLIC_URL = os.environ.get('STREAM_PUBLIC_URL') or ''
+
     # === SCHEDULER SETTINGS ===
+    # Web workers never run the scheduler; it lives in `python scheduler.py`.
+    # Split users across runners with SCHEDULER_SHARD_INDEX / SCHEDULER_SHARD_COUNT.
+    RUN_SCHEDULER = os.environ.get('RUN_SCHEDULER', 'False').lower() in ['true', '1', 't']
+    SCHEDULER_SHARD_INDEX = int(os.environ.get('SCHEDULER_SHARD_INDEX') or 0)
+    SCHEDULER_SHARD_COUNT = int(os.environ.get('SCHEDULER_SHARD_COUNT') or 1)
     SCHEDULER_API_ENABLED = True
+    SCHEDULER_TICK_SECONDS = int(os.environ.get('SCHEDULER_TICK_SECONDS') or 60)
+    SCHEDULER_BATCH_SIZE = int(os.environ.get('SCHEDULER_BATCH_SIZE') or 500)
+    # The runner serves its own /metrics here (0 = off)
+    SCHEDULER_METRICS_PORT = int(os.environ.get('SCHEDULER_METRICS_PORT') or 9200)
+    # One tick at a time: a second instance in the same process would pass the lease check
+    # (same holder) and process the same rows. Missed runs collapse into one.
     SCHEDULER_JOB_DEFAULTS = {
-        'coalesce': False,
-        'max_instances': 3
+        'coalesce': True,
+        'max_instances': 1
     }
 
     # === MAIL CONFIGURATION (FIXED) ===
@@ -32,10 +94,76 @@ class Config:
     # This ensures it picks up 'smtp-relay.brevo.com' from your .env file.
     MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'smtp.gmail.com'
     MAIL_PORT = int(os.environ.get('MAIL_PORT') or 587)
-    MAIL_USE_TLS = True
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'True').lower() in ['true', '1', 't']
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER')
+    MAIL_DEBUG = os.environ.get('MAIL_DEBUG', 'False').lower() in ['true', '1', 't']
+
+    # === MAIL OUTBOX WORKER ===
+    # Local testing: python -m smtpd -n -c DebuggingServer localhost:1025
+    # with MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_TLS=false
+    MAIL_WORKERS = int(os.environ.get('MAIL_WORKERS') or 2)
+    MAIL_BATCH_SIZE = int(os.environ.get('MAIL_BATCH_SIZE') or 50)
+    MAIL_MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS') or 5)
+    MAIL_RETRY_BACKOFF_SECONDS = int(os.environ.get('MAIL_RETRY_BACKOFF_SECONDS') or 30)
+    MAIL_POLL_SECONDS = float(os.environ.get('MAIL_POLL_SECONDS') or 2)
+    # Sent / failed outbox rows are deleted by scheduler shard 0 after this many days
+    MAIL_OUTBOX_RETENTION_DAYS = int(os.environ.get('MAIL_OUTBOX_RETENTION_DAYS') or 7)
+
+    # === AVATARS (avatars.py) ===
+    # Browsers POST straight to the bucket with a presigned form; the scheduler runner
+    # makes the thumbnails. Credentials are optional (IAM role / ~/.aws also work).
+    # Local S3 stand-in: S3_ENDPOINT_URL=http://localhost:9000 (MinIO) or a moto server.
+    AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
+    AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
+    AWS_BUCKET_NAME = os.environ.get('AWS_BUCKET_NAME')
+    AWS_REGION = os.environ.get('AWS_REGION')
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')
+    # Base of the public object URLs; defaults to the bucket's AWS (or S3_ENDPOINT_URL) address
+    S3_PUBLIC_URL = os.environ.get('S3_PUBLIC_URL')
+    S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS') or 20)
+    AVATAR_MAX_BYTES = int(os.environ.get('AVATAR_MAX_BYTES') or 5 * 1024 * 1024)
+    AVATAR_UPLOAD_EXPIRES_SECONDS = int(os.environ.get('AVATAR_UPLOAD_EXPIRES_SECONDS') or 300)
+    AVATAR_POLL_SECONDS = float(os.environ.get('AVATAR_POLL_SECONDS') or 2)
+    AVATAR_MAX_ATTEMPTS = int(os.environ.get('AVATAR_MAX_ATTEMPTS') or 5)
+
+    # === ADMISSION CONTROL (admission.py) ===
+    # In-flight API requests per worker process, by endpoint class; past a budget, or while
+    # pool checkouts take ADMISSION_POOL_WAIT_MS+ (p90 over the window), requests get 503 + Retry-After.
+    # Keep the class limits under GUNICORN_THREADS so shedding kicks in before threads run out.
+    ADMISSION_CONTROL = os.environ.get('ADMISSION_CONTROL', 'True').lower() in ['true', '1', 't']
+    ADMISSION_CRUD_LIMIT = int(os.environ.get('ADMISSION_CRUD_LIMIT') or 48)
+    ADMISSION_AUTH_LIMIT = int(os.environ.get('ADMISSION_AUTH_LIMIT') or 16)
+    ADMISSION_UPLOADS_LIMIT = int(os.environ.get('ADMISSION_UPLOADS_LIMIT') or 8)
+    ADMISSION_USER_LIMIT = int(os.environ.get('ADMISSION_USER_LIMIT') or 8)
+    ADMISSION_POOL_WAIT_MS = float(os.environ.get('ADMISSION_POOL_WAIT_MS', 500)) # 0 = off
+    ADMISSION_POOL_WAIT_WINDOW_SECONDS = float(os.environ.get('ADMISSION_POOL_WAIT_WINDOW_SECONDS') or 5)
+    ADMISSION_POOL_WAIT_MIN_SAMPLES = int(os.environ.get('ADMISSION_POOL_WAIT_MIN_SAMPLES') or 10)
+    ADMISSION_RETRY_AFTER_SECONDS = int(os.environ.get('ADMISSION_RETRY_AFTER_SECONDS') or 1)
+
+    # === PROFILING (profiling.py) ===
+    # cProfile a fraction of requests (0.001 = 1 in 1000) and any request sent with
+    # `X-Profile: <PROFILE_TOKEN>`; read them with `flask show-profile`.
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE') or 0)
+    PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+    PROFILE_DIR = os.environ.get('PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'protodo-profiles')
+    PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES') or 200)
+    # Statements at least this slow are logged with their SQL (instrumentation.py); 0 = off
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 250))
+
+    # === USER PROFILE CACHE (profiles.py) ===
+    # Per web worker. Other workers see a profile edit after at most the TTL.
+    PROFILE_CACHE_SIZE = int(os.environ.get('PROFILE_CACHE_SIZE') or 10000)
+    PROFILE_CACHE_TTL_SECONDS = int(os.environ.get('PROFILE_CACHE_TTL_SECONDS') or 60)
+
+    # === PASSWORD HASHING (passwords.py) ===
+    # Any werkzeug method, e.g. 'scrypt', 'scrypt:65536:8:1', 'pbkdf2:sha256:600000'.
+    # Changing it upgrades each user's stored hash on their next successful login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt'
+    # Hashing processes per web worker (0 = hash inline) and extra jobs allowed to wait
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)
+    PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE') or 16)
 
     # === SECURITY UPDATE (FIXED FOR JWT) ===
     # Since auth.py uses 'create_access_token', we must use this variable.
@@ -0,0 +1,225 @@
+# backend/events.py
+# ProTodo v1.7 - Server-Sent Events (per-user change stream)
+#
+# Writers (todos.py, the scheduler process) append TodoEvent rows inside their own
+# transaction. Each web worker runs ONE relay thread that tails the table and fans
+# rows out to the in-process subscriber queues, so the DB cost is one indexed query
+# per worker per poll, whatever the number of open tabs.
+#
+# Streams hold their connection for SSE_MAX_SECONDS. On the gthread API workers each one
+# holds a thread too, so only SSE_MAX_STREAMS per process are accepted there (past it: 503,
+# and the page falls back to polling). The real fan-out is the `stream` service in
+# docker-compose: the same app on gevent workers, where an idle stream is one greenlet.
+# Browsers connect with a short-lived stream ticket (POST /api/todos/stream/ticket), so the
+# JWT never ends up in a URL or an access log.
+#
+# Ids are handed out at INSERT but become visible at COMMIT, so a slow transaction (a
+# scheduler chunk) can commit an id below one the relay has already passed. Skipped ids
+# are remembered as gaps and looked up again for EVENTS_RELAY_LAG_SECONDS.
+
+import json
+import logging
+import queue
+import threading
+import time
+from flask import Blueprint, Response, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from sqlalchemy import select, insert, func, or_
+from models import db, TodoEvent
+
+events_bp = Blueprint('events', __name__)
+
+TICKET_SALT = 'sse-stream-ticket' # signed with SECRET_KEY, never valid as an API token
+MAX_GAPS = 1000 # ids skipped at once beyond this are treated as rolled back
+RELAY_BATCH = 500
+
+# =========================================================
+# 1. PUBLISHING
+# =========================================================
+
+def publish(user_id, event_type, data=None):
+    # Committed with the caller's transaction: rolled back writes emit nothing
+    db.session.add(TodoEvent(user_id=user_id, type=event_type, data=data))
+
+def publish_many(events):
+    # events: [{"user_id": .., "type": .., "data": ..}] - one executemany INSERT
+    if events: db.session.execute(insert(TodoEvent), events)
+
+# =========================================================
+# 2. LOCAL FAN-OUT
+# =========================================================
+
+class EventHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {} # user_id -> set of queues
+        self._last_id = None
+        self._gaps = {} # id not seen yet -> give up on it after this time.monotonic()
+        self._thread = None
+        self._streams = 0
+
+    def try_open_stream(self, limit):
+        with self._lock:
+            if self._streams >= limit: return False
+            self._streams += 1
+            return True
+
+    def close_stream(self):
+        with self._lock: self._streams -= 1
+
+    def subscribe(self, app, user_id):
+        q = queue.Queue(maxsize=app.config['SSE_QUEUE_SIZE'])
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(q)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, args=(app,), name='sse-relay', daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, user_id, q):
+        with self._lock:
+            subs = self._subscribers.get(user_id)
+            if subs:
+                subs.discard(q)
+                if not subs: del self._subscribers[user_id]
+
+    def _dispatch(self, event):
+        with self._lock:
+            targets = list(self._subscribers.get(event['user_id'], ()))
+        for q in targets:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # Slow client: drop its backlog and ask it to resync
+                with q.mutex: q.queue.clear()
+                q.put_nowait({"id": event['id'], "type": "resync", "data": None})
+
+    def _track_gaps(self, row_id, lag_seconds):
+        # Ids between the previous high-water mark and this row may still commit
+        if row_id > self._last_id + 1:
+            expires = time.monotonic() + lag_seconds
+            for missing in range(max(self._last_id + 1, row_id - MAX_GAPS), row_id):
+                self._gaps[missing] = expires
+        self._last_id = row_id
+
+    def _run(self, app):
+        poll_seconds = app.config['EVENTS_POLL_SECONDS']
+        lag_seconds = app.config['EVENTS_RELAY_LAG_SECONDS']
+        while True:
+            now = time.monotonic()
+            self._gaps = {i: expires for i, expires in self._gaps.items() if expires > now}
+            with app.app_context():
+                try:
+                    if self._last_id is None:
+                        self._last_id = db.session.scalar(select(func.max(TodoEvent.id))) or 0
+                    condition = TodoEvent.id > self._last_id
+                    if self._gaps: condition = or_(condition, TodoEvent.id.in_(list(self._gaps)))
+                    rows = db.session.execute(
+                        select(TodoEvent.id, TodoEvent.user_id, TodoEvent.type, TodoEvent.data)
+                        .where(condition).order_by(TodoEvent.id).limit(RELAY_BATCH)
+                    ).all()
+                    db.session.commit()
+                except Exception as e:
+                    logging.error(f"SSE relay error: {e}")
+                    db.session.rollback()
+                    rows = []
+            for row in rows:
+                if row.id in self._gaps: del self._gaps[row.id] # late commit
+                elif row.id > self._last_id: self._track_gaps(row.id, lag_seconds)
+                self._dispatch({"id": row.id, "user_id": row.user_id, "type": row.type, "data": row.data})
+            if len(rows) < RELAY_BATCH: time.sleep(poll_seconds)
+
+hub = EventHub()
+
+def format_event(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+# =========================================================
+# 3. STREAM ENDPOINT
+# =========================================================
+
+def ticket_serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=TICKET_SALT)
+
+@events_bp.route('/todos/stream/ticket', methods=['POST'])
+@jwt_required()
+def stream_ticket():
+    # EventSource cannot send an Authorization header: it gets this instead of the JWT
+    ticket = ticket_serializer().dumps(int(get_jwt_identity()))
+    base = current_app.config['STREAM_PUBLIC_URL'].rstrip('/')
+    return jsonify({
+        "ticket": ticket,
+        "url": f"{base}{request.script_root}/api/todos/stream?ticket={ticket}",
+        "expires_in": current_app.config['SSE_TICKET_SECONDS']
+    }), 200
+
+@events_bp.route('/todos/stream', methods=['GET'])
+def stream_todo_events():
+    try:
+        user_id = int(ticket_serializer().loads(
+            request.args.get('ticket', ''), max_age=current_app.config['SSE_TICKET_SECONDS']
+        ))
+    except (BadSignature, ValueError, TypeError):
+        return jsonify({"message": "Invalid or expired stream ticket"}), 401
+
+    app = current_app._get_current_object()
+    heartbeat = app.config['SSE_HEARTBEAT_SECONDS']
+    max_seconds = app.config['SSE_MAX_SECONDS']
+
+    if not hub.try_open_stream(app.config['SSE_MAX_STREAMS']):
+        return jsonify({"message": "Too many open streams, poll instead"}), 503, {"Retry-After": "30"}
+
+    # Subscribe before reading the backlog so nothing falls in between
+    q = hub.subscribe(app, user_id)
+
+    def release():
+        hub.unsubscribe(user_id, q)
+        hub.close_stream()
+
+    # Resume after a reconnect: the browser resends the last id it saw, or the page
+    # passes it along when it reconnects with a fresh ticket
+    backlog = []
+    last_event_id = request.headers.get('Last-Event-ID', type=int) or request.args.get('last_event_id', type=int)
+    try:
+        if last_event_id:
+            backlog = [
+                {"id": r.id, "type": r.type, "data": r.data}
+                for r in db.session.execute(
+                    select(TodoEvent.id, TodoEvent.type, TodoEvent.data)
+                    .where(TodoEvent.user_id == user_id, TodoEvent.id > last_event_id)
+                    .order_by(TodoEvent.id).limit(app.config['SSE_QUEUE_SIZE'])
+                ).all()
+            ]
+    except Exception:
+        release()
+        raise
+    finally:
+        db.session.remove()
+
+    def generate():
+        yield "retry: 3000\n\n"
+        # Backlog events may come through the hub again; late commits can have lower ids
+        sent = set()
+        for event in backlog:
+            sent.add(event['id'])
+            yield format_event(event)
+        # Short-lived streams: the page reconnects with a fresh ticket, which frees
+        # threads held by dead connections that never errored on write.
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline:
+            try:
+                event = q.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            if event['id'] in sent: continue
+            yield format_event(event)
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no' # Nginx: don't buffer the stream
+    })
+    # Runs when the server closes the response, even if the body was never started
+    response.call_on_close(release)
+    return response
@@ -0,0 +1,65 @@
+# backend/gunicorn.conf.py
+# gunicorn -c gunicorn.conf.py wsgi:app
+#
+# GUNICORN_WORKER_CLASS=gthread (default): WEB_CONCURRENCY processes x GUNICORN_THREADS
+#   threads, for the API. An SSE stream would park a thread each, so only SSE_MAX_STREAMS
+#   are accepted per process (see events.py).
+# GUNICORN_WORKER_CLASS=gevent: one greenlet per connection, up to GUNICORN_WORKER_CONNECTIONS
+#   per process. The `stream` service in docker-compose runs this way for /api/todos/stream;
+#   psycogreen (patched in post_fork) keeps Postgres queries from blocking the worker.
+
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS') or 'gthread'
+if worker_class == 'gevent':
+    # Before anything else is imported: preload_app builds the app in this process, and
+    # locks, sockets and sleeps created before patching would block the whole worker
+    from gevent import monkey
+    monkey.patch_all()
+
+import shutil
+import tempfile
+
+# Prometheus multiprocess mode (instrumentation.py): has to be in the environment before the
+# app (and prometheus_client) is imported. Emptied at every start so old pids don't linger.
+multiproc_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'protodo-metrics')
+)
+shutil.rmtree(multiproc_dir, ignore_errors=True)
+os.makedirs(multiproc_dir, exist_ok=True)
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+# One process by default, as before; raise it towards cores * 2 on a dedicated host
+workers = int(os.environ.get('WEB_CONCURRENCY') or 1)
+threads = int(os.environ.get('GUNICORN_THREADS') or 64)
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS') or 1000)
+
+# Uploads go straight to S3 now (avatars.py), so no request needs more than the default
+timeout = int(os.environ.get('GUNICORN_TIMEOUT') or 30)
+graceful_timeout = 30
+keepalive = 5
+
+# Import and build the app once in the master, then fork: workers start without
+# re-importing anything and share the loaded code pages. Nothing connects at build time
+# (engine pools, the password pool and the S3 client are all created lazily).
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() in ['true', '1', 't']
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        # psycopg2 waits in C; without this one query blocks every greenlet in the worker
+        try:
+            from psycogreen.gevent import patch_psycopg
+            patch_psycopg()
+        except ImportError:
+            pass
+    # A connection inherited from the master must never be shared by two processes
+    from wsgi import app
+    from models import db
+    with app.app_context():
+        for engine in db.engines.values(): # primary and read replica
+            engine.dispose(close=False)
+
+def child_exit(server, worker):
+    # Drops the dead worker's gauges (pool connections in use) from the combined /metrics
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,193 @@
+# backend/instrumentation.py
+# Prometheus metrics: the exporter's per-endpoint HTTP histograms plus the database.
+#
+#   db_query_seconds{endpoint}           every SQL statement, by Flask endpoint
+#                                        ('background' for the scheduler, mailer, CLI)
+#   db_queries_per_request{endpoint}     statements per request: N+1 regressions show up here
+#   db_pool_checkout_seconds             time to get a pooled connection (waiting for a free
+#                                        one, opening a new one, pre-ping)
+#   db_pool_connections_in_use           checked-out connections, summed over live processes
+#   db_slow_queries{endpoint}            statements over SLOW_QUERY_MS, each also logged with
+#                                        its SQL and the shape (not the values) of its parameters
+#
+# The scheduler (reminders.py) and mailer (mailer.py) define their own next to the code.
+#
+# Several gunicorn workers: gunicorn.conf.py sets PROMETHEUS_MULTIPROC_DIR before anything
+# imports prometheus_client, every process writes its samples there and /metrics (on any
+# worker) adds them up. Without it (flask run, scheduler.py) the metrics are per process.
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from flask import g, request, has_request_context
+from prometheus_client import Counter, Histogram, Gauge
+from prometheus_flask_exporter import PrometheusMetrics
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+DB_QUERY_SECONDS = Histogram(
+    'db_query_seconds', 'SQL statement execution time', ['endpoint'],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    'db_queries_per_request', 'SQL statements run by one request', ['endpoint'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    'db_pool_checkout_seconds', 'Time to check a connection out of the pool',
+    buckets=(.0001, .0005, .001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+)
+DB_POOL_IN_USE = Gauge(
+    'db_pool_connections_in_use', 'Database connections checked out of the pool',
+    multiprocess_mode='livesum'
+)
+DB_SLOW_QUERIES = Counter('db_slow_queries', 'SQL statements slower than SLOW_QUERY_MS', ['endpoint'])
+
+# (time.monotonic(), seconds) of this process's latest pool checkouts, for admission.py
+CHECKOUT_SAMPLES = 256
+_checkout_waits = deque(maxlen=CHECKOUT_SAMPLES)
+_checkout_lock = threading.Lock()
+
+# Set from SLOW_QUERY_MS by init_metrics (None = off)
+slow_query_seconds = None
+SLOW_SQL_MAX_CHARS = 2000
+WHITESPACE = re.compile(r'\s+')
+
+def multiprocess_enabled():
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+def current_endpoint():
+    if not has_request_context(): return 'background'
+    return request.endpoint or 'unmatched'
+
+# =========================================================
+# 1. QUERY TIMING (every engine, including future binds)
+# =========================================================
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    endpoint = current_endpoint()
+    DB_QUERY_SECONDS.labels(endpoint).observe(elapsed)
+    if has_request_context():
+        g.db_queries = g.get('db_queries', 0) + 1
+    if slow_query_seconds is not None and elapsed >= slow_query_seconds:
+        log_slow_query(endpoint, statement, parameters, executemany, elapsed)
+
+def handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_started'):
+        conn.info['query_started'].pop()
+
+# =========================================================
+# 2. SLOW-QUERY LOG
+# =========================================================
+
+def value_shape(value):
+    # Type (and size) only: parameters hold emails, password hashes, notes...
+    if isinstance(value, (str, bytes, list, tuple)): return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+def parameters_shape(parameters, executemany):
+    if executemany:
+        rows = list(parameters or ())
+        return f"{len(rows)} x {parameters_shape(rows[0], False)}" if rows else "0 rows"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {value_shape(value)}" for key, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(value_shape(value) for value in parameters) + ")"
+    return value_shape(parameters)
+
+def log_slow_query(endpoint, statement, parameters, executemany, elapsed):
+    DB_SLOW_QUERIES.labels(endpoint).inc()
+    sql = WHITESPACE.sub(' ', statement).strip()
+    if len(sql) > SLOW_SQL_MAX_CHARS: sql = sql[:SLOW_SQL_MAX_CHARS] + '...'
+    logging.warning(
+        f"Slow query ({elapsed * 1000:.0f}ms, {endpoint}): {sql} "
+        f"params {parameters_shape(parameters, executemany)}"
+    )
+
+# =========================================================
+# 3. CONNECTION POOL
+# =========================================================
+
+def on_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_IN_USE.inc()
+
+def on_checkin(dbapi_connection, connection_record):
+    # Also fires for connections invalidated while checked out
+    DB_POOL_IN_USE.dec()
+
+def time_pool_checkout(pool):
+    # Pool has no "waiting for a connection" event, so time Pool.connect() itself
+    if getattr(pool, '_checkout_timed', False): return
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            waited = time.perf_counter() - started
+            DB_POOL_CHECKOUT_SECONDS.observe(waited)
+            with _checkout_lock:
+                _checkout_waits.append((time.monotonic(), waited))
+
+    pool.connect = timed_connect
+    pool._checkout_timed = True
+
+def recent_checkout_waits(window_seconds):
+    """Checkout times (seconds) of this process over the last window_seconds, newest last."""
+    since = time.monotonic() - window_seconds
+    with _checkout_lock:
+        return [waited for at, waited in _checkout_waits if at >= since]
+
+def on_engine_disposed(engine):
+    # dispose() swaps in a fresh pool (e.g. post_fork in gunicorn.conf.py)
+    time_pool_checkout(engine.pool)
+
+def install_db_listeners():
+    if event.contains(Engine, 'before_cursor_execute', before_cursor_execute): return
+    event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+    event.listen(Engine, 'handle_error', handle_error)
+    event.listen(Engine, 'engine_disposed', on_engine_disposed)
+    event.listen(Pool, 'checkout', on_checkout)
+    event.listen(Pool, 'checkin', on_checkin)
+
+# =========================================================
+# 4. SETUP (create_app)
+# =========================================================
+
+def init_metrics(app, db):
+    # This automatically creates the /metrics endpoint
+    if multiprocess_enabled():
+        from prometheus_flask_exporter.multiprocess import GunicornInternalPrometheusMetrics
+        metrics = GunicornInternalPrometheusMetrics(app)
+    else:
+        metrics = PrometheusMetrics(app)
+
+    # Optional: Added info about the app version
+    metrics.info('app_info', 'Application info', version='1.0.0')
+
+    global slow_query_seconds
+    slow_query_ms = app.config['SLOW_QUERY_MS']
+    slow_query_seconds = slow_query_ms / 1000 if slow_query_ms > 0 else None
+
+    install_db_listeners()
+    with app.app_context():
+        for engine in db.engines.values():
+            time_pool_checkout(engine.pool)
+
+    @app.teardown_request
+    def observe_request_queries(exc):
+        DB_QUERIES_PER_REQUEST.labels(current_endpoint()).observe(g.pop('db_queries', 0))
+
+    return metrics
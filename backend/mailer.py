@@ -2,8 +2,15 @@ import smtplib
 import ssl
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import os
+import logging
 import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import select, update, func
+from models import db, OutboxEmail, utc_now
 
 # Keep the IPv4 patch just in case, it helps with connectivity
 orig_getaddrinfo = socket.getaddrinfo
@@ -11,45 +18,209 @@ def getaddrinfo_ipv4_only(host, port, family=0, type=0, proto=0, flags=0):
     return orig_getaddrinfo(host, port, socket.AF_INET, type, proto, flags)
 socket.getaddrinfo = getaddrinfo_ipv4_only
 
+# =========================================================
+# 1. OUTBOX (called from request handlers & the scheduler)
+# =========================================================
+
 def send_email(to_email, subject, body):
-    # Load variables from Environment
-    smtp_server = os.environ.get('MAIL_SERVER') or 'smtp.gmail.com'
-    smtp_port = int(os.environ.get('MAIL_PORT') or 587)
-    sender_email = os.environ.get('MAIL_USERNAME') # For SendGrid, this is usually "apikey"
-    sender_password = os.environ.get('MAIL_PASSWORD') # This will be the API Key
-    sender_from = os.environ.get('MAIL_DEFAULT_SENDER') # The email address users see
-
-    print(f"📧 Sending to {to_email} via {smtp_server}...")
-
-    if not sender_email or not sender_password:
-        print("❌ Error: Missing credentials.")
-        return False
-
-    msg = MIMEMultipart()
-    msg['From'] = sender_from
-    msg['To'] = to_email
-    msg['Subject'] = subject
-    msg.attach(MIMEText(body, 'plain'))
-
-    try:
-        # Use standard TLS connection (Best for SendGrid)
-        with smtplib.SMTP(smtp_server, smtp_port, timeout=20) as server:
-            server.set_debuglevel(1)
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_from, to_email, msg.as_string())
-        
-        print(f"✅ Email sent successfully!")
-        return True
-
-    except Exception as e:
-        print(f"❌ EMAIL FAILED: {e}")
-        raise 
+    # Queued only: the row is committed with the caller's transaction and
+    # delivered later by MailWorker, so a slow relay never blocks the caller.
+    db.session.add(OutboxEmail(to_email=to_email, subject=fit_subject(subject), body=body))
+
+def fit_subject(subject):
+    # Todo titles alone can fill the column; an oversized subject would fail the insert (and,
+    # from the scheduler, roll back the whole chunk of reminders with it)
+    limit = OutboxEmail.subject.type.length
+    return subject if len(subject) <= limit else subject[:limit - 1] + '…'
+
+def outbox_depth():
+    # Only unfinished rows have next_attempt_at, so this is a count over its index
+    return db.session.scalar(
+        select(func.count(OutboxEmail.id)).where(OutboxEmail.next_attempt_at.isnot(None))
+    ) or 0
+
+# Only the scheduler runner sets it; 'livemax' keeps it right if that ever runs multi-process
+OUTBOX_DEPTH = Gauge('mail_outbox_depth', 'Emails waiting in the outbox', multiprocess_mode='livemax')
+MAIL_SEND_SECONDS = Histogram(
+    'mail_send_seconds', 'SMTP time per email, including (re)connecting', ['result'],
+    buckets=(.05, .1, .25, .5, 1, 2.5, 5, 10, 20, 40)
+)
+# sent / retry (attempt failed, will try again) / failed (gave up after MAIL_MAX_ATTEMPTS)
+MAIL_SENDS = Counter('mail_sends', 'Email delivery attempts by outcome', ['result'])
+MAIL_CONNECTIONS = Counter('mail_smtp_connections', 'SMTP connections opened')
+
+# =========================================================
+# 2. WORKER POOL (reuses authenticated SMTP connections)
+# =========================================================
+
+class MailWorker:
+    def __init__(self, app):
+        self.app = app
+        cfg = app.config
+        self.server = cfg['MAIL_SERVER']
+        self.port = cfg['MAIL_PORT']
+        self.use_tls = cfg['MAIL_USE_TLS']
+        self.username = cfg['MAIL_USERNAME']
+        self.password = cfg['MAIL_PASSWORD']
+        self.sender = cfg['MAIL_DEFAULT_SENDER'] or cfg['MAIL_USERNAME']
+        self.debug = cfg['MAIL_DEBUG']
+        self.workers = cfg['MAIL_WORKERS']
+        self.batch_size = cfg['MAIL_BATCH_SIZE']
+        self.max_attempts = cfg['MAIL_MAX_ATTEMPTS']
+        self.backoff_seconds = cfg['MAIL_RETRY_BACKOFF_SECONDS']
+        self.poll_seconds = cfg['MAIL_POLL_SECONDS']
+        self.lease = timedelta(minutes=5)
+
+        self._local = threading.local()
+        self._connections = []
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='mailer')
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- SMTP connections (one per pool thread, kept open between batches) ---
+    def _connect(self):
+        MAIL_CONNECTIONS.inc()
+        server = smtplib.SMTP(self.server, self.port, timeout=20)
+        if self.debug: server.set_debuglevel(1)
+        if self.use_tls: server.starttls(context=ssl.create_default_context())
+        if self.username and self.password: server.login(self.username, self.password)
+        self._connections.append(server)
+        return server
+
+    def _connection(self):
+        server = getattr(self._local, 'server', None)
+        if server is not None:
+            try:
+                if server.noop()[0] == 250: return server
+            except smtplib.SMTPException: pass
+            except OSError: pass
+            self._drop(server)
+        self._local.server = self._connect()
+        return self._local.server
+
+    def _drop(self, server):
+        self._local.server = None
+        if server in self._connections: self._connections.remove(server)
+        try: server.close()
+        except Exception: pass
+
+    def _send_chunk(self, messages):
+        # Returns [(id, error or None)] - runs on a pool thread, no DB access here
+        results = []
+        for msg_id, to_email, subject, body in messages:
+            msg = MIMEMultipart()
+            msg['From'] = self.sender
+            msg['To'] = to_email
+            msg['Subject'] = subject
+            msg.attach(MIMEText(body, 'plain'))
+            started = time.perf_counter()
+            try:
+                self._connection().sendmail(self.sender, to_email, msg.as_string())
+                MAIL_SEND_SECONDS.labels('ok').observe(time.perf_counter() - started)
+                results.append((msg_id, None))
+            except Exception as e:
+                MAIL_SEND_SECONDS.labels('error').observe(time.perf_counter() - started)
+                # Connection state is unknown after a failure, so start fresh next time
+                server = getattr(self._local, 'server', None)
+                if server is not None: self._drop(server)
+                results.append((msg_id, str(e)[:500]))
+        return results
+
+    # --- Outbox processing ---
+    def _claim_batch(self):
+        now = utc_now()
+        ids = db.session.scalars(
+            select(OutboxEmail.id)
+            .where(OutboxEmail.status.in_(['pending', 'sending']), OutboxEmail.next_attempt_at <= now)
+            .order_by(OutboxEmail.next_attempt_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not ids:
+            db.session.commit()
+            return []
+        db.session.execute(
+            update(OutboxEmail).where(OutboxEmail.id.in_(ids))
+            .values(status='sending', next_attempt_at=now + self.lease)
+        )
+        rows = db.session.execute(
+            select(OutboxEmail.id, OutboxEmail.to_email, OutboxEmail.subject, OutboxEmail.body)
+            .where(OutboxEmail.id.in_(ids))
+        ).all()
+        db.session.commit()
+        return [tuple(r) for r in rows]
+
+    def _record_results(self, results):
+        now = utc_now()
+        attempts = dict(db.session.execute(
+            select(OutboxEmail.id, OutboxEmail.attempts).where(OutboxEmail.id.in_([r[0] for r in results]))
+        ).all())
+        changes = []
+        for msg_id, error in results:
+            tries = (attempts.get(msg_id) or 0) + 1
+            if error is None:
+                changes.append({
+                    "id": msg_id, "status": "sent", "attempts": tries, "sent_at": now,
+                    "last_error": None, "next_attempt_at": None
+                })
+            elif tries >= self.max_attempts:
+                logging.error(f"Email {msg_id} failed permanently: {error}")
+                changes.append({
+                    "id": msg_id, "status": "failed", "attempts": tries, "sent_at": None,
+                    "last_error": error, "next_attempt_at": None
+                })
+            else:
+                delay = self.backoff_seconds * (2 ** (tries - 1))
+                changes.append({
+                    "id": msg_id, "status": "pending", "attempts": tries, "sent_at": None,
+                    "last_error": error, "next_attempt_at": now + timedelta(seconds=delay)
+                })
+        db.session.execute(update(OutboxEmail), changes)
+        db.session.commit()
+        for change in changes:
+            MAIL_SENDS.labels('retry' if change['status'] == 'pending' else change['status']).inc()
+
+    def drain_once(self):
+        """Claim one batch, send it across the pool and record the outcome. Returns messages handled."""
+        batch = self._claim_batch()
+        if not batch: return 0
+        chunks = [batch[i::self.workers] for i in range(self.workers)]
+        results = []
+        for chunk_results in self._pool.map(self._send_chunk, [c for c in chunks if c]):
+            results.extend(chunk_results)
+        self._record_results(results)
+        return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    handled = self.drain_once()
+                    OUTBOX_DEPTH.set(outbox_depth())
+                except Exception as e:
+                    logging.error(f"Mail worker error: {e}")
+                    db.session.rollback()
+                    handled = 0
+            if not handled: self._stop.wait(self.poll_seconds)
+
+    def start(self):
+        if self._thread: return
+        self._thread = threading.Thread(target=self._run, name='mail-outbox', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread: self._thread.join(timeout=30)
+        self._pool.shutdown(wait=True)
+        for server in list(self._connections):
+            try: server.quit()
+            except Exception: pass
+        self._connections.clear()
 
 # Wrapper for Task Reminders (Updated Content)
 def send_reminder_email(to_email, task_title, due_date):
     subject = f"🔔 Reminder: {task_title}"
-    
+
     body = f"""Hello there,
 
 Just a friendly nudge about your upcoming task:
@@ -77,4 +248,4 @@ This code expires in 15 minutes. If you did not request this, please ignore this
 
 Best,
 The ProTodo Team"""
-    send_email(to_email, subject, body)
\ No newline at end of file
+    send_email(to_email, subject, body)
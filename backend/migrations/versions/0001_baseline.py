@@ -0,0 +1,57 @@
+"""baseline: user and todo tables as created by db.create_all() before migrations
+
+Revision ID: 0001_baseline
+Revises: 
+Create Date: 2026-10-18 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=True),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('phone', sa.String(length=20), nullable=True),
+        sa.Column('password_hash', sa.String(length=255), nullable=False),
+        sa.Column('nickname', sa.String(length=50), nullable=True),
+        sa.Column('timezone', sa.String(length=50), nullable=True),
+        sa.Column('avatar', sa.String(length=200), nullable=True),
+        sa.Column('reset_token', sa.String(length=100), nullable=True),
+        sa.Column('reset_token_expiry', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email')
+    )
+    op.create_table('todo',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('notes', sa.Text(), nullable=True),
+        sa.Column('due_date', sa.DateTime(), nullable=True),
+        sa.Column('priority', sa.String(length=20), nullable=True),
+        sa.Column('category', sa.String(length=50), nullable=True),
+        sa.Column('tags', sa.JSON(), nullable=True),
+        sa.Column('recurrence', sa.String(length=20), nullable=True),
+        sa.Column('subtasks', sa.JSON(), nullable=True),
+        sa.Column('completed', sa.Boolean(), nullable=True),
+        sa.Column('reminder_minutes', sa.Integer(), nullable=True),
+        sa.Column('reminder_sent', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('todo')
+    op.drop_table('user')
@@ -0,0 +1,133 @@
+"""scheduler queue, delta sync, mail outbox, scheduler lease and SSE event tables
+
+Revision ID: 0002_scheduler_sync_outbox
+Revises: 0001_baseline
+Create Date: 2026-10-18 09:10:00
+
+"""
+from datetime import timezone, timedelta
+from zoneinfo import ZoneInfo
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_scheduler_sync_outbox'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+# A copy of models.compute_next_action_at as of this revision: the migration must keep
+# producing the same backfill whatever the model code turns into later.
+def compute_next_action_at(due_date, tz_str, reminder_minutes, reminder_sent):
+    try: user_tz = ZoneInfo(tz_str or 'UTC')
+    except Exception: user_tz = timezone.utc
+    # due_date is the user's wall-clock time
+    next_at = due_date.replace(tzinfo=user_tz).astimezone(timezone.utc)
+    if not reminder_sent:
+        next_at -= timedelta(minutes=reminder_minutes or 0)
+    return next_at.replace(tzinfo=None)
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    todo_columns = {c['name'] for c in inspector.get_columns('todo')}
+
+    with op.batch_alter_table('todo', schema=None) as batch_op:
+        if 'next_action_at' not in todo_columns:
+            batch_op.add_column(sa.Column('next_action_at', sa.DateTime(), nullable=True))
+            batch_op.create_index('ix_todo_next_action_at', ['next_action_at'], unique=False)
+        if 'updated_at' not in todo_columns:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+            batch_op.create_index('ix_todo_user_updated', ['user_id', 'updated_at'], unique=False)
+
+    if not inspector.has_table('outbox_email'):
+        op.create_table('outbox_email',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('to_email', sa.String(length=120), nullable=False),
+            sa.Column('subject', sa.String(length=200), nullable=False),
+            sa.Column('body', sa.Text(), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=True),
+            sa.Column('attempts', sa.Integer(), nullable=True),
+            sa.Column('last_error', sa.String(length=500), nullable=True),
+            sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('sent_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_outbox_email_next_attempt_at', 'outbox_email', ['next_attempt_at'], unique=False)
+
+    if not inspector.has_table('scheduler_lease'):
+        op.create_table('scheduler_lease',
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.Column('holder', sa.String(length=100), nullable=False),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('name')
+        )
+
+    if not inspector.has_table('todo_tombstone'):
+        op.create_table('todo_tombstone',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('todo_id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('deleted_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_tombstone_user_deleted', 'todo_tombstone', ['user_id', 'deleted_at'], unique=False)
+
+    if not inspector.has_table('todo_event'):
+        op.create_table('todo_event',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('type', sa.String(length=30), nullable=False),
+            sa.Column('data', sa.JSON(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_todo_event_user_id', 'todo_event', ['user_id'], unique=False)
+        op.create_index('ix_todo_event_created_at', 'todo_event', ['created_at'], unique=False)
+
+    # Backfill: the scheduler only sees rows with next_action_at, delta sync needs updated_at
+    bind = op.get_bind()
+    bind.execute(sa.text("UPDATE todo SET updated_at = created_at WHERE updated_at IS NULL"))
+    user = sa.table('user', sa.column('id', sa.Integer), sa.column('timezone', sa.String))
+    todo = sa.table('todo',
+        sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+        sa.column('due_date', sa.DateTime), sa.column('reminder_minutes', sa.Integer),
+        sa.column('reminder_sent', sa.Boolean), sa.column('completed', sa.Boolean),
+        sa.column('next_action_at', sa.DateTime)
+    )
+    rows = bind.execute(
+        sa.select(todo.c.id, todo.c.due_date, todo.c.reminder_minutes, todo.c.reminder_sent, user.c.timezone)
+        .join(user, user.c.id == todo.c.user_id)
+        .where(todo.c.completed == False, todo.c.due_date.isnot(None), todo.c.next_action_at.is_(None))
+    ).all()
+    updates = [
+        {"todo_id": r.id, "next_action_at": compute_next_action_at(
+            r.due_date, r.timezone, r.reminder_minutes, r.reminder_sent
+        )}
+        for r in rows
+    ]
+    if updates:
+        bind.execute(
+            todo.update().where(todo.c.id == sa.bindparam('todo_id'))
+            .values(next_action_at=sa.bindparam('next_action_at')),
+            updates
+        )
+
+
+def downgrade():
+    op.drop_index('ix_todo_event_created_at', table_name='todo_event')
+    op.drop_index('ix_todo_event_user_id', table_name='todo_event')
+    op.drop_table('todo_event')
+    op.drop_index('ix_tombstone_user_deleted', table_name='todo_tombstone')
+    op.drop_table('todo_tombstone')
+    op.drop_table('scheduler_lease')
+    op.drop_index('ix_outbox_email_next_attempt_at', table_name='outbox_email')
+    op.drop_table('outbox_email')
+    with op.batch_alter_table('todo', schema=None) as batch_op:
+        batch_op.drop_index('ix_todo_user_updated')
+        batch_op.drop_column('updated_at')
+        batch_op.drop_index('ix_todo_next_action_at')
+        batch_op.drop_column('next_action_at')
@@ -0,0 +1,29 @@
+"""indexes for the hot queries (list pages, outbox claim)
+
+Revision ID: 0003_hot_query_indexes
+Revises: 0002_scheduler_sync_outbox
+Create Date: 2026-10-18 09:20:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_hot_query_indexes'
+down_revision = '0002_scheduler_sync_outbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # GET /api/todos: WHERE user_id = ? ORDER BY created_at DESC, id DESC (keyset pages);
+    # also serves every other user_id lookup (update/delete/bulk/export)
+    op.create_index('ix_todo_user_created', 'todo', ['user_id', 'created_at', 'id'], unique=False)
+
+    # Finished mail no longer sits in the claim index range
+    op.execute("UPDATE outbox_email SET next_attempt_at = NULL WHERE status IN ('sent', 'failed')")
+
+
+def downgrade():
+    op.drop_index('ix_todo_user_created', table_name='todo')
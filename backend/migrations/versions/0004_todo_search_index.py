@@ -0,0 +1,98 @@
+"""full-text search index over title, notes, tags and subtasks
+
+Revision ID: 0004_todo_search_index
+Revises: 0003_hot_query_indexes
+Create Date: 2026-10-18 10:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_todo_search_index'
+down_revision = '0003_hot_query_indexes'
+branch_labels = None
+depends_on = None
+
+
+# Tags are a JSON list of strings, subtasks a JSON list of {"text", "completed"}:
+# only the text goes into the index, never the JSON keys.
+SQLITE_FTS_ROW = """
+    NEW.id, NEW.user_id, NEW.title, coalesce(NEW.notes, ''),
+    coalesce((SELECT group_concat(value, ' ') FROM json_each(NEW.tags) WHERE type = 'text'), ''),
+    coalesce((SELECT group_concat(json_extract(value, '$.text'), ' ') FROM json_each(NEW.subtasks) WHERE type = 'object'), '')
+"""
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE todo_fts USING fts5("
+    "user_id UNINDEXED, title, notes, tags, subtasks, tokenize = 'porter unicode61 remove_diacritics 2')",
+    f"""CREATE TRIGGER todo_fts_insert AFTER INSERT ON todo BEGIN
+        INSERT INTO todo_fts (rowid, user_id, title, notes, tags, subtasks) VALUES ({SQLITE_FTS_ROW});
+    END""",
+    # Only the indexed columns: scheduler writes (reminder_sent, next_action_at...) skip the index
+    f"""CREATE TRIGGER todo_fts_update AFTER UPDATE OF user_id, title, notes, tags, subtasks ON todo BEGIN
+        DELETE FROM todo_fts WHERE rowid = OLD.id;
+        INSERT INTO todo_fts (rowid, user_id, title, notes, tags, subtasks) VALUES ({SQLITE_FTS_ROW});
+    END""",
+    """CREATE TRIGGER todo_fts_delete AFTER DELETE ON todo BEGIN
+        DELETE FROM todo_fts WHERE rowid = OLD.id;
+    END""",
+    "INSERT INTO todo_fts (rowid, user_id, title, notes, tags, subtasks) SELECT "
+    + SQLITE_FTS_ROW.replace('NEW.', 'todo.') + " FROM todo",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS todo_fts_delete",
+    "DROP TRIGGER IF EXISTS todo_fts_update",
+    "DROP TRIGGER IF EXISTS todo_fts_insert",
+    "DROP TABLE IF EXISTS todo_fts",
+]
+
+POSTGRES_UPGRADE = [
+    "ALTER TABLE todo ADD COLUMN search_vector tsvector",
+    """CREATE FUNCTION todo_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(
+                (SELECT string_agg(t, ' ') FROM json_array_elements_text(
+                    CASE WHEN json_typeof(NEW.tags) = 'array' THEN NEW.tags ELSE '[]'::json END) t), '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(
+                (SELECT string_agg(s->>'text', ' ') FROM json_array_elements(
+                    CASE WHEN json_typeof(NEW.subtasks) = 'array' THEN NEW.subtasks ELSE '[]'::json END) s), '')), 'C') ||
+            setweight(to_tsvector('english', coalesce(NEW.notes, '')), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql""",
+    # Only the indexed columns: scheduler writes (reminder_sent, next_action_at...) skip the rebuild
+    """CREATE TRIGGER todo_search_vector_update BEFORE INSERT OR UPDATE OF title, notes, tags, subtasks
+        ON todo FOR EACH ROW EXECUTE FUNCTION todo_search_vector()""",
+    # Backfill: touching title fires the trigger for every existing row
+    "UPDATE todo SET title = title",
+    "CREATE INDEX ix_todo_search ON todo USING GIN (search_vector)",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP INDEX IF EXISTS ix_todo_search",
+    "DROP TRIGGER IF EXISTS todo_search_vector_update ON todo",
+    "DROP FUNCTION IF EXISTS todo_search_vector()",
+    "ALTER TABLE todo DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run(statements):
+    for statement in statements:
+        op.execute(statement)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite': run(SQLITE_UPGRADE)
+    elif dialect == 'postgresql': run(POSTGRES_UPGRADE)
+    # Other databases: search.py falls back to LIKE, nothing to build
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite': run(SQLITE_DOWNGRADE)
+    elif dialect == 'postgresql': run(POSTGRES_DOWNGRADE)
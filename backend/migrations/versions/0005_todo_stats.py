@@ -0,0 +1,35 @@
+"""per-user dashboard counters
+
+Revision ID: 0005_todo_stats
+Revises: 0004_todo_search_index
+Create Date: 2026-10-18 11:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_todo_stats'
+down_revision = '0004_todo_search_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('todo_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('category', sa.String(length=50), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('completed', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('user_id', 'category')
+    )
+    op.execute(
+        "INSERT INTO todo_stats (user_id, category, total, completed) "
+        "SELECT user_id, coalesce(nullif(category, ''), 'other'), count(id), sum(CASE WHEN completed THEN 1 ELSE 0 END) "
+        "FROM todo GROUP BY user_id, coalesce(nullif(category, ''), 'other')"
+    )
+
+
+def downgrade():
+    op.drop_table('todo_stats')
@@ -0,0 +1,53 @@
+"""todo version counter and stable subtask ids
+
+Revision ID: 0006_todo_version_subtask_ids
+Revises: 0005_todo_stats
+Create Date: 2026-10-18 12:00:00
+
+"""
+import secrets
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_todo_version_subtask_ids'
+down_revision = '0005_todo_stats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('todo', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+    # Give every existing checklist item an id, in chunks
+    todo = sa.table('todo', sa.column('id', sa.Integer), sa.column('subtasks', sa.JSON))
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(todo.c.id, todo.c.subtasks)
+            .where(todo.c.id > last_id, todo.c.subtasks.isnot(None))
+            .order_by(todo.c.id).limit(1000)
+        ).all()
+        if not rows: break
+        last_id = rows[-1].id
+        updates = [
+            {"todo_id": r.id, "subtasks": [
+                dict(sub, id=sub.get('id') or secrets.token_hex(4)) if isinstance(sub, dict) else sub
+                for sub in r.subtasks
+            ]}
+            for r in rows if isinstance(r.subtasks, list) and r.subtasks
+        ]
+        if updates:
+            bind.execute(
+                todo.update().where(todo.c.id == sa.bindparam('todo_id'))
+                .values(subtasks=sa.bindparam('subtasks')),
+                updates
+            )
+
+
+def downgrade():
+    with op.batch_alter_table('todo', schema=None) as batch_op:
+        batch_op.drop_column('version')
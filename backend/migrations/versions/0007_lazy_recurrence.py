@@ -0,0 +1,49 @@
+"""lazy recurrence: rule + anchor on the series, completed/skipped occurrences table
+
+Revision ID: 0007_lazy_recurrence
+Revises: 0006_todo_version_subtask_ids
+Create Date: 2026-10-18 13:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_lazy_recurrence'
+down_revision = '0006_todo_version_subtask_ids'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('todo', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rrule', sa.String(length=200), nullable=True))
+        batch_op.add_column(sa.Column('series_start', sa.DateTime(), nullable=True))
+
+    op.create_table('todo_occurrence',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('todo_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('occurs_at', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('todo_id', 'occurs_at', name='uq_occurrence_todo_occurs')
+    )
+    op.create_index('ix_occurrence_user_occurs', 'todo_occurrence', ['user_id', 'occurs_at'], unique=False)
+
+    # Open recurring todos become series anchored at their current due date. The
+    # completed copies earlier versions created stay as ordinary one-off history.
+    op.execute(
+        "UPDATE todo SET series_start = due_date "
+        "WHERE recurrence IN ('daily', 'weekly', 'monthly') AND completed = false AND due_date IS NOT NULL"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_occurrence_user_occurs', table_name='todo_occurrence')
+    op.drop_table('todo_occurrence')
+    with op.batch_alter_table('todo', schema=None) as batch_op:
+        batch_op.drop_column('series_start')
+        batch_op.drop_column('rrule')
@@ -0,0 +1,42 @@
+"""avatar upload queue for the thumbnail worker
+
+Revision ID: 0008_avatar_uploads
+Revises: 0007_lazy_recurrence
+Create Date: 2026-10-18 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_avatar_uploads'
+down_revision = '0007_lazy_recurrence'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('avatar_upload',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('upload_key', sa.String(length=300), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('last_error', sa.String(length=500), nullable=True),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('avatar_upload', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_avatar_upload_next_attempt_at'), ['next_attempt_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_avatar_upload_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('avatar_upload', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_avatar_upload_user_id'))
+        batch_op.drop_index(batch_op.f('ix_avatar_upload_next_attempt_at'))
+    op.drop_table('avatar_upload')
@@ -0,0 +1,26 @@
+"""index outbox_email.created_at for pruning finished emails
+
+Revision ID: 0009_outbox_created_index
+Revises: 0008_avatar_uploads
+Create Date: 2026-10-18 16:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_outbox_created_index'
+down_revision = '0008_avatar_uploads'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('outbox_email', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_outbox_email_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('outbox_email', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_outbox_email_created_at'))
@@ -2,10 +2,24 @@
 # ProTodo v1.1 - Unified Model (Auth, Profile, Notes, Reset)
 
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timezone
+from passwords import hash_password, verify_password
+from replicas import RoutingSession
+from datetime import datetime, timezone, timedelta
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    from dateutil.tz import gettz as ZoneInfo
 
-db = SQLAlchemy()
+# Sends @replica_reads SELECTs to the read replica, if there is one (replicas.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+def utc_now():
+    # Naive UTC, matching what the DateTime columns store
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def resolve_timezone(tz_str):
+    try: return ZoneInfo(tz_str or 'UTC')
+    except Exception: return timezone.utc
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -26,11 +40,15 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     todos = db.relationship('Todo', backref='user', lazy=True, cascade="all, delete-orphan")
 
+    # Hashing runs in the passwords.py process pool (raises PasswordHasherBusy when full)
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        ok, new_hash = verify_password(self.password_hash, password)
+        # Stored with older PASSWORD_HASH_METHOD parameters: upgrade (caller commits)
+        if new_hash: self.password_hash = new_hash
+        return ok
 
 class Todo(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -45,7 +63,10 @@ class Todo(db.Model):
     tags = db.Column(db.JSON, nullable=True)
 
     # [v1.3] Recurring Tasks (NEW)
-    recurrence = db.Column(db.String(20), default='never') # 'never', 'daily', 'weekly', 'monthly'
+    recurrence = db.Column(db.String(20), default='never') # 'never', 'daily', 'weekly', 'monthly', 'yearly', 'custom'
+    # [v1.9] Lazy recurrence (recurrence.py) - the row is the series, due_date its open occurrence
+    rrule = db.Column(db.String(200), nullable=True)     # custom RRULE body, recurrence == 'custom'
+    series_start = db.Column(db.DateTime, nullable=True) # DTSTART the rule is expanded from
 
     # [v1.4] Subtasks (Checklist) - NEW
     subtasks = db.Column(db.JSON, nullable=True)
@@ -54,5 +75,115 @@ class Todo(db.Model):
     completed = db.Column(db.Boolean, default=False)
     reminder_minutes = db.Column(db.Integer, default=30)
     reminder_sent = db.Column(db.Boolean, default=False)
+
+    # [v1.5] Scheduler Queue - naive UTC time of the next reminder / auto-complete
+    next_action_at = db.Column(db.DateTime, nullable=True, index=True)
     
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    # [v1.6] Delta Sync - bumped on every write, see GET /api/todos?since=
+    updated_at = db.Column(db.DateTime, default=utc_now, onupdate=utc_now)
+    # [v1.8] Optimistic concurrency - incremented in SQL by every UPDATE, checked via If-Match
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1',
+                        onupdate=db.literal_column('version') + 1)
+
+    __table_args__ = (
+        db.Index('ix_todo_user_created', 'user_id', 'created_at', 'id'), # GET /api/todos keyset pages
+        db.Index('ix_todo_user_updated', 'user_id', 'updated_at'),       # ETag + ?since= delta sync
+    )
+
+    def refresh_next_action(self, tz_str):
+        self.next_action_at = compute_next_action_at(
+            self.due_date, tz_str, self.reminder_minutes, self.reminder_sent, self.completed
+        )
+
+def due_date_to_utc(due_date, user_tz):
+    # due_date is stored as the user's wall-clock time (the DateTime column drops
+    # any offset), so read an unsaved aware value the same way the DB will.
+    if not due_date: return None
+    local = due_date.replace(tzinfo=user_tz)
+    return local.astimezone(timezone.utc)
+
+def compute_next_action_at(due_date, tz_str, reminder_minutes, reminder_sent, completed):
+    due_utc = due_date_to_utc(due_date, resolve_timezone(tz_str))
+    if completed or not due_utc: return None
+    next_at = due_utc
+    if not reminder_sent:
+        next_at = due_utc - timedelta(minutes=reminder_minutes or 0)
+    return next_at.replace(tzinfo=None)
+
+class OutboxEmail(db.Model):
+    # [v1.6] Durable mail queue, drained by mailer.MailWorker
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+
+    status = db.Column(db.String(20), default='pending') # 'pending', 'sending', 'sent', 'failed'
+    attempts = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.String(500), nullable=True)
+    # When 'pending': earliest retry time. When 'sending': lease expiry (reclaimed after a crash).
+    # NULL once 'sent' / 'failed', so finished rows drop out of the claim index.
+    next_attempt_at = db.Column(db.DateTime, default=utc_now, index=True)
+
+    # Indexed for the scheduler's prune of finished rows (reminders.run_tick)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+class SchedulerLease(db.Model):
+    # [v1.7] Leader election: one row per scheduler shard
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+class TodoTombstone(db.Model):
+    # [v1.6] Delta Sync - deleted todo ids, pruned after SYNC_TOMBSTONE_DAYS
+    id = db.Column(db.Integer, primary_key=True)
+    todo_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=utc_now)
+
+    __table_args__ = (db.Index('ix_tombstone_user_deleted', 'user_id', 'deleted_at'),)
+
+class TodoEvent(db.Model):
+    # [v1.7] Change feed for the SSE stream (events.py), pruned after EVENTS_RETENTION_MINUTES
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    type = db.Column(db.String(30), nullable=False) # 'todo.changed', 'todo.deleted', 'reminder', 'todo.due'
+    data = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(db.DateTime, default=utc_now, index=True)
+
+class TodoStats(db.Model):
+    # [v1.8] Dashboard counters per (user, category), kept in step by stats.StatsDelta
+    user_id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+
+class TodoOccurrence(db.Model):
+    # [v1.9] Completed / skipped occurrences of a recurring todo - the only per-occurrence rows
+    id = db.Column(db.Integer, primary_key=True)
+    todo_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    occurs_at = db.Column(db.DateTime, nullable=False) # the occurrence's wall-clock due time
+    status = db.Column(db.String(20), nullable=False)  # 'completed', 'skipped'
+    created_at = db.Column(db.DateTime, default=utc_now)
+
+    __table_args__ = (
+        db.UniqueConstraint('todo_id', 'occurs_at', name='uq_occurrence_todo_occurs'),
+        db.Index('ix_occurrence_user_occurs', 'user_id', 'occurs_at'),
+    )
+
+class AvatarUpload(db.Model):
+    # [v2.0] Avatar originals the browser POSTed straight to S3, waiting for avatars.ThumbnailWorker
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    upload_key = db.Column(db.String(300), nullable=False) # uploads/avatars/<user_id>/<token>
+
+    status = db.Column(db.String(20), default='pending') # 'pending', 'processing', 'done', 'failed'
+    attempts = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.String(500), nullable=True)
+    # Same claim/lease scheme as OutboxEmail: NULL once 'done' / 'failed'
+    next_attempt_at = db.Column(db.DateTime, default=utc_now, index=True)
+
+    created_at = db.Column(db.DateTime, default=utc_now)
+    finished_at = db.Column(db.DateTime, nullable=True)
@@ -0,0 +1,90 @@
+# backend/passwords.py
+# Password hashing off the request threads.
+#
+# werkzeug's hashes are slow on purpose. Run inline, each signup/login holds a web
+# thread (and the GIL-bound CPU) for the whole hash, so a burst of logins stalls todo
+# traffic. Here they run in a small per-process pool (PASSWORD_HASH_WORKERS) with a
+# cap on queued jobs (PASSWORD_HASH_QUEUE_SIZE): past it, callers get a 503 instead
+# of piling up. Hashes made with an older PASSWORD_HASH_METHOD are upgraded on login.
+
+import functools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from prometheus_client import Histogram
+from werkzeug.security import generate_password_hash, check_password_hash
+
+HASH_QUEUE_SECONDS = Histogram(
+    'password_hash_queue_seconds', 'Time password jobs wait for a hashing process', ['op']
+)
+HASH_SECONDS = Histogram('password_hash_seconds', 'Time spent hashing / verifying a password', ['op'])
+
+class PasswordHasherBusy(Exception):
+    pass
+
+@functools.lru_cache(maxsize=8)
+def method_signature(method):
+    # 'scrypt' -> 'scrypt:32768:8:1': the parameters werkzeug writes in front of the hash
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+# Pool jobs: module-level so they pickle; they report their own queue / run time
+def hash_job(password, method, submitted_at):
+    started = time.time()
+    password_hash = generate_password_hash(password, method=method)
+    return password_hash, started - submitted_at, time.time() - started
+
+def verify_job(stored_hash, password, method, submitted_at):
+    started = time.time()
+    ok = check_password_hash(stored_hash, password)
+    new_hash = None
+    if ok and stored_hash.split('$', 1)[0] != method_signature(method):
+        new_hash = generate_password_hash(password, method=method)
+    return (ok, new_hash), started - submitted_at, time.time() - started
+
+class PasswordHasher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool = None
+        self._slots = None
+
+    def _executor(self, app):
+        # Created on first use, i.e. inside each gunicorn worker after the fork
+        with self._lock:
+            if self._pool is None:
+                workers = app.config['PASSWORD_HASH_WORKERS']
+                self._slots = threading.BoundedSemaphore(workers + app.config['PASSWORD_HASH_QUEUE_SIZE'])
+                # spawn: web workers are multi-threaded, forking them is unsafe
+                self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._pool, self._slots
+
+    def run(self, op, job, *args):
+        app = current_app._get_current_object()
+        if app.config['PASSWORD_HASH_WORKERS'] <= 0:
+            result, queued, took = job(*args, time.time())
+        else:
+            pool, slots = self._executor(app)
+            if not slots.acquire(blocking=False): raise PasswordHasherBusy()
+            try:
+                result, queued, took = pool.submit(job, *args, time.time()).result()
+            except BrokenProcessPool:
+                # A hashing process died: start a fresh pool next time
+                with self._lock:
+                    if self._pool is pool: self._pool = None
+                raise
+            finally:
+                slots.release()
+        HASH_QUEUE_SECONDS.labels(op).observe(max(queued, 0))
+        HASH_SECONDS.labels(op).observe(took)
+        return result
+
+hasher = PasswordHasher()
+
+def hash_password(password):
+    return hasher.run('hash', hash_job, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+def verify_password(stored_hash, password):
+    """Returns (ok, new_hash); new_hash is set when stored_hash used other hash parameters."""
+    return hasher.run('verify', verify_job, stored_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
@@ -0,0 +1,89 @@
+# backend/profiles.py
+# In-process cache of the user fields hot paths keep re-reading (timezone, email, avatar).
+#
+# Bounded LRU with a TTL. Writes in this process invalidate their entry right away;
+# other web workers keep their copy until it expires, so PROFILE_CACHE_TTL_SECONDS
+# is the longest another worker can act on an old timezone. Password hashes and
+# reset tokens are never cached.
+
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+from flask import current_app
+from prometheus_client import Counter
+from sqlalchemy import select
+from models import db, User, resolve_timezone
+from avatars import thumbnail_url, THUMBNAIL_SIZES
+
+PROFILE_CACHE_REQUESTS = Counter('user_profile_cache_requests', 'User profile cache lookups', ['result'])
+
+def avatar_url(avatar):
+    # Full URLs (S3) are used as is, bare filenames (old local uploads) live under /static/avatars
+    if avatar and not avatar.startswith('http') and not avatar.startswith('/'):
+        return f"/static/avatars/{avatar}"
+    return avatar
+
+class UserProfile(NamedTuple):
+    id: int
+    email: str
+    name: str
+    nickname: str
+    phone: str
+    timezone: str
+    tz: object # resolved ZoneInfo
+    avatar: str
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row.id, row.email, row.name, row.nickname, row.phone, row.timezone,
+                   resolve_timezone(row.timezone), avatar_url(row.avatar))
+
+    def to_dict(self):
+        return {
+            "name": self.name, "nickname": self.nickname, "avatar": self.avatar,
+            "avatar_small": thumbnail_url(self.avatar, min(THUMBNAIL_SIZES)),
+            "email": self.email, "phone": self.phone, "timezone": self.timezone
+        }
+
+PROFILE_COLUMNS = [User.id, User.email, User.name, User.nickname, User.phone, User.timezone, User.avatar]
+
+class ProfileCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # user_id -> (expires_at, UserProfile)
+
+    def get(self, user_id):
+        """The user's profile, or None if there is no such user."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                PROFILE_CACHE_REQUESTS.labels('hit').inc()
+                return entry[1]
+        PROFILE_CACHE_REQUESTS.labels('miss').inc()
+        row = db.session.execute(select(*PROFILE_COLUMNS).where(User.id == user_id)).first()
+        if not row: return None
+        profile = UserProfile.from_row(row)
+        self.put(profile)
+        return profile
+
+    def put(self, profile):
+        config = current_app.config
+        if config['PROFILE_CACHE_SIZE'] <= 0: return
+        with self._lock:
+            self._entries[profile.id] = (time.monotonic() + config['PROFILE_CACHE_TTL_SECONDS'], profile)
+            self._entries.move_to_end(profile.id)
+            while len(self._entries) > config['PROFILE_CACHE_SIZE']:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+profiles = ProfileCache()
@@ -0,0 +1,122 @@
+# backend/profiling.py
+# Opt-in cProfile for single requests.
+#
+# A request is profiled when it is sampled (PROFILE_SAMPLE_RATE, e.g. 0.001) or sent with
+# `X-Profile: <PROFILE_TOKEN>`. The profile covers the whole view: queries, todo_to_dict,
+# JSON encoding. It is written to PROFILE_DIR as
+#   20261018T101502-todos.get_todos-184ms-1234-7.prof
+# (once the response is sent, the oldest are removed past PROFILE_MAX_FILES) and named in the
+# X-Profile-File header.
+#
+#   flask show-profile [file] [--limit 30]    top functions by cumulative time (default: newest)
+#   snakeviz <file>                          if you want the picture
+#
+# One profiled request per process at a time: cProfile can't nest, and from Python 3.12 it
+# watches every thread. Requests that would overlap just aren't profiled. Unsampled requests
+# pay one random() call. Slow statements are logged by instrumentation.py (SLOW_QUERY_MS).
+
+import cProfile
+import glob
+import hmac
+import itertools
+import os
+import pstats
+import random
+import threading
+import time
+from datetime import datetime
+import click
+from flask import g, request
+
+PROFILE_SUFFIX = '.prof'
+
+_busy = threading.Lock()
+_sequence = itertools.count(1)
+
+def wants_profile(config):
+    token = config['PROFILE_TOKEN']
+    header = request.headers.get('X-Profile')
+    if token and header and hmac.compare_digest(header, token): return True
+    rate = config['PROFILE_SAMPLE_RATE']
+    return rate > 0 and random.random() < rate
+
+def profile_path(folder, elapsed):
+    endpoint = (request.endpoint or 'unmatched').replace(os.sep, '_')
+    stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+    return os.path.join(folder, f"{stamp}-{endpoint}-{elapsed * 1000:.0f}ms-{os.getpid()}-{next(_sequence)}{PROFILE_SUFFIX}")
+
+def profiles_by_age(folder):
+    """Profile files in folder, oldest first."""
+    dated = []
+    for path in glob.glob(os.path.join(folder, '*' + PROFILE_SUFFIX)):
+        # Other workers prune the same folder: a file can vanish between glob and stat
+        try: dated.append((os.path.getmtime(path), path))
+        except OSError: continue
+    return [path for _, path in sorted(dated)]
+
+def prune_profiles(folder, keep):
+    files = profiles_by_age(folder)
+    for path in files[:max(0, len(files) - keep)]:
+        try: os.remove(path)
+        except OSError: pass
+
+def stop_profile():
+    """Stops this request's profiler, if any. Returns (profiler, elapsed seconds) or None."""
+    profiler = g.pop('profiler', None)
+    if profiler is None: return None
+    profiler.disable()
+    elapsed = time.perf_counter() - g.pop('profile_started')
+    _busy.release()
+    return profiler, elapsed
+
+def latest_profile(folder):
+    files = profiles_by_age(folder)
+    return files[-1] if files else None
+
+def init_profiling(app):
+    folder = app.config['PROFILE_DIR']
+
+    @app.cli.command('show-profile')
+    @click.argument('path', required=False)
+    @click.option('--limit', default=30, help='Functions to list')
+    def show_profile_command(path, limit):
+        path = path or latest_profile(folder)
+        if not path:
+            print(f"No profiles in {folder}")
+            return
+        print(f"📈 {path}")
+        pstats.Stats(path).strip_dirs().sort_stats('cumulative').print_stats(limit)
+
+    if not (app.config['PROFILE_SAMPLE_RATE'] > 0 or app.config['PROFILE_TOKEN']): return
+
+    @app.before_request
+    def start_profile():
+        if not wants_profile(app.config): return
+        if not _busy.acquire(blocking=False): return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (a debugger, coverage) already owns the hook
+            _busy.release()
+            return
+        g.profiler = profiler
+        g.profile_started = time.perf_counter()
+
+    @app.after_request
+    def write_profile(response):
+        stopped = stop_profile()
+        if stopped is None: return response
+        profiler, elapsed = stopped
+        os.makedirs(folder, exist_ok=True)
+        path = profile_path(folder, elapsed)
+        profiler.dump_stats(path)
+        # After the response has gone out: the request doesn't wait on listing the folder
+        response.call_on_close(lambda: prune_profiles(folder, app.config['PROFILE_MAX_FILES']))
+        response.headers['X-Profile-File'] = os.path.basename(path)
+        return response
+
+    @app.teardown_request
+    def discard_profile(exc):
+        # Unhandled errors skip after_request; never leave the profiler running
+        stop_profile()
@@ -0,0 +1,95 @@
+# backend/recurrence.py
+# ProTodo v1.9 - Lazy recurrence (one row per series)
+#
+# A recurring todo is a series: the row stores an RRULE (Todo.rrule, or one of the
+# 'daily'/'weekly'/'monthly'/'yearly' presets in Todo.recurrence) anchored at
+# Todo.series_start, and its due_date is the current open occurrence. Completing or
+# skipping an occurrence writes one TodoOccurrence row and moves the series along;
+# occurrences nobody acted on are never stored. Anything else is expanded on demand.
+#
+# Rules run on the wall-clock due_date (see models.due_date_to_utc), so a daily
+# 09:00 task stays at 09:00 across DST changes.
+
+import functools
+import itertools
+from datetime import datetime, timedelta
+from dateutil.rrule import rrulestr, DAILY, WEEKLY, MONTHLY, YEARLY
+from sqlalchemy import select
+from models import db, TodoOccurrence
+
+PRESETS = {
+    'daily': 'FREQ=DAILY',
+    'weekly': 'FREQ=WEEKLY',
+    'monthly': 'FREQ=MONTHLY',
+    'yearly': 'FREQ=YEARLY',
+}
+CUSTOM = 'custom' # Todo.recurrence when the series uses its own rrule
+
+MAX_RULE_LENGTH = 200
+MAX_EXPANSION = 500 # occurrences per series per request
+ALLOWED_FREQS = {DAILY, WEEKLY, MONTHLY, YEARLY}
+OCCURRENCE_STATUSES = {'completed', 'skipped'}
+
+def parse_rule(rule):
+    """Validate an RRULE body ("FREQ=WEEKLY;BYDAY=MO,FR", "RRULE:" prefix optional).
+
+    Returns the normalised body; raises ValueError with a user-facing message.
+    """
+    if not isinstance(rule, str) or not rule.strip(): raise ValueError("rrule must be a non-empty string")
+    rule = rule.strip()
+    if rule.upper().startswith('RRULE:'): rule = rule[6:]
+    if len(rule) > MAX_RULE_LENGTH: raise ValueError("rrule is too long")
+    if 'DTSTART' in rule.upper(): raise ValueError("rrule must not contain DTSTART; the due date is the start")
+    try:
+        parsed = rrulestr(rule, dtstart=datetime(2000, 1, 1))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid rrule: {e}")
+    if parsed._freq not in ALLOWED_FREQS: raise ValueError("rrule FREQ must be DAILY, WEEKLY, MONTHLY or YEARLY")
+    return rule.upper()
+
+def series_rule(recurrence, rrule=None):
+    """The RRULE body a todo repeats by, or None for one-off todos."""
+    if rrule: return rrule
+    return PRESETS.get(recurrence)
+
+@functools.lru_cache(maxsize=1024)
+def build_rule(rule, start):
+    parts = dict(p.split('=', 1) for p in rule.split(';') if '=' in p)
+    # "Monthly on the 31st" should mean the last day in shorter months, not skip them
+    if (parts.get('FREQ') == 'MONTHLY' and start.day > 28
+            and not any(k.startswith('BY') for k in parts)):
+        days = ','.join(str(d) for d in range(28, start.day + 1))
+        rule = f"{rule};BYMONTHDAY={days};BYSETPOS=-1"
+    return rrulestr(rule, dtstart=start, cache=True)
+
+def is_occurrence(rule, start, when):
+    return build_rule(rule, start).after(when - timedelta(microseconds=1), inc=True) == when
+
+def first_occurrence(rule, start):
+    """The first occurrence at or after `start` (which a custom rule may skip), or None."""
+    return build_rule(rule, start).after(start - timedelta(microseconds=1), inc=True)
+
+def next_occurrence(rule, start, after, done=()):
+    """First occurrence strictly after `after` that isn't in `done`, or None when the series ended."""
+    for candidate in build_rule(rule, start).xafter(after, count=MAX_EXPANSION, inc=False):
+        if candidate not in done: return candidate
+    return None
+
+def occurrences_between(rule, start, window_start, window_end):
+    expanded = build_rule(rule, start).xafter(window_start, count=MAX_EXPANSION, inc=True)
+    return list(itertools.takewhile(lambda dt: dt <= window_end, expanded))
+
+def done_occurrences(todo_ids, since=None):
+    """{todo_id: {occurs_at, ...}} of completed/skipped occurrences (optionally from `since` on)."""
+    done = {}
+    if not todo_ids: return done
+    query = select(TodoOccurrence.todo_id, TodoOccurrence.occurs_at).where(TodoOccurrence.todo_id.in_(todo_ids))
+    if since is not None: query = query.where(TodoOccurrence.occurs_at >= since)
+    for row in db.session.execute(query):
+        done.setdefault(row.todo_id, set()).add(row.occurs_at)
+    return done
+
+def reset_subtasks(subtasks):
+    # Each occurrence starts with a fresh checklist
+    if not subtasks: return subtasks
+    return [dict(sub, completed=False) if isinstance(sub, dict) else sub for sub in subtasks]
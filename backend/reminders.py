@@ -0,0 +1,197 @@
+# backend/reminders.py
+# ProTodo v1.9 - Batched Scheduler Tick (series advance lazily, see recurrence.py)
+
+import time
+from datetime import datetime, timezone, timedelta
+from prometheus_client import Counter, Histogram
+from sqlalchemy import select, update, delete
+from sqlalchemy.exc import IntegrityError
+from models import db, User, Todo, TodoTombstone, TodoEvent, OutboxEmail, SchedulerLease, resolve_timezone, due_date_to_utc, compute_next_action_at
+from mailer import send_reminder_email
+from events import publish_many
+from stats import StatsDelta
+from recurrence import series_rule, next_occurrence, done_occurrences, reset_subtasks
+
+SCHEDULER_TICK_SECONDS = Histogram(
+    'scheduler_tick_seconds', 'Duration of one scheduler tick',
+    buckets=(.01, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+SCHEDULER_TICK_ROWS = Histogram(
+    'scheduler_tick_rows', 'Todos handled by one scheduler tick', ['kind'],
+    buckets=(0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+)
+SCHEDULER_TICK_ERRORS = Counter('scheduler_tick_errors', 'Scheduler ticks that raised')
+
+def mark_subtasks(subtasks, completed):
+    return [dict(sub, completed=completed) for sub in (subtasks or [])]
+
+def acquire_lease(name, holder, ttl_seconds):
+    """Take or renew the named lease. Returns True if `holder` owns it for the next ttl_seconds."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    expires_at = now + timedelta(seconds=ttl_seconds)
+    renewed = db.session.execute(
+        update(SchedulerLease)
+        .where(SchedulerLease.name == name)
+        .where((SchedulerLease.holder == holder) | (SchedulerLease.expires_at < now))
+        .values(holder=holder, expires_at=expires_at)
+    ).rowcount
+    if renewed:
+        db.session.commit()
+        return True
+    try:
+        db.session.add(SchedulerLease(name=name, holder=holder, expires_at=expires_at))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        # Someone else holds it
+        db.session.rollback()
+        return False
+
+def run_tick(tick_seconds=60, batch_size=500, shard_index=0, shard_count=1, keep_lease=None,
+             tombstone_days=None, event_retention_minutes=None, outbox_retention_days=None):
+    """Process every todo due inside the next tick, one chunk (and commit) at a time.
+
+    With shard_count > 1 only users where user_id % shard_count == shard_index are handled.
+    keep_lease (optional) is called before every chunk after the first; when it returns False
+    another runner owns the shard now, so the tick stops (report["lease_lost"]).
+    With tombstone_days / event_retention_minutes / outbox_retention_days set, old tombstones,
+    SSE events and finished outbox emails are pruned too.
+
+    Overdue one-off todos are auto-completed. Overdue series move to their next open
+    occurrence after now; the ones they pass are not stored (they read as 'missed').
+
+    Returns a report: rows scanned, completed, advanced, reminded, commits, elapsed_ms.
+    """
+    started = time.perf_counter()
+    report = {"scanned": 0, "completed": 0, "advanced": 0, "reminded": 0, "commits": 0}
+
+    now_utc = datetime.now(timezone.utc)
+    now = now_utc.replace(tzinfo=None)
+    window_end = (now_utc + timedelta(seconds=tick_seconds)).replace(tzinfo=None)
+
+    # One joined query per chunk instead of one User lookup per todo
+    query = (
+        select(
+            Todo.id, Todo.user_id, Todo.title, Todo.notes, Todo.priority, Todo.category,
+            Todo.tags, Todo.recurrence, Todo.rrule, Todo.series_start, Todo.reminder_minutes, Todo.reminder_sent,
+            Todo.due_date, Todo.subtasks, User.timezone, User.email
+        )
+        .join(User, User.id == Todo.user_id)
+        .where(Todo.completed == False, Todo.next_action_at <= window_end)
+        .order_by(Todo.id)
+        .limit(batch_size)
+    )
+    if shard_count > 1:
+        query = query.where(Todo.user_id % shard_count == shard_index)
+
+    last_id = 0
+    while True:
+        if last_id and keep_lease and not keep_lease():
+            report["lease_lost"] = True
+            break
+        rows = db.session.execute(query.where(Todo.id > last_id)).all()
+        if not rows: break
+        last_id = rows[-1].id
+        report["scanned"] += len(rows)
+
+        completions, advances, reminders, events = [], [], [], []
+        stats = StatsDelta()
+        # Occurrences users already completed/skipped ahead of time, for the series in this chunk
+        done = done_occurrences([r.id for r in rows if r.series_start and series_rule(r.recurrence, r.rrule)])
+        for row in rows:
+            if not row.due_date: continue
+            user_tz = resolve_timezone(row.timezone)
+            task_time_utc = due_date_to_utc(row.due_date, user_tz)
+            minutes_remaining = (task_time_utc - now_utc).total_seconds() / 60
+
+            # 1. OVERDUE
+            if minutes_remaining < 0:
+                events.append({"user_id": row.user_id, "type": "todo.due", "data": {"id": row.id, "title": row.title}})
+
+                # Series: move to the next open occurrence after now
+                rule = series_rule(row.recurrence, row.rrule)
+                next_date = None
+                if rule and row.series_start:
+                    local_now = now_utc.astimezone(user_tz).replace(tzinfo=None)
+                    next_date = next_occurrence(
+                        rule, row.series_start, max(row.due_date, local_now), done.get(row.id, ())
+                    )
+                if next_date:
+                    advances.append({
+                        "id": row.id, "due_date": next_date, "reminder_sent": False, "updated_at": now,
+                        "subtasks": reset_subtasks(row.subtasks),
+                        "next_action_at": compute_next_action_at(
+                            next_date, row.timezone, row.reminder_minutes, False, False
+                        )
+                    })
+                    continue
+
+                # One-off todo (or the series ended): auto-complete
+                completions.append({
+                    "id": row.id, "completed": True, "next_action_at": None, "updated_at": now,
+                    "subtasks": mark_subtasks(row.subtasks, True) if row.subtasks else row.subtasks
+                })
+                stats.change(row.user_id, (row.category, False), (row.category, True))
+                continue
+
+            # 2. REMINDER
+            if not row.reminder_sent and minutes_remaining <= ((row.reminder_minutes or 0) + 1):
+                if row.email:
+                    formatted_time = task_time_utc.astimezone(user_tz).strftime('%Y-%m-%d %I:%M %p')
+                    send_reminder_email(row.email, row.title, formatted_time)
+                events.append({"user_id": row.user_id, "type": "reminder", "data": {
+                    "id": row.id, "title": row.title, "due_date": row.due_date.isoformat()
+                }})
+                reminders.append({
+                    "id": row.id, "reminder_sent": True, "updated_at": now,
+                    "next_action_at": task_time_utc.replace(tzinfo=None)
+                })
+
+        # Bulk UPDATE / INSERT (executemany), one commit per chunk
+        if completions: db.session.execute(update(Todo), completions)
+        if advances: db.session.execute(update(Todo), advances)
+        if reminders: db.session.execute(update(Todo), reminders)
+        stats.apply()
+        publish_many(events)
+        db.session.commit()
+
+        report["commits"] += 1
+        report["completed"] += len(completions)
+        report["advanced"] += len(advances)
+        report["reminded"] += len(reminders)
+
+        if len(rows) < batch_size: break
+
+    # The new lease holder prunes on its own tick
+    if report.get("lease_lost"): tombstone_days = event_retention_minutes = outbox_retention_days = None
+
+    # Tombstones only need to outlive the oldest client sync cursor
+    if tombstone_days:
+        cutoff = now - timedelta(days=tombstone_days)
+        report["tombstones_pruned"] = db.session.execute(
+            delete(TodoTombstone).where(TodoTombstone.deleted_at < cutoff)
+        ).rowcount
+        db.session.commit()
+
+    # SSE clients resume from at most a few minutes back
+    if event_retention_minutes:
+        cutoff = now - timedelta(minutes=event_retention_minutes)
+        report["events_pruned"] = db.session.execute(
+            delete(TodoEvent).where(TodoEvent.created_at < cutoff)
+        ).rowcount
+        db.session.commit()
+
+    # Sent / failed emails (next_attempt_at is NULL) are only kept for debugging delivery
+    if outbox_retention_days:
+        cutoff = now - timedelta(days=outbox_retention_days)
+        report["outbox_pruned"] = db.session.execute(
+            delete(OutboxEmail).where(OutboxEmail.created_at < cutoff, OutboxEmail.next_attempt_at.is_(None))
+        ).rowcount
+        db.session.commit()
+
+    elapsed = time.perf_counter() - started
+    SCHEDULER_TICK_SECONDS.observe(elapsed)
+    for kind in ("scanned", "completed", "advanced", "reminded"):
+        SCHEDULER_TICK_ROWS.labels(kind).observe(report[kind])
+    report["elapsed_ms"] = round(elapsed * 1000, 1)
+    return report
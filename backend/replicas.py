@@ -0,0 +1,99 @@
+# backend/replicas.py
+# Read replica routing with read-your-writes.
+#
+# DATABASE_REPLICA_URL adds a 'replica' bind. Views marked @replica_reads (the todo list and
+# its 304 polls, stats, search, export) send their SELECTs there. Every other query, and every
+# write in any view, goes to the primary.
+#
+# Replicas lag, so a request that wrote anything keeps that user on the primary for
+# REPLICA_STICKY_SECONDS. This is tracked per user in this process and by a short-lived cookie,
+# so a browser's next poll reads its own write whichever worker answers it.
+#
+# Two local databases:
+#   DATABASE_URL=sqlite:////tmp/replica.db flask upgrade-schema
+#   DATABASE_URL=sqlite:////tmp/primary.db DATABASE_REPLICA_URL=sqlite:////tmp/replica.db flask run
+# Nothing copies primary -> replica there, so the list only shows a new todo while the
+# writer is sticky: routing and stickiness are easy to see.
+
+import functools
+import threading
+import time
+from flask import current_app, g, request, has_request_context
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from prometheus_client import Counter
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_BIND = 'replica'
+STICKY_COOKIE = 'protodo_primary_until'
+STICKY_USERS_MAX = 10000
+
+REPLICA_QUERIES = Counter(
+    'db_replica_routing', 'SELECTs in @replica_reads views by where they ran', ['target']
+)
+
+_sticky_users = {}
+_sticky_lock = threading.Lock()
+
+def replica_reads(view):
+    """Lets the view's SELECTs run on the replica (when one is configured)."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.replica_reads = True
+        return view(*args, **kwargs)
+    return wrapper
+
+def request_user_id():
+    try: return get_jwt_identity()
+    except RuntimeError: return None # no token verified in this request
+
+def sticky_to_primary():
+    """True if this request's user wrote within the last REPLICA_STICKY_SECONDS."""
+    sticky = g.get('replica_sticky')
+    if sticky is not None: return sticky
+    now = time.time()
+    try: cookie_until = float(request.cookies.get(STICKY_COOKIE) or 0)
+    except ValueError: cookie_until = 0
+    user_id = request_user_id()
+    sticky = cookie_until > now or (user_id is not None and _sticky_users.get(str(user_id), 0) > now)
+    g.replica_sticky = sticky
+    return sticky
+
+class RoutingSession(Session):
+    # get_bind runs for every statement, so it sees the writes as well as the reads
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or isinstance(clause, UpdateBase):
+                g.db_wrote = True
+            elif g.get('replica_reads') and isinstance(clause, Select):
+                engine = self._db.engines.get(REPLICA_BIND)
+                if engine is not None:
+                    if not sticky_to_primary():
+                        REPLICA_QUERIES.labels('replica').inc()
+                        return engine
+                    REPLICA_QUERIES.labels('primary_sticky').inc()
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def remember_write(user_id, until):
+    with _sticky_lock:
+        if len(_sticky_users) >= STICKY_USERS_MAX:
+            now = time.time()
+            for key in [k for k, v in _sticky_users.items() if v <= now]: del _sticky_users[key]
+        _sticky_users[str(user_id)] = until
+
+def init_replicas(app):
+    if REPLICA_BIND not in app.config['SQLALCHEMY_BINDS']: return
+
+    @app.after_request
+    def stick_writer_to_primary(response):
+        if not g.get('db_wrote'): return response
+        sticky_seconds = current_app.config['REPLICA_STICKY_SECONDS']
+        until = time.time() + sticky_seconds
+        user_id = request_user_id()
+        if user_id is not None: remember_write(user_id, until)
+        response.set_cookie(
+            STICKY_COOKIE, f"{until:.0f}", max_age=sticky_seconds,
+            httponly=True, samesite='Lax', secure=request.is_secure
+        )
+        return response
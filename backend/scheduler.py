@@ -0,0 +1,26 @@
+# backend/scheduler.py
+# Dedicated scheduler runner (reminders, auto-complete, recurrence, mail outbox, avatar thumbnails).
+#
+# Run exactly one per shard, next to (not inside) the gunicorn workers:
+#   python scheduler.py
+#   SCHEDULER_SHARD_INDEX=1 SCHEDULER_SHARD_COUNT=4 python scheduler.py
+
+import signal
+import threading
+from prometheus_client import start_http_server
+from app import create_app
+
+app = create_app(run_scheduler=True)
+
+if __name__ == '__main__':
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    signal.signal(signal.SIGINT, lambda *args: stop.set())
+    # Tick, mail and SQL metrics of this process; Prometheus scrapes it as job 'scheduler'
+    if app.config['SCHEDULER_METRICS_PORT']:
+        start_http_server(app.config['SCHEDULER_METRICS_PORT'])
+    print(f"🕒 Scheduler running (shard {app.config['SCHEDULER_SHARD_INDEX']} of {app.config['SCHEDULER_SHARD_COUNT']})")
+    stop.wait()
+    app.apscheduler.shutdown()
+    app.extensions['mail_worker'].stop()
+    app.extensions['thumbnail_worker'].stop()
@@ -0,0 +1,124 @@
+# backend/schema.py
+# Schema migrations (Flask-Migrate / Alembic) and query-plan checks for the hot queries.
+#
+#   flask upgrade-schema          apply migrations; stamps pre-migration databases first
+#                                 (run by the Docker image and `python app.py`)
+#   flask db migrate -m "..."     autogenerate a new revision after editing models.py
+#   flask check-query-plans       EXPLAIN every hot query; exits 1 if one needs a full table scan
+
+import os
+import sys
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, or_, and_, text
+from models import db, User, Todo, OutboxEmail, TodoTombstone, TodoEvent, AvatarUpload
+from search import search_statement, is_search_object
+
+def include_object(object, name, type_, reflected, compare_to):
+    # The full-text index (migration 0004) is trigger-maintained and not in models.py
+    return not (reflected and compare_to is None and is_search_object(name, type_))
+
+# Databases created by db.create_all() before migrations existed match this revision
+BASELINE_REVISION = '0001_baseline'
+
+def init_migrate(app):
+    # Flask-Migrate pulls in Alembic (~200ms of imports): only the CLI and upgrade_schema
+    # load it, web workers never do
+    if 'migrate' in app.extensions: return
+    from flask_migrate import Migrate
+    Migrate(app, db, directory=os.path.join(app.root_path, 'migrations'), include_object=include_object)
+
+def init_schema(app):
+    # Set by the `flask` command before it loads the app (`flask db ...` needs Migrate)
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true': init_migrate(app)
+
+    @app.cli.command('upgrade-schema')
+    def upgrade_schema_command():
+        upgrade_schema(app)
+
+    @app.cli.command('check-query-plans')
+    def check_query_plans_command():
+        failures = check_query_plans()
+        if failures: sys.exit(1)
+
+def upgrade_schema(app):
+    from flask_migrate import upgrade, stamp
+    init_migrate(app)
+    with app.app_context():
+        inspector = db.inspect(db.engine)
+        if inspector.has_table('todo') and not inspector.has_table('alembic_version'):
+            print("📦 Existing pre-migration database: stamping baseline")
+            stamp(revision=BASELINE_REVISION)
+        upgrade()
+
+# =========================================================
+# QUERY PLAN REGRESSION CHECKS
+# =========================================================
+
+def hot_queries():
+    # Mirrors the statements built in todos.py, reminders.py, mailer.py, avatars.py, events.py and auth.py
+    now = datetime(2026, 1, 1, 12, 0)
+    return {
+        "get_todos (first page)": select(Todo.id).where(Todo.user_id == 1)
+            .order_by(Todo.created_at.desc(), Todo.id.desc()).limit(51),
+        "get_todos (keyset page)": select(Todo.id).where(Todo.user_id == 1, or_(
+            Todo.created_at < now, and_(Todo.created_at == now, Todo.id < 100)
+        )).order_by(Todo.created_at.desc(), Todo.id.desc()).limit(51),
+        "get_todos (etag version)": select(func.count(Todo.id), func.max(Todo.updated_at)).where(Todo.user_id == 1),
+        "get_todos (?since= changes)": select(Todo.id).where(Todo.user_id == 1, Todo.updated_at > now),
+        "get_todos (?since= tombstones)": select(TodoTombstone.todo_id)
+            .where(TodoTombstone.user_id == 1, TodoTombstone.deleted_at > now),
+        "update/delete_todo": select(Todo.id).where(Todo.id == 1, Todo.user_id == 1),
+        "scheduler tick": select(Todo.id).where(Todo.completed == False, Todo.next_action_at <= now),
+        "mail outbox claim": select(OutboxEmail.id).where(
+            OutboxEmail.status.in_(['pending', 'sending']), OutboxEmail.next_attempt_at <= now
+        ).order_by(OutboxEmail.next_attempt_at).limit(50),
+        "mail outbox depth": select(func.count(OutboxEmail.id)).where(OutboxEmail.next_attempt_at.isnot(None)),
+        "mail outbox prune": select(OutboxEmail.id).where(
+            OutboxEmail.created_at < now, OutboxEmail.next_attempt_at.is_(None)
+        ),
+        "avatar thumbnail claim": select(AvatarUpload.id).where(
+            AvatarUpload.status.in_(['pending', 'processing']), AvatarUpload.next_attempt_at <= now
+        ).order_by(AvatarUpload.next_attempt_at).limit(10),
+        "sse relay": select(TodoEvent.id).where(TodoEvent.id > 100).order_by(TodoEvent.id).limit(500),
+        "login": select(User.id).where(User.email == 'someone@example.com'),
+        "search": search_statement(1, ['milk'], [Todo.id]).limit(51),
+    }
+
+HOT_TABLES = {'todo', 'user', 'outbox_email', 'todo_tombstone', 'todo_event', 'avatar_upload'}
+
+def full_scans_sqlite(sql):
+    rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    # "SEARCH t USING INDEX ..." is fine; "SCAN t" (with or without an index) reads the whole table
+    return [r.detail for r in rows if r.detail.startswith('SCAN ') and r.detail.split()[1] in HOT_TABLES]
+
+def full_scans_postgres(sql):
+    # Tables are tiny in CI, so take seq scans off the table: any that remain have no index path
+    db.session.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = db.session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    plan = plan if isinstance(plan, list) else json.loads(plan)
+    scans, nodes = [], [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in HOT_TABLES:
+            scans.append(f"Seq Scan on {node['Relation Name']}")
+        nodes.extend(node.get('Plans', []))
+    return scans
+
+def check_query_plans():
+    """EXPLAIN each hot query on the current database. Returns {name: [full scans]} for failures."""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite': explain = full_scans_sqlite
+    elif dialect == 'postgresql': explain = full_scans_postgres
+    else:
+        print(f"⚠️ No plan checker for {dialect}")
+        return {}
+
+    failures = {}
+    for name, stmt in hot_queries().items():
+        sql = str(stmt.compile(db.engine, compile_kwargs={"literal_binds": True}))
+        scans = explain(sql)
+        db.session.rollback()
+        print(f"{'❌' if scans else '✅'} {name}" + (f": {'; '.join(scans)}" if scans else ''))
+        if scans: failures[name] = scans
+    return failures
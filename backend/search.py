@@ -0,0 +1,58 @@
+# backend/search.py
+# Full-text search over title, notes, tags and subtask text.
+#
+# The index lives in the database and is kept in sync by triggers (migration 0004),
+# so every write path - single edits, bulk NDJSON, the scheduler's recurring
+# copies, deletes - updates it without application code:
+#   SQLite:   todo_fts (FTS5, porter stemming), rowid = todo.id, ranked with bm25()
+#   Postgres: todo.search_vector (tsvector, GIN index), ranked with ts_rank_cd()
+# Other databases fall back to an unranked LIKE over title and notes.
+
+import re
+from sqlalchemy import select, table, column, literal_column, func, or_
+from models import db, Todo
+
+MAX_SEARCH_TERMS = 8
+
+# bm25() weights, in todo_fts column order: user_id (unindexed), title, notes, tags, subtasks
+SQLITE_WEIGHTS = (0.0, 10.0, 1.0, 5.0, 2.0)
+
+# Objects the triggers own; hidden from `flask db check` / autogenerate (see schema.py)
+SEARCH_TABLE_PREFIX = 'todo_fts'
+SEARCH_COLUMN = 'search_vector'
+SEARCH_INDEX = 'ix_todo_search'
+
+todo_fts = table('todo_fts', column('rowid'), column('user_id'))
+
+def search_terms(text):
+    # Words only: user input never reaches the MATCH / tsquery syntax as-is
+    return re.findall(r'\w+', (text or '').lower())[:MAX_SEARCH_TERMS]
+
+def search_statement(user_id, terms, columns, dialect=None):
+    """SELECT columns of the user's todos matching every term (prefix match), best first."""
+    dialect = dialect or db.engine.dialect.name
+    stmt = select(*columns).where(Todo.user_id == user_id)
+
+    if dialect == 'sqlite':
+        match = ' '.join(f'"{t}"*' for t in terms)
+        rank = func.bm25(literal_column('todo_fts'), *SQLITE_WEIGHTS)
+        return (stmt.join(todo_fts, todo_fts.c.rowid == Todo.id)
+                .where(literal_column('todo_fts').op('MATCH')(match))
+                .order_by(rank, Todo.id.desc()))
+
+    if dialect == 'postgresql':
+        query = func.to_tsquery('english', ' & '.join(f"{t}:*" for t in terms))
+        vector = literal_column(f'todo.{SEARCH_COLUMN}')
+        return (stmt.where(vector.op('@@')(query))
+                .order_by(func.ts_rank_cd(vector, query).desc(), Todo.id.desc()))
+
+    for t in terms:
+        pattern = f"%{t}%"
+        stmt = stmt.where(or_(Todo.title.ilike(pattern), Todo.notes.ilike(pattern)))
+    return stmt.order_by(Todo.created_at.desc(), Todo.id.desc())
+
+def is_search_object(name, type_):
+    if type_ == 'table': return name.startswith(SEARCH_TABLE_PREFIX)
+    if type_ == 'column': return name == SEARCH_COLUMN
+    if type_ == 'index': return name == SEARCH_INDEX
+    return False
@@ -0,0 +1,37 @@
+# backend/serialize.py
+# Fast JSON responses for hot list endpoints.
+#
+# Produces exactly the bytes Flask's jsonify() would (sorted keys, compact
+# separators, UTF-8 text, trailing newline - see create_app, which turns off
+# ensure_ascii so both paths agree). Uses orjson when installed, else stdlib json.
+# Todo payloads are strings/ints/bools/nulls; the one known spelling difference is
+# exponent floats in user JSON (orjson 1e20 vs json 1e+20), which parse identically.
+
+import json
+from flask import current_app, jsonify
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(obj):
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                obj,
+                default=current_app.json.default,
+                option=orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_APPEND_NEWLINE
+            )
+        except TypeError:
+            # e.g. ints beyond 64 bits or non-str keys in user JSON: stdlib handles those
+            pass
+    return (json.dumps(
+        obj, default=current_app.json.default, ensure_ascii=False,
+        sort_keys=True, separators=(",", ":")
+    ) + "\n").encode()
+
+def fast_jsonify(obj):
+    # Debug mode pretty-prints, so keep jsonify there
+    if current_app.debug: return jsonify(obj)
+    return current_app.response_class(dumps(obj), mimetype=current_app.json.mimetype)
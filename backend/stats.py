@@ -0,0 +1,137 @@
+# backend/stats.py
+# Per-user dashboard counters (todo_stats: total / completed per category).
+#
+# Every write path records what it adds, removes or changes in a StatsDelta and
+# calls apply() before its commit, so the counters land in the same transaction
+# as the todos. Increments are relative (total = total + n), so concurrent
+# writers never overwrite each other; `flask rebuild-stats` recomputes from scratch.
+
+import sys
+from sqlalchemy import select, update, insert, delete, func, case
+from models import db, Todo, TodoStats
+
+def stats_category(category):
+    return category or 'other'
+
+class StatsDelta:
+    def __init__(self):
+        self.deltas = {} # (user_id, category) -> [total, completed]
+
+    def add(self, user_id, category, completed, sign=1):
+        counts = self.deltas.setdefault((user_id, stats_category(category)), [0, 0])
+        counts[0] += sign
+        if completed: counts[1] += sign
+
+    def remove(self, user_id, category, completed):
+        self.add(user_id, category, completed, sign=-1)
+
+    def change(self, user_id, before, after):
+        # before / after: (category, completed)
+        if (stats_category(before[0]), bool(before[1])) == (stats_category(after[0]), bool(after[1])): return
+        self.remove(user_id, *before)
+        self.add(user_id, *after)
+
+    def apply(self):
+        # Sorted, so two transactions touching the same rows lock them in the same order
+        rows = [
+            {"user_id": user_id, "category": category, "total": total, "completed": completed}
+            for (user_id, category), (total, completed) in sorted(self.deltas.items())
+            if total or completed
+        ]
+        self.deltas = {}
+        if not rows: return
+
+        dialect = db.engine.dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite': from sqlalchemy.dialects.sqlite import insert as upsert
+            else: from sqlalchemy.dialects.postgresql import insert as upsert
+            stmt = upsert(TodoStats)
+            db.session.execute(stmt.on_conflict_do_update(
+                index_elements=[TodoStats.user_id, TodoStats.category],
+                set_={
+                    "total": TodoStats.total + stmt.excluded.total,
+                    "completed": TodoStats.completed + stmt.excluded.completed
+                }
+            ), rows)
+            return
+
+        for row in rows:
+            matched = db.session.execute(
+                update(TodoStats)
+                .where(TodoStats.user_id == row['user_id'], TodoStats.category == row['category'])
+                .values(total=TodoStats.total + row['total'], completed=TodoStats.completed + row['completed'])
+            ).rowcount
+            if not matched: db.session.execute(insert(TodoStats), row)
+
+def user_stats(user_id):
+    rows = db.session.execute(
+        select(TodoStats.category, TodoStats.total, TodoStats.completed)
+        .where(TodoStats.user_id == user_id, TodoStats.total != 0)
+    ).all()
+    total = sum(r.total for r in rows)
+    completed = sum(r.completed for r in rows)
+    return {
+        "total": total,
+        "completed": completed,
+        "pending": total - completed,
+        "categories": {r.category: {"total": r.total, "completed": r.completed} for r in rows}
+    }
+
+# =========================================================
+# REBUILD / VERIFY
+# =========================================================
+
+def counted_stats():
+    """{(user_id, category): (total, completed)} straight from the todo table."""
+    # Same mapping as stats_category(): NULL and '' both count as 'other'
+    category = func.coalesce(func.nullif(Todo.category, ''), 'other')
+    completed = func.sum(case((Todo.completed == True, 1), else_=0))
+    return {
+        (r.user_id, r.category): (r.total, r.completed or 0)
+        for r in db.session.execute(
+            select(Todo.user_id, category.label('category'), func.count(Todo.id).label('total'),
+                   completed.label('completed'))
+            .group_by(Todo.user_id, category)
+        )
+    }
+
+def stored_stats():
+    return {
+        (r.user_id, r.category): (r.total, r.completed)
+        for r in db.session.execute(select(TodoStats.user_id, TodoStats.category, TodoStats.total, TodoStats.completed))
+        if r.total or r.completed
+    }
+
+def verify_stats():
+    """Returns [(user_id, category, stored, counted)] for every counter that disagrees."""
+    counted, stored = counted_stats(), stored_stats()
+    return [
+        (key[0], key[1], stored.get(key, (0, 0)), counted.get(key, (0, 0)))
+        for key in sorted(set(counted) | set(stored))
+        if stored.get(key, (0, 0)) != counted.get(key, (0, 0))
+    ]
+
+def rebuild_stats():
+    # Replaces the whole table in one transaction; run while writes are quiet
+    counted = counted_stats()
+    db.session.execute(delete(TodoStats))
+    if counted:
+        db.session.execute(insert(TodoStats), [
+            {"user_id": user_id, "category": category, "total": total, "completed": completed}
+            for (user_id, category), (total, completed) in counted.items()
+        ])
+    db.session.commit()
+    return len(counted)
+
+def init_stats(app):
+    @app.cli.command('verify-stats')
+    def verify_stats_command():
+        mismatches = verify_stats()
+        for user_id, category, stored, counted in mismatches:
+            print(f"❌ user {user_id} / {category}: stored {stored}, counted {counted}")
+        print(f"{len(mismatches)} mismatched counters")
+        if mismatches: sys.exit(1)
+
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats_command():
+        print(f"✅ Rebuilt {rebuild_stats()} counters")
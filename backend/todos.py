@@ -1,13 +1,35 @@
 # backend/todos.py
 # ProTodo v1.4 - Subtasks & Checklist
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, make_response, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Todo
+from models import db, Todo, TodoTombstone, TodoOccurrence, compute_next_action_at, utc_now
+from events import publish
+from serialize import fast_jsonify
+from search import search_terms, search_statement
+from stats import StatsDelta, user_stats
+from profiles import profiles
+from replicas import replica_reads
+from recurrence import (CUSTOM, PRESETS, OCCURRENCE_STATUSES, parse_rule, series_rule, is_occurrence,
+                        first_occurrence, next_occurrence, occurrences_between, done_occurrences, reset_subtasks)
 from datetime import datetime, timezone, timedelta
+from sqlalchemy import or_, and_, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+import base64
+import csv
+import hashlib
+import io
+import json
+import secrets
 
 todos_bp = Blueprint('todos', __name__)
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+SYNC_OVERLAP_SECONDS = 5
+EXPORT_CHUNK_SIZE = 500
+SUBTASK_WRITE_RETRIES = 5
+
 # =========================================================
 # 1. HELPER FUNCTIONS
 # =========================================================
@@ -20,6 +42,246 @@ def parse_due_date(date_str):
         return dt
     except ValueError: return None
 
+def user_timezone(user_id):
+    profile = profiles.get(user_id)
+    return profile.timezone if profile else None
+
+def encode_cursor(todo):
+    raw = f"{todo.created_at.isoformat()}|{todo.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        created_at, todo_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(todo_id)
+    except (ValueError, TypeError):
+        return None
+
+def filter_todos(query, args):
+    # Server-side equivalents of the old client-side filters (see renderTodos)
+    status = args.get('status', 'all')
+    if status == 'completed': query = query.filter(Todo.completed == True)
+    elif status == 'pending': query = query.filter(Todo.completed == False)
+
+    if args.get('category'): query = query.filter(Todo.category == args['category'])
+    if args.get('priority'): query = query.filter(Todo.priority == args['priority'])
+
+    # due_date is stored as wall-clock time, so compare without the offset
+    due_before = parse_due_date(args.get('due_before'))
+    if due_before: query = query.filter(Todo.due_date < due_before.replace(tzinfo=None))
+    due_after = parse_due_date(args.get('due_after'))
+    if due_after: query = query.filter(Todo.due_date >= due_after.replace(tzinfo=None))
+
+    q = (args.get('q') or '').strip()
+    if q:
+        pattern = f"%{q}%"
+        query = query.filter(or_(Todo.title.ilike(pattern), Todo.category.ilike(pattern)))
+    return query
+
+def sync_version(user_id):
+    """(todo count, last change time) for a user; both come from the (user_id, updated_at) indexes."""
+    count, last_update = db.session.query(func.count(Todo.id), func.max(Todo.updated_at)).filter(
+        Todo.user_id == user_id
+    ).one()
+    last_delete = db.session.query(func.max(TodoTombstone.deleted_at)).filter(
+        TodoTombstone.user_id == user_id
+    ).scalar()
+    last_change = max([d for d in (last_update, last_delete) if d is not None], default=None)
+    return count, last_change
+
+def encode_sync_cursor(last_change):
+    # Never older than the read (less the overlap): an empty or long-idle account would
+    # otherwise get a cursor past tombstone retention, i.e. a 410 and full reload every poll
+    floor = utc_now() - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+    position = max(last_change, floor) if last_change else floor
+    return base64.urlsafe_b64encode(position.isoformat().encode()).decode()
+
+def decode_sync_cursor(cursor):
+    try: return datetime.fromisoformat(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, TypeError): return None
+
+def changes_since(user_id, cursor):
+    """Rows created/changed and ids deleted after `cursor`.
+
+    Reads back SYNC_OVERLAP_SECONDS before the cursor so writes committed late are not
+    missed; clients apply the result as idempotent upserts/deletes.
+    """
+    since = decode_sync_cursor(cursor)
+    if not since: return {"message": "Invalid cursor"}, 400
+
+    retention = timedelta(days=current_app.config['SYNC_TOMBSTONE_DAYS'])
+    if since < datetime.now(timezone.utc).replace(tzinfo=None) - retention:
+        return {"message": "Cursor expired, reload the full list"}, 410
+
+    window_start = since - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+    changed = Todo.query.filter(Todo.user_id == user_id, Todo.updated_at > window_start).order_by(
+        Todo.updated_at
+    ).limit(MAX_PAGE_SIZE + 1).all()
+    if len(changed) > MAX_PAGE_SIZE:
+        # Too much changed: cheaper for the client to reload than to replay
+        return {"reset": True}, 200
+
+    deleted = db.session.query(TodoTombstone.todo_id, TodoTombstone.deleted_at).filter(
+        TodoTombstone.user_id == user_id, TodoTombstone.deleted_at > window_start
+    ).all()
+
+    last_change = max([since] + [t.updated_at for t in changed] + [d.deleted_at for d in deleted])
+    return {
+        "items": [todo_to_dict(t) for t in changed],
+        "deleted": [d.todo_id for d in deleted],
+        "sync_cursor": encode_sync_cursor(last_change)
+    }, 200
+
+def not_modified(etag):
+    response = make_response('', 304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def add_tombstones(user_id, todo_ids):
+    if todo_ids:
+        db.session.execute(insert(TodoTombstone), [{"todo_id": i, "user_id": user_id} for i in todo_ids])
+
+def new_subtask_id():
+    return secrets.token_hex(4)
+
+def normalize_subtasks(subtasks):
+    # Every checklist item gets a stable id (unique within its todo) for the subtask endpoints
+    if not isinstance(subtasks, list): return subtasks
+    return [
+        dict(sub, id=sub.get('id') or new_subtask_id()) if isinstance(sub, dict) else sub
+        for sub in subtasks
+    ]
+
+def request_version():
+    # If-Match: "12" (or 12) -> 12; None when absent or not a version number
+    value = (request.headers.get('If-Match') or '').strip().strip('"')
+    return int(value) if value.isdigit() else None
+
+def todo_row_from_json(data, user_id, tz_str):
+    """Validate a create payload into Todo column values. Raises ValueError with a user-facing message."""
+    if not isinstance(data, dict): raise ValueError("Expected a JSON object")
+    if not data.get('title'): raise ValueError("Title is required")
+    try: reminder_minutes = int(data.get('reminder_minutes', 30))
+    except (TypeError, ValueError): raise ValueError("reminder_minutes must be a number")
+    recurrence, rrule = parse_recurrence(data)
+
+    row = dict(
+        title=data['title'],
+        due_date=parse_due_date(data.get('due_date')),
+        priority=data.get('priority', 'medium'),
+        category=data.get('category', 'other'),
+        tags=data.get('tags', []),
+        notes=data.get('notes', ''),
+        completed=False,
+        reminder_sent=False,
+        reminder_minutes=reminder_minutes,
+        recurrence=recurrence,
+        rrule=rrule,
+        
+        # === SAVE SUBTASKS ===
+        subtasks=normalize_subtasks(data.get('subtasks', [])), 
+        
+        user_id=user_id
+    )
+    row['due_date'], row['series_start'] = anchor_series(row['due_date'], recurrence, rrule)
+    row['next_action_at'] = compute_next_action_at(row['due_date'], tz_str, reminder_minutes, False, False)
+    return row
+
+def wall_clock(dt):
+    # What the DateTime column keeps of an (aware) parsed due_date
+    return dt.replace(tzinfo=None) if dt else None
+
+def anchor_series(due_date, recurrence, rrule):
+    """(due_date, series_start) for a todo repeating from due_date: both move to the rule's
+    first occurrence on or after it (a Sunday due date with BYDAY=MO,FR starts on the Monday)."""
+    rule = series_rule(recurrence, rrule)
+    if not rule or not due_date: return due_date, None
+    first = first_occurrence(rule, wall_clock(due_date))
+    if first is None: raise ValueError("rrule has no occurrences on or after the due date")
+    return first, first
+
+def parse_recurrence(data):
+    """(recurrence, rrule) from a payload: a preset name, or a custom RRULE in 'rrule'."""
+    if data.get('rrule'): return CUSTOM, parse_rule(data['rrule'])
+    recurrence = data.get('recurrence') or 'never'
+    if recurrence == CUSTOM: raise ValueError("rrule is required for custom recurrence")
+    if recurrence != 'never' and not (isinstance(recurrence, str) and recurrence in PRESETS):
+        raise ValueError(f"recurrence must be one of: never, {', '.join(PRESETS)}, {CUSTOM}")
+    return recurrence, None
+
+def advance_series(todo, after):
+    """Move a recurring todo to its next open occurrence after `after`; closes it when the rule ends."""
+    rule = series_rule(todo.recurrence, todo.rrule)
+    done = done_occurrences([todo.id], since=after).get(todo.id, ())
+    next_date = next_occurrence(rule, todo.series_start, after, done)
+    if next_date:
+        todo.due_date = next_date
+        todo.completed = False
+        todo.reminder_sent = False
+        todo.subtasks = reset_subtasks(todo.subtasks)
+    else:
+        todo.completed = True
+
+def apply_todo_update(todo, data, tz_str):
+    """Apply a PUT/PATCH payload to `todo`. Returns a TodoOccurrence row (dict) to record, or None.
+
+    Completing a recurring todo completes its current occurrence and moves the series
+    to the next one (see recurrence.py) instead of creating a copy of the todo.
+    """
+    if not isinstance(data, dict): raise ValueError("Expected a JSON object")
+    if 'reminder_minutes' in data:
+        try: int(data['reminder_minutes'])
+        except (TypeError, ValueError): raise ValueError("reminder_minutes must be a number")
+    completing = data.get('completed') == True and not todo.completed
+    rescheduled = False
+
+    if 'recurrence' in data or 'rrule' in data:
+        # The edit form always sends recurrence: only a different rule re-anchors the series
+        recurrence, rrule = parse_recurrence(data)
+        if (recurrence, rrule) != (todo.recurrence or 'never', todo.rrule):
+            todo.recurrence, todo.rrule = recurrence, rrule
+            rescheduled = True
+
+    # Standard Updates
+    if 'title' in data: todo.title = data['title']
+    if 'completed' in data: todo.completed = data['completed']
+    if 'priority' in data: todo.priority = data['priority']
+    if 'category' in data: todo.category = data['category']
+    if 'tags' in data: todo.tags = data['tags']
+    if 'notes' in data: todo.notes = data['notes']
+    if 'reminder_minutes' in data: todo.reminder_minutes = int(data['reminder_minutes'])
+    
+    # === UPDATE SUBTASKS ===
+    if 'subtasks' in data: todo.subtasks = normalize_subtasks(data['subtasks'])
+
+    if 'due_date' in data:
+        due_date = parse_due_date(data['due_date'])
+        if wall_clock(due_date) != todo.due_date: rescheduled = True
+        todo.due_date = due_date
+        todo.reminder_sent = False 
+
+    # A new rule or due date re-anchors the series there
+    is_series = bool(series_rule(todo.recurrence, todo.rrule) and todo.due_date)
+    if rescheduled or (is_series and not todo.series_start):
+        todo.due_date, todo.series_start = anchor_series(todo.due_date, todo.recurrence, todo.rrule)
+
+    occurrence = None
+    if completing and is_series:
+        due = wall_clock(todo.due_date)
+        occurrence = {"todo_id": todo.id, "user_id": todo.user_id, "occurs_at": due, "status": "completed"}
+        advance_series(todo, due)
+
+    todo.refresh_next_action(tz_str)
+    return occurrence
+
+# Columns todo_to_dict() reads; works on ORM objects and on these projected rows alike
+LIST_COLUMNS = [
+    Todo.id, Todo.title, Todo.due_date, Todo.priority, Todo.category, Todo.tags, Todo.notes,
+    Todo.completed, Todo.reminder_minutes, Todo.recurrence, Todo.rrule, Todo.subtasks, Todo.created_at,
+    Todo.version
+]
+
 def todo_to_dict(todo):
     return {
         "id": todo.id,
@@ -32,12 +294,14 @@ def todo_to_dict(todo):
         "completed": todo.completed,
         "reminder_minutes": todo.reminder_minutes,
         "recurrence": todo.recurrence,
+        "rrule": todo.rrule,
         
         # === THIS LINE IS CRITICAL FOR SUBTASKS ===
         "subtasks": todo.subtasks or [], 
         # ==========================================
         
-        "created_at": todo.created_at.isoformat()
+        "created_at": todo.created_at.isoformat(),
+        "version": todo.version
     }
 
 # =========================================================
@@ -46,12 +310,53 @@ def todo_to_dict(todo):
 
 @todos_bp.route('/todos', methods=['GET'])
 @jwt_required()
+@replica_reads
 def get_todos():
     try:
         user_id = int(get_jwt_identity())
-        todos = Todo.query.filter_by(user_id=user_id).order_by(Todo.created_at.desc()).all()
-        output = [todo_to_dict(t) for t in todos]
-        return jsonify(output), 200
+        args = request.args
+
+        # Cheap indexed fingerprint of the user's data: unchanged -> 304, no row reads
+        version = sync_version(user_id)
+        etag = hashlib.sha1(f"{user_id}|{version}|{request.query_string.decode()}".encode()).hexdigest()
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+
+        if args.get('since'):
+            payload, status = changes_since(user_id, args['since'])
+            if status != 200: return jsonify(payload), status
+        else:
+            limit = min(max(args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+            if current_app.config['TODOS_FAST_PATH']:
+                # Plain column rows: no identity-map / ORM object hydration
+                base = db.session.query(*LIST_COLUMNS)
+            else:
+                base = Todo.query
+            query = filter_todos(base.filter(Todo.user_id == user_id), args)
+
+            # Keyset pagination on (created_at, id), newest first
+            if args.get('cursor'):
+                cursor = decode_cursor(args['cursor'])
+                if not cursor: return jsonify({"message": "Invalid cursor"}), 400
+                created_at, last_id = cursor
+                query = query.filter(or_(
+                    Todo.created_at < created_at,
+                    and_(Todo.created_at == created_at, Todo.id < last_id)
+                ))
+
+            todos = query.order_by(Todo.created_at.desc(), Todo.id.desc()).limit(limit + 1).all()
+            has_more = len(todos) > limit
+            todos = todos[:limit]
+            payload = {
+                "items": [todo_to_dict(t) for t in todos],
+                "next_cursor": encode_cursor(todos[-1]) if has_more else None,
+                "sync_cursor": encode_sync_cursor(version[1])
+            }
+
+        response = fast_jsonify(payload) if current_app.config['TODOS_FAST_PATH'] else jsonify(payload)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response, 200
     except Exception as e:
         print(f"Error fetching todos: {e}")
         return jsonify({"message": "Error fetching data"}), 500
@@ -63,28 +368,18 @@ def create_todo():
         user_id = int(get_jwt_identity())
         data = request.get_json()
 
-        if not data.get('title'):
-            return jsonify({"message": "Title is required"}), 400
-
-        new_todo = Todo(
-            title=data['title'],
-            due_date=parse_due_date(data.get('due_date')),
-            priority=data.get('priority', 'medium'),
-            category=data.get('category', 'other'),
-            tags=data.get('tags', []),
-            notes=data.get('notes', ''),
-            completed=False,
-            reminder_sent=False,
-            reminder_minutes=int(data.get('reminder_minutes', 30)),
-            recurrence=data.get('recurrence', 'never'),
-            
-            # === SAVE SUBTASKS ===
-            subtasks=data.get('subtasks', []), 
-            
-            user_id=user_id
-        )
+        try:
+            row = todo_row_from_json(data, user_id, user_timezone(user_id))
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
 
+        new_todo = Todo(**row)
         db.session.add(new_todo)
+        db.session.flush()
+        stats = StatsDelta()
+        stats.add(user_id, new_todo.category, new_todo.completed)
+        stats.apply()
+        publish(user_id, 'todo.changed', {"ids": [new_todo.id]})
         db.session.commit()
 
         return jsonify(todo_to_dict(new_todo)), 201
@@ -98,59 +393,33 @@ def create_todo():
 def update_todo(id):
     try:
         user_id = int(get_jwt_identity())
-        todo = Todo.query.filter_by(id=id, user_id=user_id).first()
+        expected_version = request_version()
+        query = Todo.query.filter_by(id=id, user_id=user_id)
+        # Row lock so the version check and the write can't interleave with another edit
+        if expected_version is not None: query = query.with_for_update()
+        todo = query.first()
         
         if not todo:
             return jsonify({"message": "Todo not found"}), 404
+        if expected_version is not None and todo.version != expected_version:
+            db.session.rollback()
+            return jsonify({"message": "Todo was changed elsewhere", "version": todo.version}), 409
 
         data = request.get_json()
+        before = (todo.category, todo.completed)
+        try:
+            occurrence = apply_todo_update(todo, data, user_timezone(user_id))
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({"message": str(e)}), 400
+        if occurrence:
+            db.session.add(TodoOccurrence(**occurrence))
+            print(f"🔄 Recurring Task {'Ended' if todo.completed else 'Advanced'}: {todo.title} -> {todo.due_date}")
+        stats = StatsDelta()
+        stats.change(user_id, before, (todo.category, todo.completed))
+        stats.apply()
 
-        # Recurring Logic
-        if 'completed' in data and data['completed'] == True:
-            if not todo.completed and todo.recurrence != 'never' and todo.due_date:
-                next_date = None
-                if todo.recurrence == 'daily':
-                    next_date = todo.due_date + timedelta(days=1)
-                elif todo.recurrence == 'weekly':
-                    next_date = todo.due_date + timedelta(weeks=1)
-                elif todo.recurrence == 'monthly':
-                    next_date = todo.due_date + timedelta(days=30)
-                
-                if next_date:
-                    next_task = Todo(
-                        user_id=user_id,
-                        title=todo.title,
-                        notes=todo.notes,
-                        priority=todo.priority,
-                        category=todo.category,
-                        tags=todo.tags,
-                        recurrence=todo.recurrence,
-                        reminder_minutes=todo.reminder_minutes,
-                        due_date=next_date,
-                        completed=False,
-                        reminder_sent=False,
-                        subtasks=todo.subtasks 
-                    )
-                    db.session.add(next_task)
-                    print(f"🔄 Recurring Task Created: {todo.title}")
-
-        # Standard Updates
-        if 'title' in data: todo.title = data['title']
-        if 'completed' in data: todo.completed = data['completed']
-        if 'priority' in data: todo.priority = data['priority']
-        if 'category' in data: todo.category = data['category']
-        if 'tags' in data: todo.tags = data['tags']
-        if 'notes' in data: todo.notes = data['notes']
-        if 'reminder_minutes' in data: todo.reminder_minutes = int(data['reminder_minutes'])
-        if 'recurrence' in data: todo.recurrence = data['recurrence']
-        
-        # === UPDATE SUBTASKS ===
-        if 'subtasks' in data: todo.subtasks = data['subtasks']
-
-        if 'due_date' in data:
-            todo.due_date = parse_due_date(data['due_date'])
-            todo.reminder_sent = False 
-
+        publish(user_id, 'todo.changed', {"ids": [todo.id]})
         db.session.commit()
         return jsonify({"message": "Todo updated successfully"}), 200
     except Exception as e:
@@ -166,6 +435,12 @@ def delete_todo(id):
         todo = Todo.query.filter_by(id=id, user_id=user_id).first()
         if not todo: return jsonify({"message": "Todo not found"}), 404
         db.session.delete(todo)
+        TodoOccurrence.query.filter(TodoOccurrence.todo_id == todo.id).delete(synchronize_session=False)
+        stats = StatsDelta()
+        stats.remove(user_id, todo.category, todo.completed)
+        stats.apply()
+        add_tombstones(user_id, [todo.id])
+        publish(user_id, 'todo.deleted', {"ids": [todo.id]})
         db.session.commit()
         return jsonify({"message": "Deleted successfully"}), 200
     except Exception as e:
@@ -181,14 +456,489 @@ def delete_bulk_todos():
         ids_to_delete = data.get('ids', [])
         if not ids_to_delete: return jsonify({"message": "No IDs provided"}), 400
 
-        delete_count = Todo.query.filter(
+        owned = db.session.query(Todo.id, Todo.category, Todo.completed).filter(
             Todo.id.in_(ids_to_delete), 
             Todo.user_id == user_id
-        ).delete(synchronize_session=False)
+        ).all()
+        owned_ids = [row.id for row in owned]
+        delete_count = Todo.query.filter(Todo.id.in_(owned_ids)).delete(synchronize_session=False)
+        TodoOccurrence.query.filter(TodoOccurrence.todo_id.in_(owned_ids)).delete(synchronize_session=False)
+        stats = StatsDelta()
+        for row in owned: stats.remove(user_id, row.category, row.completed)
+        stats.apply()
+        add_tombstones(user_id, owned_ids)
+        if owned_ids: publish(user_id, 'todo.deleted', {"ids": owned_ids})
 
         db.session.commit()
         return jsonify({"message": f"Deleted {delete_count} todos"}), 200
     except Exception as e:
         db.session.rollback()
         print(f"Bulk delete error: {e}")
-        return jsonify({"message": "Bulk delete failed"}), 500
\ No newline at end of file
+        return jsonify({"message": "Bulk delete failed"}), 500
+
+@todos_bp.route('/todos/stats', methods=['GET'])
+@jwt_required()
+@replica_reads
+def get_todo_stats():
+    # Dashboard counters: a handful of (category) rows, however many todos there are
+    user_id = int(get_jwt_identity())
+    return jsonify(user_stats(user_id)), 200
+
+# =========================================================
+# 3. BULK CREATE / UPDATE (JSON array or streamed NDJSON)
+# =========================================================
+
+def iter_bulk_payload():
+    """Yield rows from a JSON array ({"todos": [...]} also accepted) or, for
+    application/x-ndjson bodies, one parsed line at a time without buffering the body."""
+    if request.mimetype == 'application/x-ndjson':
+        for line in request.stream:
+            line = line.strip()
+            if not line: continue
+            try: yield json.loads(line)
+            except ValueError: yield INVALID_JSON
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict): data = data.get('todos')
+        if not isinstance(data, list): raise ValueError("Expected a JSON array of todos")
+        yield from data
+
+INVALID_JSON = object()
+
+def iter_bulk_batches():
+    # (index, row) pairs in bounded batches; rows past BULK_MAX_ROWS are reported, not read
+    batch_size = current_app.config['BULK_BATCH_SIZE']
+    max_rows = current_app.config['BULK_MAX_ROWS']
+    batch = []
+    for index, row in enumerate(iter_bulk_payload()):
+        if index >= max_rows:
+            batch.append((index, TOO_MANY_ROWS))
+            break
+        batch.append((index, row))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch: yield batch
+
+TOO_MANY_ROWS = object()
+
+def bulk_todo_id(row):
+    """The row's integer 'id', or None (bool is an int subclass, but not an id)."""
+    todo_id = row.get('id') if isinstance(row, dict) else None
+    return todo_id if isinstance(todo_id, int) and not isinstance(todo_id, bool) else None
+
+def bulk_row_error(row):
+    if row is INVALID_JSON: return "Invalid JSON"
+    if row is TOO_MANY_ROWS: return f"Too many rows (max {current_app.config['BULK_MAX_ROWS']}), stopped here"
+    return None
+
+@todos_bp.route('/todos/bulk', methods=['POST'])
+@jwt_required()
+def create_bulk_todos():
+    user_id = int(get_jwt_identity())
+    tz_str = user_timezone(user_id)
+    results = []
+    created = 0
+    try:
+        for batch in iter_bulk_batches():
+            rows, row_indexes = [], []
+            for index, data in batch:
+                error = bulk_row_error(data)
+                if not error:
+                    try:
+                        rows.append(todo_row_from_json(data, user_id, tz_str))
+                        row_indexes.append(index)
+                        continue
+                    except ValueError as e:
+                        error = str(e)
+                results.append({"index": index, "status": "error", "message": error})
+
+            if rows:
+                # executemany INSERT ... RETURNING id, one transaction per batch
+                ids = db.session.scalars(
+                    insert(Todo).returning(Todo.id, sort_by_parameter_order=True), rows
+                ).all()
+                stats = StatsDelta()
+                for row in rows: stats.add(user_id, row['category'], row['completed'])
+                stats.apply()
+                publish(user_id, 'todo.changed', {"ids": ids})
+                db.session.commit()
+                created += len(ids)
+                results.extend({"index": i, "status": "created", "id": todo_id} for i, todo_id in zip(row_indexes, ids))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Bulk create error: {e}")
+        results.sort(key=lambda r: r['index'])
+        return jsonify({"message": "Bulk create failed", "created": created, "results": results}), 500
+
+    results.sort(key=lambda r: r['index'])
+    return jsonify({"created": created, "failed": len(results) - created, "results": results}), 200
+
+@todos_bp.route('/todos/bulk', methods=['PATCH'])
+@jwt_required()
+def update_bulk_todos():
+    user_id = int(get_jwt_identity())
+    tz_str = user_timezone(user_id)
+    results = []
+    updated = 0
+    try:
+        for batch in iter_bulk_batches():
+            wanted_ids = [bulk_todo_id(data) for _, data in batch if bulk_todo_id(data) is not None]
+            # One SELECT per batch; the flush groups the UPDATEs into executemany
+            query = Todo.query.filter(Todo.id.in_(wanted_ids), Todo.user_id == user_id).order_by(Todo.id)
+            # Row locks (in id order) so version checks and writes can't interleave with another edit
+            if any(isinstance(data, dict) and data.get('version') is not None for _, data in batch):
+                query = query.with_for_update()
+            todos = {t.id: t for t in query}
+            changed_ids = []
+            stats = StatsDelta()
+            for index, data in batch:
+                error = bulk_row_error(data)
+                if not error and not isinstance(data, dict):
+                    error = "Expected a JSON object"
+                elif not error and bulk_todo_id(data) is None:
+                    error = "id must be an integer"
+                if not error:
+                    todo = todos.get(data['id'])
+                    if not todo:
+                        error = "Todo not found"
+                    elif data.get('version') is not None and data['version'] != todo.version:
+                        error = f"Version conflict (current version {todo.version})"
+                    else:
+                        try:
+                            before = (todo.category, todo.completed)
+                            occurrence = apply_todo_update(todo, data, tz_str)
+                            stats.change(user_id, before, (todo.category, todo.completed))
+                            if occurrence: db.session.add(TodoOccurrence(**occurrence))
+                            changed_ids.append(todo.id)
+                            results.append({"index": index, "status": "updated", "id": todo.id})
+                            continue
+                        except ValueError as e:
+                            error = str(e)
+                results.append({"index": index, "status": "error", "message": error})
+
+            if changed_ids:
+                stats.apply()
+                publish(user_id, 'todo.changed', {"ids": changed_ids})
+                db.session.commit()
+                updated += len(changed_ids)
+            else:
+                db.session.rollback() # release the batch's row locks
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Bulk update error: {e}")
+        return jsonify({"message": "Bulk update failed", "updated": updated}), 500
+
+    return jsonify({"updated": updated, "failed": len(results) - updated, "results": results}), 200
+
+# =========================================================
+# 4. STREAMING EXPORT (constant memory)
+# =========================================================
+
+EXPORT_FIELDS = [
+    'id', 'title', 'notes', 'due_date', 'priority', 'category', 'tags', 'recurrence',
+    'reminder_minutes', 'reminder_sent', 'completed', 'subtasks', 'created_at', 'updated_at', 'version', 'rrule'
+]
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'json': ('application/json', 'json'),
+}
+
+def export_row(row):
+    item = todo_to_dict(row)
+    item['reminder_sent'] = bool(row.reminder_sent)
+    item['updated_at'] = row.updated_at.isoformat() if row.updated_at else None
+    return item
+
+def csv_line(values):
+    buf = io.StringIO()
+    csv.writer(buf).writerow(values)
+    return buf.getvalue()
+
+@todos_bp.route('/todos/export', methods=['GET'])
+@jwt_required()
+@replica_reads
+def export_todos():
+    user_id = int(get_jwt_identity())
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"message": "format must be csv, ndjson or json"}), 400
+
+    query = filter_todos(
+        db.session.query(*[getattr(Todo, f) for f in EXPORT_FIELDS]).filter(Todo.user_id == user_id),
+        request.args
+    ).order_by(Todo.created_at, Todo.id)
+    # Server-side cursor: rows arrive in chunks instead of one big fetchall()
+    rows = query.execution_options(yield_per=EXPORT_CHUNK_SIZE, stream_results=True)
+
+    def generate():
+        if fmt == 'csv':
+            yield csv_line(EXPORT_FIELDS)
+            for row in rows:
+                item = export_row(row)
+                item['tags'] = ';'.join(str(t) for t in (item['tags'] or []))
+                item['subtasks'] = json.dumps(item['subtasks'])
+                yield csv_line([item[f] for f in EXPORT_FIELDS])
+        elif fmt == 'ndjson':
+            for row in rows:
+                yield json.dumps(export_row(row)) + '\n'
+        else:
+            yield '['
+            first = True
+            for row in rows:
+                yield ('' if first else ',') + json.dumps(export_row(row))
+                first = False
+            yield ']'
+
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=protodo.{extension}',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+# =========================================================
+# 5. FULL-TEXT SEARCH (ranked, see search.py)
+# =========================================================
+
+@todos_bp.route('/todos/search', methods=['GET'])
+@jwt_required()
+@replica_reads
+def search_todos():
+    user_id = int(get_jwt_identity())
+    terms = search_terms(request.args.get('q'))
+    if not terms: return jsonify({"message": "q is required"}), 400
+
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    # Ranked results can't be keyset-paged, so the cursor is a plain offset
+    offset = max(request.args.get('cursor', 0, type=int), 0)
+
+    # Status/category/priority/due filters still apply; q is the search itself
+    filters = {k: v for k, v in request.args.items() if k != 'q'}
+    stmt = filter_todos(search_statement(user_id, terms, LIST_COLUMNS), filters)
+    rows = db.session.execute(stmt.offset(offset).limit(limit + 1)).all()
+
+    has_more = len(rows) > limit
+    payload = {
+        "items": [todo_to_dict(r) for r in rows[:limit]],
+        "next_cursor": str(offset + limit) if has_more else None,
+        "sync_cursor": encode_sync_cursor(sync_version(user_id)[1])
+    }
+    return fast_jsonify(payload) if current_app.config['TODOS_FAST_PATH'] else jsonify(payload)
+
+# =========================================================
+# 6. SUBTASKS (one checklist item per request)
+# =========================================================
+# The checklist stays a JSON column (one row read for the list view), but clients
+# send only the item that changed. Writes are compare-and-swap on Todo.version:
+# a concurrent edit makes the UPDATE match nothing, and the operation is replayed
+# on the fresh list, so two toggles on different items both land. With If-Match
+# the client asks for a strict check instead and gets 409 on any concurrent change.
+
+class SubtaskNotFound(Exception):
+    pass
+
+def write_subtasks(todo_id, user_id, operation):
+    """Apply operation(subtasks) -> result to the stored list. Returns (payload, status)."""
+    expected_version = request_version()
+    for _ in range(SUBTASK_WRITE_RETRIES):
+        row = db.session.execute(
+            select(Todo.subtasks, Todo.version).where(Todo.id == todo_id, Todo.user_id == user_id)
+        ).first()
+        if not row: return {"message": "Todo not found"}, 404
+        if expected_version is not None and row.version != expected_version:
+            return {"message": "Todo was changed elsewhere", "version": row.version}, 409
+
+        subtasks = [dict(sub) for sub in normalize_subtasks(row.subtasks or [])]
+        try:
+            result = operation(subtasks)
+        except SubtaskNotFound:
+            return {"message": "Subtask not found"}, 404
+        except ValueError as e:
+            return {"message": str(e)}, 400
+
+        # version is bumped in SQL by the column's onupdate
+        matched = db.session.execute(
+            update(Todo).where(Todo.id == todo_id, Todo.version == row.version)
+            .values(subtasks=subtasks).execution_options(synchronize_session=False)
+        ).rowcount
+        if matched:
+            publish(user_id, 'todo.changed', {"ids": [todo_id]})
+            db.session.commit()
+            return dict(result or {}, version=row.version + 1), 200
+        db.session.rollback()
+    return {"message": "Todo is being changed too often, try again"}, 409
+
+def find_subtask(subtasks, subtask_id):
+    for index, sub in enumerate(subtasks):
+        if isinstance(sub, dict) and sub.get('id') == subtask_id: return index
+    raise SubtaskNotFound()
+
+def subtask_text(data):
+    text = data.get('text') if isinstance(data, dict) else None
+    if not isinstance(text, str) or not text.strip(): raise ValueError("Subtask text is required")
+    return text.strip()
+
+@todos_bp.route('/todos/<int:id>/subtasks', methods=['POST'])
+@jwt_required()
+def add_subtask(id):
+    data = request.get_json(silent=True)
+
+    def operation(subtasks):
+        sub = {"id": new_subtask_id(), "text": subtask_text(data), "completed": bool(data.get('completed', False))}
+        position = data.get('position')
+        if isinstance(position, int) and 0 <= position < len(subtasks): subtasks.insert(position, sub)
+        else: subtasks.append(sub)
+        return {"subtask": sub}
+
+    payload, status = write_subtasks(id, int(get_jwt_identity()), operation)
+    return jsonify(payload), 201 if status == 200 else status
+
+@todos_bp.route('/todos/<int:id>/subtasks/<subtask_id>', methods=['PATCH'])
+@jwt_required()
+def update_subtask(id, subtask_id):
+    data = request.get_json(silent=True) or {}
+
+    def operation(subtasks):
+        sub = subtasks[find_subtask(subtasks, subtask_id)]
+        if 'text' in data: sub['text'] = subtask_text(data)
+        if 'completed' in data: sub['completed'] = bool(data['completed'])
+        return {"subtask": sub}
+
+    payload, status = write_subtasks(id, int(get_jwt_identity()), operation)
+    return jsonify(payload), status
+
+@todos_bp.route('/todos/<int:id>/subtasks/<subtask_id>', methods=['DELETE'])
+@jwt_required()
+def delete_subtask(id, subtask_id):
+    def operation(subtasks):
+        del subtasks[find_subtask(subtasks, subtask_id)]
+
+    payload, status = write_subtasks(id, int(get_jwt_identity()), operation)
+    return jsonify(payload), status
+
+@todos_bp.route('/todos/<int:id>/subtasks/order', methods=['PUT'])
+@jwt_required()
+def reorder_subtasks(id):
+    data = request.get_json(silent=True)
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if not isinstance(ids, list): return jsonify({"message": "ids must be a list of subtask ids"}), 400
+
+    def operation(subtasks):
+        # Listed ids first, in order; anything added concurrently keeps its place after them
+        rank = {subtask_id: i for i, subtask_id in enumerate(ids)}
+        subtasks.sort(key=lambda sub: rank.get(sub.get('id') if isinstance(sub, dict) else None, len(rank)))
+        return {"ids": [sub.get('id') for sub in subtasks if isinstance(sub, dict)]}
+
+    payload, status = write_subtasks(id, int(get_jwt_identity()), operation)
+    return jsonify(payload), status
+
+# =========================================================
+# 7. RECURRENCE (occurrences expanded on demand)
+# =========================================================
+
+MAX_OCCURRENCE_WINDOW_DAYS = 366
+
+def parse_window(args):
+    start, end = parse_due_date(args.get('start')), parse_due_date(args.get('end'))
+    if not start or not end: raise ValueError("start and end are required (ISO datetimes)")
+    start, end = wall_clock(start), wall_clock(end)
+    if end < start or end - start > timedelta(days=MAX_OCCURRENCE_WINDOW_DAYS):
+        raise ValueError(f"end must be after start, at most {MAX_OCCURRENCE_WINDOW_DAYS} days later")
+    return start, end
+
+def occurrence_status(occurs_at, series, recorded):
+    if recorded: return recorded
+    if series.completed or occurs_at < series.due_date: return 'missed'
+    return 'open' if occurs_at == series.due_date else 'upcoming'
+
+@todos_bp.route('/todos/occurrences', methods=['GET'])
+@jwt_required()
+def list_occurrences():
+    """Every occurrence due in [start, end]: series expanded from their rule, one-off todos once."""
+    user_id = int(get_jwt_identity())
+    try: start, end = parse_window(request.args)
+    except ValueError as e: return jsonify({"message": str(e)}), 400
+
+    columns = [Todo.id, Todo.title, Todo.due_date, Todo.completed, Todo.recurrence, Todo.rrule, Todo.series_start]
+    series = db.session.execute(select(*columns).where(
+        Todo.user_id == user_id, Todo.series_start.isnot(None), Todo.series_start <= end
+    )).all()
+    one_offs = db.session.execute(select(*columns).where(
+        Todo.user_id == user_id, Todo.series_start.is_(None), Todo.due_date >= start, Todo.due_date <= end
+    )).all()
+    recorded = {
+        (r.todo_id, r.occurs_at): r.status
+        for r in db.session.execute(select(TodoOccurrence.todo_id, TodoOccurrence.occurs_at, TodoOccurrence.status).where(
+            TodoOccurrence.user_id == user_id, TodoOccurrence.occurs_at >= start, TodoOccurrence.occurs_at <= end
+        ))
+    }
+
+    items = []
+    for s in series:
+        for occurs_at in occurrences_between(series_rule(s.recurrence, s.rrule), s.series_start, start, end):
+            items.append({"todo_id": s.id, "title": s.title, "occurs_at": occurs_at.isoformat(),
+                          "status": occurrence_status(occurs_at, s, recorded.get((s.id, occurs_at)))})
+    for t in one_offs:
+        items.append({"todo_id": t.id, "title": t.title, "occurs_at": t.due_date.isoformat(),
+                      "status": 'completed' if t.completed else 'open'})
+    items.sort(key=lambda item: (item['occurs_at'], item['todo_id']))
+    return jsonify({"items": items}), 200
+
+@todos_bp.route('/todos/<int:id>/occurrences', methods=['POST'])
+@jwt_required()
+def record_occurrence(id):
+    """Complete or skip one occurrence of a series, ahead of time or not: {"occurs_at", "status"}."""
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+    todo = Todo.query.filter_by(id=id, user_id=user_id).first()
+    if not todo: return jsonify({"message": "Todo not found"}), 404
+    rule = series_rule(todo.recurrence, todo.rrule)
+    if not rule or not todo.series_start: return jsonify({"message": "Todo is not recurring"}), 400
+
+    status = data.get('status', 'completed')
+    occurs_at = wall_clock(parse_due_date(data.get('occurs_at')))
+    if status not in OCCURRENCE_STATUSES: return jsonify({"message": "status must be completed or skipped"}), 400
+    if not occurs_at or not is_occurrence(rule, todo.series_start, occurs_at):
+        return jsonify({"message": "occurs_at is not an occurrence of this todo"}), 400
+
+    existing = TodoOccurrence.query.filter_by(todo_id=id, occurs_at=occurs_at).first()
+    if existing: existing.status = status
+    else:
+        try:
+            with db.session.begin_nested():
+                db.session.add(TodoOccurrence(todo_id=id, user_id=user_id, occurs_at=occurs_at, status=status))
+        except IntegrityError:
+            # A concurrent duplicate POST inserted it first: same as recording it again
+            TodoOccurrence.query.filter_by(todo_id=id, occurs_at=occurs_at).first().status = status
+    db.session.flush()
+
+    # Acting on the open occurrence moves the series on
+    if not todo.completed and occurs_at == todo.due_date:
+        before = (todo.category, todo.completed)
+        advance_series(todo, occurs_at)
+        todo.refresh_next_action(user_timezone(user_id))
+        stats = StatsDelta()
+        stats.change(user_id, before, (todo.category, todo.completed))
+        stats.apply()
+    publish(user_id, 'todo.changed', {"ids": [id]})
+    db.session.commit()
+    return jsonify({"todo": todo_to_dict(todo)}), 200
+
+@todos_bp.route('/todos/<int:id>/occurrences', methods=['DELETE'])
+@jwt_required()
+def clear_occurrence(id):
+    """Undo a completion / skip recorded for ?occurs_at= (the series itself is not moved back)."""
+    user_id = int(get_jwt_identity())
+    occurs_at = wall_clock(parse_due_date(request.args.get('occurs_at')))
+    if not occurs_at: return jsonify({"message": "occurs_at is required"}), 400
+    deleted = TodoOccurrence.query.filter_by(todo_id=id, user_id=user_id, occurs_at=occurs_at).delete()
+    if not deleted: return jsonify({"message": "No recorded occurrence"}), 404
+    publish(user_id, 'todo.changed', {"ids": [id]})
+    db.session.commit()
+    return jsonify({"message": "Occurrence cleared"}), 200
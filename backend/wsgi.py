@@ -1,3 +1,7 @@
+# backend/wsgi.py
+# The one place the web app is built: gunicorn -c gunicorn.conf.py wsgi:app
+# Schema migrations are not run here - `flask upgrade-schema` runs before gunicorn starts.
+
 from app import create_app
 
-app = create_app()
\ No newline at end of file
+app = create_app()
@@ -2,7 +2,11 @@
 const API_BASE = '/api'; 
 let todos = [];
 let editModeId = null;
+let editVersion = null; // todo.version when editing started; sent as If-Match
 let currentFilter = 'all';
+let nextCursor = null; // keyset cursor for the next page of /api/todos
+let syncCursor = null; // delta-sync position for /api/todos?since=
+let eventSource = null; // server push (SSE) for todo changes & reminders
 let tempSubtasks = []; 
 
 // Notification Sound
@@ -27,9 +31,10 @@ document.addEventListener('DOMContentLoaded', () => {
     if ("Notification" in window && Notification.permission !== "granted") {
         Notification.requestPermission();
     }
-    setInterval(checkBrowserReminders, 30000); 
-    // Auto-refresh data every 60s
-    setInterval(() => { if(localStorage.getItem('token')) loadTodos(); }, 60000);
+    // Polling is only the fallback when the server push stream is down
+    setInterval(() => { if (!streamConnected()) checkBrowserReminders(); }, 30000); 
+    // Auto-refresh every 60s: a delta sync, usually a 304 / empty change set
+    setInterval(() => { if(localStorage.getItem('token') && !streamConnected()) syncTodos(); }, 60000);
 
     // 3. Calendar
     if (document.getElementById('todo-due') && typeof flatpickr !== 'undefined') {
@@ -59,6 +64,7 @@ document.addEventListener('DOMContentLoaded', () => {
         if (localStorage.getItem('token')) {
             loadTodos();      
             loadHeaderInfo(); 
+            startEventStream();
         } else { 
             if(!document.getElementById('login-email')) window.location.href = 'login.html'; 
         }
@@ -106,7 +112,48 @@ window.deleteSelected = async function() {
     showToast("Tasks Deleted", "info");
 };
 
-window.saveProfile = function() {
+// Avatar: presigned form -> straight to the bucket -> server makes thumbnails in the background
+async function uploadAvatar(file) {
+    let res = await authenticatedFetch(`${API_BASE}/profile/avatar/upload`, {
+        method: 'POST', headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({ content_type: file.type })
+    });
+    if (!res) return false;
+    const form = await res.json();
+    if (!res.ok) { showToast(form.message || "Avatar upload failed", "error"); return false; }
+    if (file.size > form.max_bytes) { showToast("Image is too large", "error"); return false; }
+
+    const body = new FormData();
+    Object.entries(form.fields).forEach(([k, v]) => body.append(k, v));
+    body.append('file', file); // must come after the signed fields
+    try {
+        const s3 = await fetch(form.url, { method: 'POST', body });
+        if (!s3.ok) throw new Error(s3.status);
+    } catch (e) { showToast("Avatar upload failed", "error"); return false; }
+
+    res = await authenticatedFetch(`${API_BASE}/profile/avatar`, {
+        method: 'PUT', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({ key: form.key })
+    });
+    if (!res || !res.ok) { showToast("Avatar upload failed", "error"); return false; }
+    pollAvatar(0);
+    return true;
+}
+
+async function pollAvatar(attempt) {
+    if (attempt >= 30) return;
+    const res = await authenticatedFetch(`${API_BASE}/profile/avatar`);
+    if (!res || !res.ok) return;
+    const data = await res.json();
+    if (data.status === 'failed') return showToast(data.error || "Avatar could not be processed", "error");
+    if (data.status !== 'done') return setTimeout(() => pollAvatar(attempt + 1), 1000);
+    const user = JSON.parse(localStorage.getItem('user')) || {};
+    user.avatar = data.avatar;
+    user.avatar_small = data.avatar_small;
+    localStorage.setItem('user', JSON.stringify(user));
+    loadHeaderInfo();
+}
+
+window.saveProfile = async function() {
     const btn = document.querySelector('.profile-actions button.primary-btn');
     if(btn) { btn.disabled = true; btn.innerHTML = `<span class="spinner"></span> Saving...`; }
     
@@ -120,16 +167,13 @@ window.saveProfile = function() {
     if(pass) formData.append('new_password', pass);
     
     const fileInput = document.getElementById('profile-avatar-input');
-    if (fileInput.files[0]) formData.append('avatar', fileInput.files[0]);
+    if (fileInput.files[0] && await uploadAvatar(fileInput.files[0])) fileInput.value = '';
 
     authenticatedFetch(`${API_BASE}/profile`, { method: 'PUT', body: formData }).then(async res => {
         if (res && res.ok) {
-            const data = await res.json();
             showToast('Profile Updated!', 'success');
             const user = JSON.parse(localStorage.getItem('user')) || {};
             user.nickname = document.getElementById('profile-nickname').value;
-            // Update local storage with new avatar URL from S3
-            if(data.avatar) user.avatar = data.avatar;
             localStorage.setItem('user', JSON.stringify(user));
             loadHeaderInfo();
         } else {
@@ -145,7 +189,7 @@ window.filterByStatus = function(status) {
     const labels = { 'all': 'All', 'completed': 'Completed', 'pending': 'Pending' };
     if(labelEl) labelEl.innerText = `Showing: ${labels[status]}`;
     switchView('todos');
-    renderTodos();
+    loadTodos();
 };
 
 window.openDetails = function(id) {
@@ -189,9 +233,12 @@ window.toggleSubtask = async function(todoId, subtaskIndex, isChecked) {
     const t = todos.find(x => x.id === todoId);
     if(!t) return;
     if(!t.subtasks) t.subtasks = [];
-    t.subtasks[subtaskIndex].completed = isChecked;
+    const st = t.subtasks[subtaskIndex];
+    st.completed = isChecked;
     
-    await authenticatedFetch(`${API_BASE}/todos/${todoId}`, { method: 'PUT', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({ subtasks: t.subtasks }) });
+    // Only this item goes over the wire; the server merges it with concurrent edits
+    const res = await authenticatedFetch(`${API_BASE}/todos/${todoId}/subtasks/${encodeURIComponent(st.id)}`, { method: 'PATCH', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({ completed: isChecked }) });
+    if (res && res.ok) t.version = (await res.json()).version;
     renderTodos();
     if(!document.getElementById('details-modal').classList.contains('hidden')) {
         renderModalSubtasks(t);
@@ -205,6 +252,7 @@ window.resetApp = function() {
     document.getElementById('todo-due').value = '';
     document.getElementById('todo-recurrence').value = 'never';
     editModeId = null;
+    editVersion = null;
     tempSubtasks = [];
     renderPendingSubtasks();
     document.getElementById('add-todo-btn').innerHTML = '<i class="fas fa-plus"></i> Add Task';
@@ -237,6 +285,54 @@ function showToast(message, type = 'info', onClickCallback = null) {
     }, 4000);
 }
 
+// === SERVER PUSH (SSE) ===
+function streamConnected() {
+    return eventSource !== null && eventSource.readyState === EventSource.OPEN;
+}
+
+let syncTimer = null;
+function scheduleSync() {
+    // Coalesce bursts (e.g. bulk deletes) into one delta sync
+    clearTimeout(syncTimer);
+    syncTimer = setTimeout(syncTodos, 250);
+}
+
+let lastEventId = null;
+let streamRetryMs = 3000;
+let streamRetryTimer = null;
+
+function restartEventStream() {
+    // Tickets are short-lived, so every reconnect fetches a new one (with backoff)
+    if (eventSource) { eventSource.close(); eventSource = null; }
+    clearTimeout(streamRetryTimer);
+    streamRetryTimer = setTimeout(startEventStream, streamRetryMs);
+    streamRetryMs = Math.min(streamRetryMs * 2, 60000);
+}
+
+async function startEventStream() {
+    if (!localStorage.getItem('token') || !("EventSource" in window)) return;
+    // A stream-only ticket goes in the URL, never the JWT (URLs end up in access logs)
+    const res = await authenticatedFetch(`${API_BASE}/todos/stream/ticket`, { method: 'POST' });
+    if (!res) return;
+    if (!res.ok) return restartEventStream();
+    const { url } = await res.json();
+    const resume = lastEventId ? `&last_event_id=${encodeURIComponent(lastEventId)}` : '';
+    eventSource = new EventSource(url + resume);
+    eventSource.onopen = () => { streamRetryMs = 3000; };
+    eventSource.onerror = restartEventStream;
+    const track = handler => e => { if (e.lastEventId) lastEventId = e.lastEventId; handler(e); };
+    ['todo.changed', 'todo.deleted', 'resync'].forEach(type => eventSource.addEventListener(type, track(scheduleSync)));
+    eventSource.addEventListener('reminder', track(e => {
+        const d = JSON.parse(e.data);
+        showToast(`🔔 Upcoming: ${d.title}`, 'info', () => { switchView('todos'); openDetails(d.id); });
+    }));
+    eventSource.addEventListener('todo.due', track(e => {
+        const d = JSON.parse(e.data);
+        triggerNotification(d.title, d.id);
+        scheduleSync();
+    }));
+}
+
 // === NOTIFICATIONS ===
 function checkBrowserReminders() {
     if (!todos || todos.length === 0) return;
@@ -297,31 +393,78 @@ async function authenticatedFetch(url, options = {}) {
     }
 }
 
-async function loadTodos() {
-    const res = await authenticatedFetch(`${API_BASE}/todos`);
+// Filters run on the server; only the visible page is downloaded
+function todoQueryParams() {
+    const params = new URLSearchParams();
+    if (currentFilter !== 'all') params.set('status', currentFilter);
+    const searchInput = document.getElementById('search-input');
+    if (searchInput && searchInput.value.trim()) params.set('q', searchInput.value.trim());
+    return params;
+}
+
+async function loadTodos(append = false) {
+    const params = todoQueryParams();
+    if (append && nextCursor) params.set('cursor', nextCursor);
+    // Search text goes to the full-text index (title, notes, tags, subtasks), ranked
+    const endpoint = params.has('q') ? 'todos/search' : 'todos';
+    const res = await authenticatedFetch(`${API_BASE}/${endpoint}?${params}`);
     if (res && res.ok) { 
         const data = await res.json();
-        todos = Array.isArray(data) ? data : [];
+        const items = Array.isArray(data.items) ? data.items : [];
+        todos = append ? todos.concat(items) : items;
+        nextCursor = data.next_cursor || null;
+        if (!append) syncCursor = data.sync_cursor || null;
         renderTodos(); 
         updateDashboard(); 
     }
 }
 
+// Applies server-side changes since the last sync; falls back to a page reload
+// when new rows appear or a filter could change which rows belong on screen.
+async function syncTodos() {
+    if (!syncCursor) return loadTodos();
+    const res = await authenticatedFetch(`${API_BASE}/todos?since=${encodeURIComponent(syncCursor)}`);
+    if (!res) return;
+    if (res.status === 410) return loadTodos();
+    if (!res.ok) return;
+    const data = await res.json();
+    if (data.reset) return loadTodos();
+
+    const deleted = new Set(data.deleted || []);
+    let changed = todos.some(t => deleted.has(t.id));
+    let needsReload = false;
+    (data.items || []).forEach(item => {
+        const idx = todos.findIndex(t => t.id === item.id);
+        if (idx === -1) { needsReload = true; return; }
+        if (JSON.stringify(todos[idx]) !== JSON.stringify(item)) { todos[idx] = item; changed = true; }
+    });
+    syncCursor = data.sync_cursor || syncCursor;
+
+    const filtering = currentFilter !== 'all' || todoQueryParams().has('q');
+    if (needsReload || (changed && filtering)) return loadTodos();
+    if (changed) {
+        todos = todos.filter(t => !deleted.has(t.id));
+        renderTodos();
+        updateDashboard();
+    }
+}
+
+window.loadMoreTodos = function() { if (nextCursor) loadTodos(true); };
+
+let searchTimer = null;
+window.onSearchInput = function() {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => loadTodos(), 300);
+};
+
 // === RENDERING ===
 function renderTodos() {
     const list = document.getElementById('todo-list');
     if (!list) return;
     list.innerHTML = ''; 
     
-    const searchInput = document.getElementById('search-input');
-    const search = searchInput ? searchInput.value.toLowerCase() : '';
-    
-    const filtered = todos.filter(t => {
-        const matchTitle = t.title ? t.title.toLowerCase().includes(search) : false;
-        const matchCat = t.category ? t.category.toLowerCase().includes(search) : false;
-        const matchStatus = currentFilter === 'all' ? true : (currentFilter === 'completed' ? t.completed : !t.completed);
-        return (matchTitle || matchCat) && matchStatus;
-    });
+    // Already filtered server-side (status + search)
+    const filtered = todos;
 
     const emptyState = document.getElementById('empty-state');
     if (filtered.length === 0) { 
@@ -392,6 +535,8 @@ function renderTodos() {
         `;
         list.appendChild(li);
     });
+    const moreBtn = document.getElementById('load-more-btn');
+    if (moreBtn) moreBtn.classList.toggle('hidden', !nextCursor);
     updateBulkUI();
 }
 
@@ -416,13 +561,21 @@ async function handleAddOrUpdate() {
         recurrence: document.getElementById('todo-recurrence').value,
         subtasks: tempSubtasks
     };
+    // Custom rules are set through the API; keep the series' rule when editing it
+    const editing = editModeId ? todos.find(t => t.id === editModeId) : null;
+    if (payload.recurrence === 'custom' && editing) payload.rrule = editing.rrule;
 
     const url = editModeId ? `${API_BASE}/todos/${editModeId}` : `${API_BASE}/todos`;
     const method = editModeId ? 'PUT' : 'POST';
+    const headers = {'Content-Type': 'application/json'};
+    if (editModeId && editVersion) headers['If-Match'] = `"${editVersion}"`;
 
-    const res = await authenticatedFetch(url, { method, headers: {'Content-Type': 'application/json'}, body: JSON.stringify(payload) });
+    const res = await authenticatedFetch(url, { method, headers, body: JSON.stringify(payload) });
     
-    if (res && res.ok) {
+    if (res && res.status === 409) {
+        showToast("This task was changed elsewhere. Reopen it to edit the latest version.", "error");
+        loadTodos();
+    } else if (res && res.ok) {
         showToast(editModeId ? "Task Updated" : "Task Created", "success");
         resetApp();
     } else {
@@ -447,6 +600,7 @@ function startEdit(id) {
     tempSubtasks = JSON.parse(JSON.stringify(subtasks));
     renderPendingSubtasks();
     editModeId = id;
+    editVersion = todo.version || null;
     document.getElementById('add-todo-btn').innerHTML = '<i class="fas fa-save"></i> Update Task';
     document.getElementById('cancel-edit-btn').classList.remove('hidden');
     window.scrollTo(0,0);
@@ -545,7 +699,7 @@ async function handleReset() {
 }
 
 // === UTILS ===
-function logout() { localStorage.clear(); window.location.href = 'login.html'; }
+function logout() { if (eventSource) eventSource.close(); localStorage.clear(); window.location.href = 'login.html'; }
 function setLoading(btnId, isLoading, defaultText) { const btn = document.getElementById(btnId); if (!btn) return; if (isLoading) { btn.disabled = true; btn.innerHTML = `<span class="spinner"></span>...`; } else { btn.disabled = false; btn.innerHTML = defaultText; } }
 function updateBulkUI() { const c = document.querySelectorAll('.bulk-check:checked').length; document.getElementById('selected-count').innerText = c; document.getElementById('bulk-bar').classList.toggle('hidden', c===0); }
 function initTheme() { if (localStorage.getItem('theme') === 'dark') document.body.classList.add('dark-mode'); }
@@ -558,8 +712,8 @@ function loadHeaderInfo() {
     if(u.nickname) document.getElementById('header-nickname').innerText = u.nickname; 
     const img = document.getElementById('header-avatar'); 
     
-    // Fallback if avatar is missing
-    const avatarSrc = u.avatar ? u.avatar : `https://ui-avatars.com/api/?name=${u.name || 'User'}&background=random`;
+    // Fallback if avatar is missing; the header only needs the small thumbnail
+    const avatarSrc = u.avatar_small || u.avatar || `https://ui-avatars.com/api/?name=${u.name || 'User'}&background=random`;
     img.src = avatarSrc; 
     
     document.getElementById('user-header').classList.remove('hidden'); 
@@ -577,25 +731,28 @@ function loadProfileData() {
     document.getElementById('profile-preview').src = avatarSrc; 
 }
 
-function importTodos(input) { const file = input.files[0]; const reader = new FileReader(); reader.onload = async (e) => { try { const data = JSON.parse(e.target.result); for (const t of data) { await authenticatedFetch(`${API_BASE}/todos`, { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify(t) }); } loadTodos(); showToast('Import Successful!', 'success'); } catch(e) { showToast("Invalid JSON", "error"); } }; reader.readAsText(file); }
-function exportTodos() { let csv = 'Title,Due,Notes,Category,Priority\n'; todos.forEach(t => csv += `"${t.title}","${t.due_date}","${t.notes}","${t.category}","${t.priority}"\n`); const blob = new Blob([csv], { type: 'text/csv' }); const url = URL.createObjectURL(blob); const a = document.createElement('a'); a.href = url; a.download = 'protodo.csv'; a.click(); }
+function importTodos(input) { const file = input.files[0]; const reader = new FileReader(); reader.onload = async (e) => { let data; try { data = JSON.parse(e.target.result); } catch(err) { return showToast("Invalid JSON", "error"); } const res = await authenticatedFetch(`${API_BASE}/todos/bulk`, { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify(data) }); input.value = ''; if (!res) return; const out = await res.json(); if (!res.ok) return showToast(out.message || "Import failed", "error"); loadTodos(); showToast(out.failed ? `Imported ${out.created}, ${out.failed} skipped` : 'Import Successful!', out.failed ? 'info' : 'success'); }; reader.readAsText(file); }
+async function exportTodos() { const res = await authenticatedFetch(`${API_BASE}/todos/export?format=csv`); if (!res || !res.ok) return showToast("Export failed", "error"); const blob = await res.blob(); const url = URL.createObjectURL(blob); const a = document.createElement('a'); a.href = url; a.download = 'protodo.csv'; a.click(); URL.revokeObjectURL(url); }
 function togglePass(id) { const i = document.getElementById(id); const ic = i.nextElementSibling.querySelector('i'); if (i.type === "password") { i.type = "text"; ic.classList.replace('fa-eye', 'fa-eye-slash'); } else { i.type = "password"; ic.classList.replace('fa-eye-slash', 'fa-eye'); } }
 
 // === DASHBOARD & CHART (Restored from your working version) ===
-function updateDashboard() {
-    const total = todos.length;
-    const completed = todos.filter(t => t.completed).length;
-    const pending = total - completed;
+// Counts come from /api/todos/stats (server-side counters), not the loaded page
+let dashboardStats = { total: 0, completed: 0, pending: 0, categories: {} };
+async function updateDashboard() {
+    const view = document.getElementById('dashboard-view');
+    if (!view || view.classList.contains('hidden')) return; // refreshed by switchView
+    const res = await authenticatedFetch(`${API_BASE}/todos/stats`);
+    if (!res || !res.ok) return;
+    dashboardStats = await res.json();
 
     const elTotal = document.getElementById('stat-total');
     if(elTotal) {
-        document.getElementById('stat-total').innerText = total;
-        document.getElementById('stat-completed').innerText = completed;
-        document.getElementById('stat-pending').innerText = pending;
+        document.getElementById('stat-total').innerText = dashboardStats.total;
+        document.getElementById('stat-completed').innerText = dashboardStats.completed;
+        document.getElementById('stat-pending').innerText = dashboardStats.pending;
     }
     drawChart();
 }
-
 function drawChart() {
     const canvas = document.getElementById('category-chart');
     if (!canvas) return;
@@ -605,12 +762,12 @@ function drawChart() {
     ctx.clearRect(0, 0, canvas.width, canvas.height);
 
     const counts = { 'work': 0, 'personal': 0, 'urgent': 0, 'medical': 0, 'other': 0 };
-    todos.forEach(t => {
-        const cat = t.category ? t.category.toLowerCase() : 'other';
-        if (counts[cat] !== undefined) counts[cat]++; else counts['other']++;
+    Object.entries(dashboardStats.categories || {}).forEach(([category, c]) => {
+        const cat = category.toLowerCase();
+        if (counts[cat] !== undefined) counts[cat] += c.total; else counts['other'] += c.total;
     });
     
-    const total = todos.length;
+    const total = dashboardStats.total;
     if (total === 0) {
         ctx.fillStyle = "#E5E7EB";
         ctx.beginPath(); ctx.arc(150, 150, 100, 0, 2 * Math.PI); ctx.fill();